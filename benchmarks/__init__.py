@@ -0,0 +1 @@
+"""Benchmarks for the fraud prevention service"""
@@ -0,0 +1,63 @@
+"""Compare N sequential creates against one batch create.
+
+Usage: python -m benchmarks.batch_insert [--items 500] [--users 50]
+"""
+import argparse
+import json
+
+from benchmarks.common import disable_cloud_metrics, temp_database, timed
+
+disable_cloud_metrics()
+
+from src.schemas.fraud_prevention import FraudPreventionCreate  # noqa: E402
+from src.services.fraud_prevention import FraudPreventionService  # noqa: E402
+from src.services.velocity import InMemoryVelocityStore  # noqa: E402
+
+
+def _items(prefix: str, count: int, users: int):
+    return [
+        FraudPreventionCreate(
+            transaction_id=f"{prefix}-{i}",
+            user_ip=f"10.0.{i % 255}.1",
+            user_id=f"user-{i % users}",
+            additional_data={"amount": i},
+        )
+        for i in range(count)
+    ]
+
+
+def run(items: int, users: int) -> dict:
+    with temp_database() as (_, SessionLocal):
+        db = SessionLocal()
+        service = FraudPreventionService(db, velocity=InMemoryVelocityStore())
+        sequential = timed(
+            lambda: [service.create(item) for item in _items("seq", items, users)]
+        )
+        db.close()
+
+    with temp_database() as (_, SessionLocal):
+        db = SessionLocal()
+        service = FraudPreventionService(db, velocity=InMemoryVelocityStore())
+        batch = timed(lambda: service.create_batch(_items("batch", items, users)))
+        db.close()
+
+    return {
+        "items": items,
+        "sequential_seconds": round(sequential, 4),
+        "batch_seconds": round(batch, 4),
+        "sequential_items_per_second": round(items / sequential, 1),
+        "batch_items_per_second": round(items / batch, 1),
+        "speedup": round(sequential / batch, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items, args.users), indent=2))
+
+
+if __name__ == "__main__":
+    main()
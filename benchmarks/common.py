@@ -0,0 +1,48 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+
+def disable_cloud_metrics() -> None:
+    """Record metrics without exporting them, so no GCP credentials are needed."""
+    os.environ.setdefault("METRICS_EXPORTER", "none")
+
+
+@contextmanager
+def temp_database() -> Iterator[Tuple[Engine, sessionmaker]]:
+    """A file-backed SQLite database with the service schema, removed afterwards."""
+    from src.database.database import Base
+    from src.models import fraud_prevention  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        try:
+            yield engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        finally:
+            engine.dispose()
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 and max."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {}
+    for percentile in (50, 95, 99):
+        rank = max(0, -(-percentile * len(ordered) // 100) - 1)
+        summary[f"p{percentile}"] = ordered[rank]
+    summary["max"] = ordered[-1]
+    return summary
@@ -0,0 +1,87 @@
+"""Per-page latency at increasing depth: OFFSET pages vs keyset cursors.
+
+Usage: python -m benchmarks.keyset_pagination [--rows 200000] [--limit 100]
+"""
+import argparse
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import disable_cloud_metrics, temp_database, timed
+
+disable_cloud_metrics()
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel  # noqa: E402
+from src.services.fraud_prevention import FraudPreventionService  # noqa: E402
+from src.services.velocity import NullVelocityStore  # noqa: E402
+
+
+def populate(SessionLocal, rows: int) -> None:
+    start = datetime(2025, 1, 1)
+    with SessionLocal() as db:
+        for offset in range(0, rows, 10_000):
+            db.execute(
+                insert(FraudPrevention),
+                [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "transaction_id": f"tx-{i}",
+                        "user_ip": "10.0.0.1",
+                        "user_id": f"user-{i % 5000}",
+                        "risk_level": RiskLevel.LOW,
+                        "is_blocked": False,
+                        "attempt_count": 0,
+                        "created_at": start + timedelta(seconds=i),
+                        "updated_at": start + timedelta(seconds=i),
+                    }
+                    for i in range(offset, min(offset + 10_000, rows))
+                ],
+            )
+        db.commit()
+
+
+def run(rows: int, limit: int, repeat: int) -> dict:
+    depths = sorted({0, rows // 100, rows // 10, rows // 2, rows - limit})
+    results = []
+    with temp_database() as (_, SessionLocal):
+        populate(SessionLocal, rows)
+        with SessionLocal() as db:
+            service = FraudPreventionService(db, velocity=NullVelocityStore())
+            for depth in depths:
+                # Cursor for the row just before this depth (setup, not timed)
+                cursor = None
+                if depth:
+                    (last,), _ = service.get_all(skip=depth - 1, limit=1, with_total=False)
+                    cursor = (last.created_at, last.id)
+
+                offset_page = timed(
+                    lambda: [service.get_all(skip=depth, limit=limit) for _ in range(repeat)]
+                )
+                keyset_page = timed(
+                    lambda: [
+                        service.get_page(cursor=cursor, limit=limit) for _ in range(repeat)
+                    ]
+                )
+                results.append(
+                    {
+                        "depth": depth,
+                        "offset_ms_per_page": round(offset_page / repeat * 1000, 3),
+                        "keyset_ms_per_page": round(keyset_page / repeat * 1000, 3),
+                    }
+                )
+    return {"rows": rows, "limit": limit, "pages": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.limit, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Drive a mix of API traffic and report throughput and latency percentiles.
+
+Starts the API with uvicorn against a fresh SQLite database (or --db-url, e.g.
+a local PostgreSQL), seeds records, then runs the traffic mix either at a fixed
+concurrency (closed loop) or at a fixed arrival rate (open loop, latency counted
+from each request's scheduled start). Pass --url to target a running server.
+
+With --write-behind the server queues creates (WRITE_BEHIND=true), so
+comparing runs with and without it shows what the create path saves.
+
+Usage: python -m benchmarks.load [--duration 30] [--concurrency 16 | --rate 200]
+       [--mix create=50,get=30,list=15,block=5] [--async-mode] [--workers 1]
+       [--write-behind] [--baseline previous.json --max-regression 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.common import percentiles
+
+API = "/api/fraud-preventions"
+DEFAULT_MIX = "create=50,get=30,list=15,block=5"
+SEED_RECORDS = 200
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name}; choose from {sorted(OPERATIONS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+def _payload() -> dict:
+    return {
+        "transactionId": f"load-{uuid.uuid4()}",
+        "userIp": f"10.0.{random.randrange(256)}.{random.randrange(256)}",
+        "userId": f"load-user-{random.randrange(1000)}",
+        "additionalData": {"amount": random.randrange(10_000)},
+    }
+
+
+class Traffic:
+    """Issues requests and keeps the ids of records it has created."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.ids: List[str] = []
+
+    async def create(self) -> httpx.Response:
+        response = await self.client.post(API, json=_payload())
+        if response.status_code == 200:
+            self.ids.append(response.json()["id"])
+        return response
+
+    async def get(self) -> httpx.Response:
+        return await self.client.get(f"{API}/{random.choice(self.ids)}")
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get(API, params={"limit": 20})
+
+    async def block(self) -> httpx.Response:
+        return await self.client.post(
+            f"{API}/{random.choice(self.ids)}/block", json={"reason": "Load test"}
+        )
+
+    async def seed(self, count: int) -> None:
+        for start in range(0, count, 100):
+            response = await self.client.post(
+                f"{API}/batch", json=[_payload() for _ in range(min(100, count - start))]
+            )
+            response.raise_for_status()
+            self.ids.extend(
+                result["data"]["id"] for result in response.json()["results"]
+            )
+
+
+OPERATIONS = {name: getattr(Traffic, name) for name in ("create", "get", "list", "block")}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors = 0
+
+    async def call(self, traffic: Traffic, operation: str, start: float) -> None:
+        try:
+            response = await OPERATIONS[operation](traffic)
+            status = str(response.status_code)
+        except httpx.HTTPError:
+            status = "error"
+        latency = time.perf_counter() - start
+        self.latencies[operation].append(latency)
+        self.statuses[operation][status] += 1
+        if status == "error" or not status.startswith("2"):
+            self.errors += 1
+
+
+async def closed_loop(traffic, recorder, weights, concurrency, duration) -> None:
+    names, values = list(weights), list(weights.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            operation = random.choices(names, values)[0]
+            await recorder.call(traffic, operation, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(traffic, recorder, weights, rate, duration) -> None:
+    names, values = list(weights), list(weights.values())
+    start = time.perf_counter()
+    tasks = []
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        operation = random.choices(names, values)[0]
+        # Latency runs from the scheduled time, so a slow server cannot hide queueing
+        tasks.append(asyncio.create_task(recorder.call(traffic, operation, scheduled)))
+    await asyncio.gather(*tasks)
+
+
+def _summary(latencies: List[float], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **{name: round(value * 1000, 2) for name, value in percentiles(latencies).items()},
+    }
+
+
+async def drive(url: str, args, weights: Dict[str, float]) -> dict:
+    # Also caps open-loop connections; requests beyond it queue in the client
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        traffic = Traffic(client)
+        await traffic.seed(SEED_RECORDS)
+        recorder = Recorder()
+        start = time.perf_counter()
+        if args.rate:
+            await open_loop(traffic, recorder, weights, args.rate, args.duration)
+        else:
+            await closed_loop(traffic, recorder, weights, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+
+    every = [latency for values in recorder.latencies.values() for latency in values]
+    return {
+        "mode": "fixed_rate" if args.rate else "fixed_concurrency",
+        "concurrency": None if args.rate else args.concurrency,
+        "rate": args.rate,
+        "duration_seconds": round(elapsed, 2),
+        "errors": recorder.errors,
+        "latency_unit": "ms",
+        "overall": _summary(every, elapsed),
+        "operations": {
+            operation: {
+                **_summary(latencies, elapsed),
+                "statuses": dict(recorder.statuses[operation]),
+            }
+            for operation, latencies in sorted(recorder.latencies.items())
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(
+    db_url: Optional[str], async_mode: bool, workers: int, write_behind: bool = False
+) -> Iterator[str]:
+    """Run the API in a uvicorn subprocess until the block exits."""
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        env = {
+            **os.environ,
+            "TESTING": "false",
+            "DB_URL": db_url or f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            "ASYNC_MODE": "true" if async_mode else "false",
+            "METRICS_EXPORTER": os.getenv("METRICS_EXPORTER", "none"),
+            "WRITE_BEHIND": "true" if write_behind else "false",
+            "WRITE_BEHIND_DEAD_LETTER_PATH": os.path.join(tmp, "dead-letter.ndjson"),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "src.serve", "--host", "127.0.0.1",
+                "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+            ],
+            env=env,
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if httpx.get(f"{url}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("API server did not start")
+                time.sleep(0.1)
+            yield url
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe metrics that are worse than the baseline by more than ``tolerance``."""
+    found = []
+    for scope, current in [("overall", report["overall"])] + list(
+        report["operations"].items()
+    ):
+        previous = (
+            baseline["overall"] if scope == "overall" else baseline["operations"].get(scope)
+        )
+        if not previous:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            found.append(
+                f"{scope} throughput {current['throughput_rps']} < {previous['throughput_rps']}"
+            )
+        if current["p99"] > previous["p99"] * (1 + tolerance):
+            found.append(f"{scope} p99 {current['p99']}ms > {previous['p99']}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--rate", type=float, default=None, help="Requests per second (open loop)"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--url", default=None, help="Target a running server")
+    parser.add_argument("--db-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--async-mode", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--write-behind", action="store_true", help="Queue creates instead of inserting"
+    )
+    parser.add_argument("--baseline", default=None, help="Previous JSON report")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    weights = parse_mix(args.mix)
+    if args.url:
+        report = asyncio.run(drive(args.url, args, weights))
+    else:
+        with serve(args.db_url, args.async_mode, args.workers, args.write_behind) as url:
+            report = asyncio.run(drive(url, args, weights))
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression)
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
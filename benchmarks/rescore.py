@@ -0,0 +1,143 @@
+"""Compare vectorized re-scoring against scoring and updating row by row.
+
+The per-row path is timed on a sample of records and extrapolated, since running
+it over a million records takes hours.
+
+Usage: python -m benchmarks.rescore [--rows 1000000] [--users 50000] [--sample 2000]
+"""
+import argparse
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import disable_cloud_metrics, temp_database, timed
+
+disable_cloud_metrics()
+
+from sqlalchemy import func, insert, select, update  # noqa: E402
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel  # noqa: E402
+from src.rescore import rescore  # noqa: E402
+from src.schemas.fraud_prevention import FraudPreventionCreate  # noqa: E402
+from src.services.rules import RuleEngine  # noqa: E402
+from src.services.velocity import WINDOWS  # noqa: E402
+
+# Tightened thresholds plus an IP velocity rule, so most records change level
+RULES = [
+    {"type": "velocity", "dimension": "user_id", "threshold": 8, "level": "critical"},
+    {"type": "velocity", "dimension": "user_id", "threshold": 4, "level": "high"},
+    {"type": "velocity", "dimension": "user_id", "threshold": 2, "level": "medium"},
+    {"type": "velocity", "dimension": "user_ip", "window": "1h", "threshold": 3,
+     "level": "high"},
+    {"type": "amount", "threshold": 9000, "level": "medium"},
+]
+
+
+def generate(SessionLocal, rows: int, users: int, chunk_size: int = 50_000) -> None:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    # About 30 days of traffic
+    step = 30 * 86400 / rows
+    with SessionLocal() as db:
+        for offset in range(0, rows, chunk_size):
+            batch = []
+            for i in range(offset, min(offset + chunk_size, rows)):
+                created_at = start + timedelta(seconds=i * step)
+                batch.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "transaction_id": f"tx-{i}",
+                        "user_ip": f"10.{rng.randrange(64)}.{rng.randrange(256)}.1",
+                        "device_id": None,
+                        "user_id": f"user-{rng.randrange(users)}",
+                        "risk_level": RiskLevel.LOW,
+                        "additional_data": {"amount": rng.randrange(10_000)},
+                        "is_blocked": False,
+                        "block_reason": None,
+                        "attempt_count": 0,
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    }
+                )
+            db.execute(insert(FraudPrevention), batch)
+            db.commit()
+
+
+def _previous_counts(db, dimension, key, created_at):
+    """Velocity counts as the service would have seen them when the record was created."""
+    column = getattr(FraudPrevention, dimension)
+    earlier = (column == key, FraudPrevention.created_at < created_at)
+    counts = {"total": db.scalar(select(func.count()).where(*earlier))}
+    for name, seconds in WINDOWS.items():
+        since = created_at - timedelta(seconds=seconds)
+        counts[name] = db.scalar(
+            select(func.count()).where(*earlier, FraudPrevention.created_at > since)
+        )
+    return counts
+
+
+def rescore_per_row(SessionLocal, engine: RuleEngine, sample: int) -> None:
+    with SessionLocal() as db:
+        records = db.scalars(
+            select(FraudPrevention)
+            .order_by(FraudPrevention.created_at, FraudPrevention.id)
+            .limit(sample)
+        ).all()
+        for record in records:
+            fraud_data = FraudPreventionCreate.model_validate(record)
+            assessment = engine.evaluate(
+                fraud_data,
+                lambda dimension, key: _previous_counts(
+                    db, dimension, key, record.created_at
+                ),
+            )
+            if assessment.level != record.risk_level:
+                db.execute(
+                    update(FraudPrevention)
+                    .where(FraudPrevention.id == record.id)
+                    .values(risk_level=assessment.level)
+                )
+                db.commit()
+
+
+def run(rows: int, users: int, sample: int) -> dict:
+    engine = RuleEngine(RULES)
+    with temp_database() as (_, SessionLocal):
+        generate(SessionLocal, rows, users)
+        per_row = timed(lambda: rescore_per_row(SessionLocal, engine, sample))
+        report = {}
+
+        def vectorized():
+            with SessionLocal() as db:
+                report.update(rescore(db, engine))
+
+        seconds = timed(vectorized)
+
+    per_row_rate = min(sample, rows) / per_row
+    return {
+        "rows": rows,
+        "changed": report["changed"],
+        "per_row_sample": min(sample, rows),
+        "per_row_rows_per_second": round(per_row_rate, 1),
+        "per_row_estimated_seconds": round(rows / per_row_rate, 1),
+        "vectorized_seconds": round(seconds, 3),
+        "vectorized_breakdown": {
+            name: report[name] for name in ("load_seconds", "score_seconds", "write_seconds")
+        },
+        "vectorized_rows_per_second": round(rows / seconds, 1),
+        "speedup": round(rows / per_row_rate / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--sample", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.users, args.sample), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare the list fast path against per-record model validation.
+
+Times one user-history response for users with N records: the previous path
+loads ORM objects, validates each into FraudPreventionResponse, re-validates
+against the response_model and encodes with jsonable_encoder; the fast path
+selects the response columns and encodes the rows once with pydantic-core.
+
+Usage: python -m benchmarks.serialization [--records 100,1000,10000] [--repeat 20]
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from typing import List
+
+from benchmarks.common import disable_cloud_metrics, temp_database, timed
+
+disable_cloud_metrics()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel  # noqa: E402
+from src.schemas.fraud_prevention import FraudPreventionResponse  # noqa: E402
+from src.services.fraud_prevention import FraudPreventionService  # noqa: E402
+from src.services.serialization import json_response, record_dicts  # noqa: E402
+
+RESPONSE_MODEL = TypeAdapter(List[FraudPreventionResponse])
+
+
+def seed(SessionLocal, user_id: str, count: int) -> None:
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        db.execute(
+            insert(FraudPrevention),
+            [
+                {
+                    "id": f"{user_id}-{i}",
+                    "transaction_id": f"{user_id}-tx-{i}",
+                    "user_ip": f"10.0.{i % 255}.1",
+                    "device_id": "device",
+                    "user_id": user_id,
+                    "risk_level": RiskLevel.LOW,
+                    "additional_data": {"amount": i, "currency": "USD"},
+                    "is_blocked": False,
+                    "block_reason": None,
+                    "attempt_count": 0,
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(count)
+            ],
+        )
+        db.commit()
+
+
+def previous_path(db, user_id: str) -> bytes:
+    frauds = (
+        db.query(FraudPrevention)
+        .filter(FraudPrevention.user_id == user_id)
+        .order_by(FraudPrevention.created_at.desc())
+        .all()
+    )
+    models = [FraudPreventionResponse.model_validate(fraud) for fraud in frauds]
+    # What FastAPI does with the handler's return value and response_model
+    validated = RESPONSE_MODEL.validate_python(models, from_attributes=True)
+    content = jsonable_encoder(validated, by_alias=True)
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def fast_path(db, user_id: str) -> bytes:
+    rows = FraudPreventionService(db).get_by_user_id(user_id)
+    return json_response(record_dicts(rows)).body
+
+
+def run(sizes: List[int], repeat: int) -> dict:
+    results = []
+    with temp_database() as (_, SessionLocal):
+        for size in sizes:
+            user_id = f"user-{size}"
+            seed(SessionLocal, user_id, size)
+            timings, bodies = {}, {}
+            for name, path in (("previous", previous_path), ("fast", fast_path)):
+                with SessionLocal() as db:
+                    bodies[name] = json.loads(path(db, user_id))  # also warms up
+                    timings[name] = timed(
+                        lambda: [path(db, user_id) for _ in range(repeat)]
+                    ) / repeat
+            assert bodies["previous"] == bodies["fast"], "paths render different JSON"
+            results.append(
+                {
+                    "records": size,
+                    "previous_ms": round(timings["previous"] * 1000, 2),
+                    "fast_ms": round(timings["fast"] * 1000, 2),
+                    "speedup": round(timings["previous"] / timings["fast"], 1),
+                }
+            )
+    return {"repeat": repeat, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.records.split(",")]
+    print(json.dumps(run(sizes, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
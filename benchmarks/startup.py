@@ -0,0 +1,177 @@
+"""Measure cold start: time from launching the API to its first response.
+
+Each run starts a fresh process against a new SQLite database (or --db-url):
+- server: uvicorn from process launch until the first API response, as a
+  Cloud Run cold start sees it
+- in_process: the same app under a test client, split into importing
+  src.main, the startup hook and the first request
+- server_first_response_velocity_warmup: the server start again with
+  VELOCITY_WARMUP=true, which scans the table; use --db-url to measure it
+  against a populated database
+
+Usage: python -m benchmarks.startup [--runs 5] [--async-mode]
+       [--baseline previous.json --max-regression 0.2] [--max-seconds 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.load import API, _free_port
+
+FIRST_REQUEST = f"{API}?limit=1"
+
+IN_PROCESS = f"""
+import json, time
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+from src.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    client.get("{FIRST_REQUEST}").raise_for_status()
+    responded = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - start,
+    "startup_seconds": started - imported,
+    "first_request_seconds": responded - started,
+    "total_seconds": responded - start,
+}}))
+"""
+
+
+def _env(
+    tmp: str, db_url: Optional[str], async_mode: bool, velocity_warmup: bool = False
+) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "TESTING": "false",
+        "DB_URL": db_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+        "ASYNC_MODE": "true" if async_mode else "false",
+        "METRICS_EXPORTER": os.getenv("METRICS_EXPORTER", "none"),
+        "VELOCITY_WARMUP": "true" if velocity_warmup else "false",
+    }
+
+
+def server_start(
+    db_url: Optional[str], async_mode: bool, velocity_warmup: bool = False
+) -> float:
+    """Seconds from launching uvicorn until it answers its first API request."""
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}{FIRST_REQUEST}"
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "src.main:app",
+                "--port", str(port), "--log-level", "warning",
+            ],
+            env=_env(tmp, db_url, async_mode, velocity_warmup),
+        )
+        try:
+            while True:
+                try:
+                    if httpx.get(url).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.perf_counter() - start > 60:
+                    raise RuntimeError("API server did not start")
+                time.sleep(0.005)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def in_process_start(db_url: Optional[str], async_mode: bool) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = subprocess.run(
+            [sys.executable, "-c", IN_PROCESS],
+            env=_env(tmp, db_url, async_mode),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def _median(values: List[float]) -> float:
+    return round(statistics.median(values), 4)
+
+
+def run(runs: int, db_url: Optional[str], async_mode: bool) -> dict:
+    server = [server_start(db_url, async_mode) for _ in range(runs)]
+    warmed = [server_start(db_url, async_mode, velocity_warmup=True) for _ in range(runs)]
+    in_process = [in_process_start(db_url, async_mode) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "async_mode": async_mode,
+        "unit": "seconds (median)",
+        "server_first_response": _median(server),
+        "server_first_response_max": round(max(server), 4),
+        "server_first_response_velocity_warmup": _median(warmed),
+        "in_process": {
+            name: _median([result[name] for result in in_process])
+            for name in in_process[0]
+        },
+    }
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe timings slower than the baseline by more than ``tolerance``."""
+    names = ["server_first_response", "server_first_response_velocity_warmup"]
+    current = {name: report[name] for name in names}
+    previous = {name: baseline.get(name) for name in names}
+    for name, value in report["in_process"].items():
+        current[f"in_process.{name}"] = value
+        previous[f"in_process.{name}"] = baseline["in_process"].get(name)
+    return [
+        f"{name} {value}s > {previous[name]}s"
+        for name, value in current.items()
+        if previous[name] and value > previous[name] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--async-mode", action="store_true")
+    parser.add_argument("--baseline", default=None, help="Previous JSON report")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Fail if the median server first response is slower",
+    )
+    args = parser.parse_args()
+
+    report = run(args.runs, args.db_url, args.async_mode)
+    print(json.dumps(report, indent=2))
+
+    found = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression)
+    if args.max_seconds and report["server_first_response"] > args.max_seconds:
+        found.append(
+            f"server_first_response {report['server_first_response']}s > {args.max_seconds}s"
+        )
+    for regression in found:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Show how throughput scales with the number of worker processes.
+
+Runs the load benchmark's closed-loop traffic against the API served by
+src.serve with each worker count in turn, and reports throughput, p99 latency
+and scaling efficiency (throughput per worker relative to one worker).
+SQLite serializes writers across processes, so the default mix is read-heavy;
+use --db-url with PostgreSQL to scale writes.
+
+Usage: python -m benchmarks.workers [--workers 1,2,4] [--duration 20]
+       [--concurrency 32] [--mix get=60,list=30,create=10] [--db-url URL]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+
+from benchmarks.load import drive, parse_mix, serve
+
+DEFAULT_MIX = "get=60,list=30,create=10"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--db-url", default=None, help="Defaults to a fresh SQLite file")
+    parser.add_argument("--async-mode", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    # Closed loop only: drive() reads these from the load benchmark's arguments
+    args.rate = None
+
+    weights = parse_mix(args.mix)
+    results = []
+    for workers in [int(value) for value in args.workers.split(",")]:
+        random.seed(args.seed)
+        with serve(args.db_url, args.async_mode, workers) as url:
+            report = asyncio.run(drive(url, args, weights))
+        results.append(
+            {
+                "workers": workers,
+                "throughput_rps": report["overall"]["throughput_rps"],
+                "p99_ms": report["overall"]["p99"],
+                "errors": report["errors"],
+            }
+        )
+
+    base = results[0]["throughput_rps"] / results[0]["workers"]
+    for result in results:
+        result["scaling_efficiency"] = round(
+            result["throughput_rps"] / result["workers"] / base, 2
+        )
+    print(
+        json.dumps(
+            {
+                "cpus": len(os.sched_getaffinity(0)),
+                "concurrency": args.concurrency,
+                "duration_seconds": args.duration,
+                "mix": args.mix,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Create fraud_prevention table
+
+Databases created before migrations were introduced already have this table
+(from Base.metadata.create_all), so it is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode() and sa.inspect(op.get_bind()).has_table(
+        "fraud_prevention"
+    ):
+        return
+    op.create_table(
+        "fraud_prevention",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("transaction_id", sa.String(255), nullable=False),
+        sa.Column("user_ip", sa.String(100), nullable=False),
+        sa.Column("device_id", sa.String(255), nullable=True),
+        sa.Column("user_id", sa.String(255), nullable=False),
+        sa.Column(
+            "risk_level",
+            sa.Enum("LOW", "MEDIUM", "HIGH", "CRITICAL", name="risklevel"),
+            nullable=False,
+        ),
+        sa.Column("additional_data", sa.JSON(), nullable=True),
+        sa.Column("is_blocked", sa.Boolean(), nullable=False),
+        sa.Column("block_reason", sa.String(255), nullable=True),
+        sa.Column("attempt_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("fraud_prevention")
+    sa.Enum(name="risklevel").drop(op.get_bind(), checkfirst=True)
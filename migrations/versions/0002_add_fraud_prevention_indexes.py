@@ -0,0 +1,69 @@
+"""Add indexes for transaction, user history and listing lookups
+
+On PostgreSQL the indexes are built CONCURRENTLY outside the migration
+transaction so existing tables stay writable while they are created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_fraud_prevention_transaction_id", ["transaction_id"], True),
+    ("ix_fraud_prevention_user_id_created_at", ["user_id", "created_at"], False),
+    ("ix_fraud_prevention_created_at", ["created_at"], False),
+]
+
+
+def _check_duplicate_transactions() -> None:
+    duplicates = op.get_bind().execute(
+        sa.text(
+            "SELECT COUNT(*) FROM (SELECT transaction_id FROM fraud_prevention "
+            "GROUP BY transaction_id HAVING COUNT(*) > 1) AS duplicated"
+        )
+    ).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} transaction ids have more than one fraud_prevention "
+            "record; resolve them before adding the unique index"
+        )
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        _check_duplicate_transactions()
+
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                "fraud_prevention",
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=concurrently,
+            )
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.drop_index(
+                name,
+                table_name="fraud_prevention",
+                if_exists=True,
+                postgresql_concurrently=concurrently,
+            )
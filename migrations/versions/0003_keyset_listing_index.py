@@ -0,0 +1,52 @@
+"""Replace the created_at index with (created_at, id) for keyset pagination
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_fraud_prevention_created_at_id",
+            "fraud_prevention",
+            ["created_at", "id"],
+            if_not_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+        op.drop_index(
+            "ix_fraud_prevention_created_at",
+            table_name="fraud_prevention",
+            if_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_fraud_prevention_created_at",
+            "fraud_prevention",
+            ["created_at"],
+            if_not_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+        op.drop_index(
+            "ix_fraud_prevention_created_at_id",
+            table_name="fraud_prevention",
+            if_exists=True,
+            postgresql_concurrently=concurrently,
+        )
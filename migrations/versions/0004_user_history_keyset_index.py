@@ -0,0 +1,52 @@
+"""Extend the user history index with id for keyset pagination
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_fraud_prevention_user_id_created_at_id",
+            "fraud_prevention",
+            ["user_id", "created_at", "id"],
+            if_not_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+        op.drop_index(
+            "ix_fraud_prevention_user_id_created_at",
+            table_name="fraud_prevention",
+            if_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_fraud_prevention_user_id_created_at",
+            "fraud_prevention",
+            ["user_id", "created_at"],
+            if_not_exists=True,
+            postgresql_concurrently=concurrently,
+        )
+        op.drop_index(
+            "ix_fraud_prevention_user_id_created_at_id",
+            table_name="fraud_prevention",
+            if_exists=True,
+            postgresql_concurrently=concurrently,
+        )
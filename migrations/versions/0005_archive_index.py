@@ -0,0 +1,41 @@
+"""Create fraud_prevention_archive, the index of archived records
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fraud_prevention_archive",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("transaction_id", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("path", sa.String(512), nullable=False),
+    )
+    op.create_index(
+        "ix_fraud_prevention_archive_transaction_id",
+        "fraud_prevention_archive",
+        ["transaction_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_fraud_prevention_archive_transaction_id",
+        table_name="fraud_prevention_archive",
+    )
+    op.drop_table("fraud_prevention_archive")
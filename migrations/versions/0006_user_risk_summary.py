@@ -0,0 +1,107 @@
+"""Create user_risk_summary, per-user aggregates for risk assessment
+
+The table is filled from fraud_prevention in the same migration, so existing
+users keep their history from the first create on the new revision.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}
+
+
+def upgrade() -> None:
+    # The risklevel type already exists on PostgreSQL, created with fraud_prevention
+    risk_level = sa.Enum(*LEVELS, name="risklevel").with_variant(
+        postgresql.ENUM(*LEVELS, name="risklevel", create_type=False), "postgresql"
+    )
+    windows = []
+    for name in WINDOWS:
+        windows += [
+            sa.Column(f"bucket_{name}", sa.Integer(), nullable=False),
+            sa.Column(f"count_{name}", sa.Integer(), nullable=False),
+            sa.Column(f"previous_{name}", sa.Integer(), nullable=False),
+        ]
+    op.create_table(
+        "user_risk_summary",
+        sa.Column("user_id", sa.String(255), primary_key=True),
+        sa.Column("attempt_count", sa.Integer(), nullable=False),
+        sa.Column("blocked_count", sa.Integer(), nullable=False),
+        sa.Column("last_seen", sa.DateTime(), nullable=False),
+        sa.Column("risk_level", risk_level, nullable=False),
+        *windows,
+    )
+    _backfill()
+
+
+def _backfill() -> None:
+    """Summarize every user's records, as src.services.risk_summary does."""
+    records = sa.table(
+        "fraud_prevention",
+        sa.column("id"),
+        sa.column("user_id"),
+        sa.column("risk_level"),
+        sa.column("is_blocked"),
+        sa.column("created_at"),
+    )
+    latest = records.alias("latest")
+    columns = [
+        records.c.user_id,
+        sa.func.count(),
+        sa.func.sum(sa.case((records.c.is_blocked, 1), else_=0)),
+        sa.func.max(records.c.created_at),
+        sa.select(latest.c.risk_level)
+        .where(latest.c.user_id == records.c.user_id)
+        .order_by(latest.c.created_at.desc(), latest.c.id.desc())
+        .limit(1)
+        .scalar_subquery(),
+    ]
+    names = ["user_id", "attempt_count", "blocked_count", "last_seen", "risk_level"]
+    epoch = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
+    origin = datetime(1970, 1, 1)
+    for name, width in WINDOWS.items():
+        bucket = int(epoch // width)
+        start = origin + timedelta(seconds=bucket * width)
+        previous_start = start - timedelta(seconds=width)
+        columns += [
+            sa.literal(bucket, sa.Integer),
+            sa.func.sum(sa.case((records.c.created_at >= start, 1), else_=0)),
+            sa.func.sum(
+                sa.case(
+                    (
+                        sa.and_(
+                            records.c.created_at >= previous_start,
+                            records.c.created_at < start,
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            ),
+        ]
+        names += [f"bucket_{name}", f"count_{name}", f"previous_{name}"]
+    summary = sa.table("user_risk_summary", *(sa.column(name) for name in names))
+    op.execute(
+        summary.insert().from_select(
+            names, sa.select(*columns).group_by(records.c.user_id)
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_risk_summary")
@@ -1,9 +1,26 @@
+import functools
+import itertools
 import os
 import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
 
-from sqlalchemy import create_engine
+from fastapi import Depends, Header
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.metrics import (
+    record_pool_state,
+    record_pool_timeout,
+    record_replica_ejection,
+    record_stage,
+)
 
 # Set default environment
 if "TESTING" not in os.environ:
@@ -46,10 +63,246 @@ def get_connection_string() -> str:
 
 
 
+class PoolTelemetry:
+    """Mixin for QueuePool classes that reports checkout waits and pool usage.
+
+    Each checkout records its wait as the "pool_wait" stage, and each checkout
+    and return records the connections in use, the overflow in use and the
+    callers still waiting, labelled with ``telemetry_name``.
+    """
+
+    telemetry_name = "sync"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        with self._waiting_lock:
+            self._waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            record_pool_timeout(self.telemetry_name)
+            raise
+        finally:
+            record_stage("pool_wait", time.perf_counter() - start)
+            with self._waiting_lock:
+                self._waiting -= 1
+            self._record_state()
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self._record_state()
+
+    def _record_state(self) -> None:
+        record_pool_state(
+            self.telemetry_name,
+            in_use=self.checkedout(),
+            overflow=max(self.overflow(), 0),
+            waiting=self._waiting,
+        )
+
+
+class TimedQueuePool(PoolTelemetry, QueuePool):
+    """QueuePool that records checkout waits and pool usage."""
+
+
+class TimedAsyncQueuePool(PoolTelemetry, AsyncAdaptedQueuePool):
+    """Async engine counterpart of TimedQueuePool."""
+
+    telemetry_name = "async"
+
+
+def get_pool_settings() -> dict:
+    """Pool arguments from DB_POOL_* settings.
+
+    The pool defaults to one connection per concurrent request the instance
+    serves (INSTANCE_CONCURRENCY), split across its WEB_CONCURRENCY worker
+    processes and capped at 10 per process. With DB_POOL_FAST_FAIL=true a
+    checkout gives up after a second instead of 30, so an exhausted pool
+    returns 503s quickly rather than queueing requests.
+    """
+    concurrency = int(os.getenv("INSTANCE_CONCURRENCY", "5"))
+    workers = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    per_worker = min(max(-(-concurrency // workers), 1), 10)
+    fast_fail = os.getenv("DB_POOL_FAST_FAIL", "false") == "true"
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", str(per_worker))),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "2")),
+        "pool_timeout": float(
+            os.getenv("DB_POOL_TIMEOUT_SECONDS", "1" if fast_fail else "30")
+        ),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        # Test each connection on checkout, replacing ones the server closed
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true") == "true",
+    }
+
+
 def get_engine_args():
     if os.getenv("TESTING") == "true":
         return {"connect_args": {"check_same_thread": False}}
-    return {"pool_size": 5, "max_overflow": 2, "pool_timeout": 30, "pool_recycle": 1800}
+    return {"poolclass": TimedQueuePool, **get_pool_settings()}
+
+
+# Async drivers used in place of the sync DBAPI for each backend
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def is_async_mode() -> bool:
+    return os.getenv("ASYNC_MODE", "false") == "true"
+
+
+def get_async_connection_string() -> str:
+    return to_async_url(get_connection_string())
+
+
+def to_async_url(connection_string: str) -> str:
+    url = make_url(connection_string)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+def get_async_engine_args():
+    if os.getenv("TESTING") == "true":
+        return {}
+    return {"poolclass": TimedAsyncQueuePool, **get_pool_settings()}
+
+
+def get_replica_urls() -> List[str]:
+    """Read replica URLs from DB_REPLICA_URLS, comma separated."""
+    if os.getenv("TESTING") == "true":
+        return []
+    urls = os.getenv("DB_REPLICA_URLS", "").split(",")
+    return [url.strip() for url in urls if url.strip()]
+
+
+class ReplicaSet:
+    """Read replica engines, picked round-robin.
+
+    A replica that fails to connect or drops a connection is skipped for
+    ``eject_seconds``; while every replica is ejected, reads use the primary.
+    """
+
+    def __init__(self, engines: List[Engine], eject_seconds: float = 30):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until: Dict[int, float] = {}
+        self._turn = itertools.count()
+        for engine in engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def choose(self) -> Optional[Engine]:
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._turn) % len(self.engines)
+            if self._ejected_until.get(index, 0) <= now:
+                return self.engines[index]
+        return None
+
+    def is_ejected(self, engine: Engine) -> bool:
+        index = self.engines.index(engine)
+        return self._ejected_until.get(index, 0) > time.monotonic()
+
+    def eject(self, engine: Engine) -> None:
+        index = self.engines.index(engine)
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        logger.warning(
+            "Read replica %d unavailable; ejected for %ss", index, self.eject_seconds
+        )
+        record_replica_ejection(str(index))
+
+    def dispose(self, close: bool = True) -> None:
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+    def _on_error(self, context) -> None:
+        # No connection means connecting failed
+        if context.is_disconnect or context.connection is None:
+            self.eject(context.engine)
+
+
+# Session.info flags steering RoutingSession reads
+REPLICA_READS = "replica_reads"
+PRIMARY_READS = "primary_reads"
+
+
+class RoutingSession(Session):
+    """Session that sends reads marked with ``read_from_replica`` to a replica.
+
+    Writes always use the primary. Once the session has written, or when it
+    is opened for read-your-writes (``info[PRIMARY_READS]``), its reads use the
+    primary too. A session keeps the replica it first picked, so the reads of
+    one request see one consistent snapshot.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or (clause is not None and clause.is_dml):
+            self.info[PRIMARY_READS] = True
+        elif self.info.get(REPLICA_READS) and not self.info.get(PRIMARY_READS):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def _replica(self) -> Optional[Engine]:
+        if self.replicas is None:
+            return None
+        replica = self.info.get("replica")
+        if replica is None or self.replicas.is_ejected(replica):
+            replica = self.info["replica"] = self.replicas.choose()
+        return replica
+
+
+@contextmanager
+def read_from_replica(session: Session) -> Iterator[None]:
+    """Route the session's reads in the block to a replica, if it has any."""
+    previous = session.info.get(REPLICA_READS, False)
+    session.info[REPLICA_READS] = True
+    try:
+        yield
+    finally:
+        session.info[REPLICA_READS] = previous
+
+
+Method = TypeVar("Method", bound=Callable)
+
+
+def replica_reads(method: Method) -> Method:
+    """Run a read-only service method on a replica.
+
+    If the replica fails during the call, it is ejected and the method runs
+    again on the primary, in a new transaction.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            with read_from_replica(self.db):
+                return method(self, *args, **kwargs)
+        except exc.DBAPIError:
+            replica = self.db.info.get("replica")
+            replicas = getattr(self.db, "replicas", None)
+            if replica is None or not replicas.is_ejected(replica):
+                raise
+            # The failed read left the session's transaction unusable
+            self.db.rollback()
+            self.db.info["replica"] = None
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 # Base class for models
@@ -58,22 +311,127 @@ Base = declarative_base()
 # Create database engine and session factory lazily
 engine = None
 SessionLocal = None
+replicas: Optional[ReplicaSet] = None
+async_engine = None
+AsyncSessionLocal = None
+async_replicas: Optional[ReplicaSet] = None
+
+
+def _replica_set(engines: List[Engine]) -> Optional[ReplicaSet]:
+    if not engines:
+        return None
+    return ReplicaSet(
+        engines, eject_seconds=float(os.getenv("DB_REPLICA_EJECT_SECONDS", "30"))
+    )
 
 
 def setup_database():
-    global engine, SessionLocal
+    global engine, SessionLocal, replicas
     if engine is None:
         engine = create_engine(get_connection_string(), **get_engine_args())
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        replicas = _replica_set(
+            [create_engine(url, **get_engine_args()) for url in get_replica_urls()]
+        )
+        # Writes set or return every column, so objects stay valid after commit
+        SessionLocal = sessionmaker(
+            class_=RoutingSession,
+            replicas=replicas,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            bind=engine,
+        )
     return engine, SessionLocal
 
 
+def setup_async_database():
+    global async_engine, AsyncSessionLocal, async_replicas
+    if async_engine is None:
+        async_engine = create_async_engine(
+            get_async_connection_string(), **get_async_engine_args()
+        )
+        async_replicas = _replica_set(
+            [
+                create_async_engine(
+                    to_async_url(url), **get_async_engine_args()
+                ).sync_engine
+                for url in get_replica_urls()
+            ]
+        )
+        # Objects stay usable after commit; reloading them would need another await
+        AsyncSessionLocal = async_sessionmaker(
+            bind=async_engine,
+            sync_session_class=RoutingSession,
+            replicas=async_replicas,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return async_engine, AsyncSessionLocal
+
+
+def _dispose_inherited_pools():
+    """Give a forked worker its own connections.
+
+    Pooled connections are left open for the parent process that owns them;
+    the child's engines start with empty pools.
+    """
+    if engine is not None:
+        engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+    for replica_set in (replicas, async_replicas):
+        if replica_set is not None:
+            replica_set.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_inherited_pools)
+
+
+READ_YOUR_WRITES_DESCRIPTION = (
+    "Send `true` to read from the primary database instead of a replica, "
+    "e.g. right after a write"
+)
+
+
+def read_your_writes(
+    value: Optional[str] = Header(
+        None, alias="Read-Your-Writes", description=READ_YOUR_WRITES_DESCRIPTION
+    )
+) -> bool:
+    return value == "true"
+
+
 # Dependency to get database session
-def get_db():
+def get_db(primary_reads: bool = Depends(read_your_writes)):
     if SessionLocal is None:
         setup_database()
     db = SessionLocal()
+    db.info[PRIMARY_READS] = primary_reads
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency to get the session factory, for responses that outlive the request
+# dependencies (e.g. streaming) and must open and close their own session
+def get_session_factory():
+    if SessionLocal is None:
+        setup_database()
+    return SessionLocal
+
+
+# Dependency to get async database session
+async def get_async_db(primary_reads: bool = Depends(read_your_writes)):
+    if AsyncSessionLocal is None:
+        setup_async_database()
+    async with AsyncSessionLocal() as db:
+        db.info[PRIMARY_READS] = primary_reads
+        yield db
+
+
+# Async counterpart of get_session_factory
+def get_async_session_factory():
+    if AsyncSessionLocal is None:
+        setup_async_database()
+    return AsyncSessionLocal
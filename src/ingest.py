@@ -0,0 +1,369 @@
+"""Bulk-load an NDJSON file of FraudPreventionCreate payloads.
+
+Usage: python -m src.ingest transactions.ndjson [--chunk-size 1000] [--workers 4]
+       [--method auto|copy|executemany] [--max-keys 100000] [--db-url URL]
+
+Lines are read and validated one chunk at a time and scored in file order, so
+each user's risk level matches what sequential API creates would produce.
+Writes run on a pool of workers with a bounded number of chunks in flight.
+Velocity counts are kept for at most --max-keys keys per dimension; keys used
+least recently, once their chunks are written, are dropped and read back from
+the database if they appear again. Memory therefore depends on the chunk size
+and --max-keys, not the file size. Transaction ids that already exist are
+skipped. As each chunk is written, its users' risk summaries are recomputed.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import (
+    IO,
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from src.database.database import get_connection_string
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import (
+    FraudPreventionService,
+    batch_timestamps,
+    insert_ignoring_duplicates,
+)
+from src.services.risk_summary import refresh_summaries
+from src.services.rules import Counts, RuleEngine, get_rule_engine
+from src.services.velocity import NullVelocityStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = 4
+# Velocity counts kept per dimension between chunks
+DEFAULT_MAX_KEYS = 100_000
+# Invalid lines logged individually before only being counted
+MAX_LOGGED_ERRORS = 10
+PROGRESS_INTERVAL_SECONDS = 10.0
+
+COLUMNS = [column.key for column in FraudPrevention.__table__.columns]
+# Marks NULL in COPY input, so it stays distinct from empty strings
+COPY_NULL = "\\N"
+
+
+@dataclass
+class IngestReport:
+    lines: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        report = asdict(self)
+        report["seconds"] = round(self.seconds, 3)
+        report["rows_per_second"] = round(self.rows_per_second, 1)
+        return report
+
+
+def read_chunks(
+    lines: IO[bytes], chunk_size: int
+) -> Iterator[List[Tuple[int, bytes]]]:
+    """Non-blank lines with their 1-based line numbers, chunk_size at a time."""
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            chunk.append((number, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_executemany(conn: Connection, rows: List[Dict[str, Any]]) -> int:
+    """Insert rows with one executemany, returning how many were inserted."""
+    return conn.execute(insert_ignoring_duplicates(conn.dialect.name), rows).rowcount
+
+
+def _copy_value(value: Any) -> Any:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, RiskLevel):
+        # SQLAlchemy stores enum members by name
+        return value.name
+    return value
+
+
+def write_copy(conn: Connection, rows: List[Dict[str, Any]]) -> int:
+    """COPY rows into a staging table, then move them over skipping duplicates."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in COLUMNS])
+    buffer.seek(0)
+
+    table = FraudPrevention.__tablename__
+    columns = ", ".join(COLUMNS)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE ingest_staging (LIKE {table} INCLUDING DEFAULTS) "
+            "ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            f"COPY ingest_staging ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer,
+        )
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM ingest_staging "
+            "ON CONFLICT (transaction_id) DO NOTHING"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+WRITERS = {"copy": write_copy, "executemany": write_executemany}
+
+
+class PendingChunk(NamedTuple):
+    """A chunk submitted for writing."""
+
+    future: Future
+    number: int
+    transaction_ids: Set[str]
+    user_ids: Set[str]
+
+
+class Ingestor:
+    """Validates, scores and writes NDJSON payloads in chunks."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: int = DEFAULT_WORKERS,
+        method: str = "auto",
+        rules: Optional[RuleEngine] = None,
+        max_keys: int = DEFAULT_MAX_KEYS,
+    ):
+        if method == "auto":
+            method = "copy" if engine.dialect.name == "postgresql" else "executemany"
+        if method == "copy" and engine.dialect.name != "postgresql":
+            raise ValueError("COPY ingestion requires PostgreSQL")
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.write = WRITERS[method]
+        self.rules = rules if rules is not None else get_rule_engine()
+        self.max_keys = max_keys
+        self.report = IngestReport()
+        # Velocity counts per dimension and key so far, seeded from the database
+        # on first sight, least recently used first
+        self._counts: Dict[str, "OrderedDict[str, Counts]"] = {
+            dimension: OrderedDict() for dimension in self.rules.dimensions
+        }
+        # Number of the last chunk that counted each key
+        self._last_chunk: Dict[str, Dict[str, int]] = {
+            dimension: {} for dimension in self.rules.dimensions
+        }
+        self._chunks = 0
+        # Every chunk up to this number is written
+        self._written = 0
+
+    def run(self, lines: IO[bytes]) -> IngestReport:
+        start = time.perf_counter()
+        last_progress = start
+        # Chunks submitted but not yet written, oldest first
+        pending: Deque[PendingChunk] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for chunk in read_chunks(lines, self.chunk_size):
+                while len(pending) >= self.workers * 2:
+                    self._collect(pending.popleft())
+                in_flight = set().union(*(entry.transaction_ids for entry in pending))
+                rows = self._prepare(chunk, in_flight)
+                if rows:
+                    pending.append(
+                        PendingChunk(
+                            executor.submit(self._write, rows),
+                            self._chunks,
+                            {row["transaction_id"] for row in rows},
+                            {row["user_id"] for row in rows},
+                        )
+                    )
+
+                now = time.perf_counter()
+                if now - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress = now
+                    self.report.seconds = now - start
+                    logger.info("Ingest progress: %s", self.report.as_dict())
+            while pending:
+                self._collect(pending.popleft())
+        self.report.seconds = time.perf_counter() - start
+        return self.report
+
+    def _prepare(
+        self, chunk: List[Tuple[int, bytes]], in_flight: Set[str]
+    ) -> List[Dict[str, Any]]:
+        """Validate a chunk, drop duplicates and score the rest in file order."""
+        self.report.lines += len(chunk)
+        items = []
+        for number, line in chunk:
+            try:
+                items.append(FraudPreventionCreate.model_validate_json(line))
+            except ValidationError as e:
+                self.report.invalid += 1
+                if self.report.invalid <= MAX_LOGGED_ERRORS:
+                    logger.warning("Line %d is invalid: %s", number, e.errors())
+
+        with Session(self.engine) as db:
+            service = FraudPreventionService(
+                db, velocity=NullVelocityStore(), rules=self.rules
+            )
+            seen = in_flight | service.existing_transaction_ids(
+                [item.transaction_id for item in items]
+            )
+            accepted = []
+            for item in items:
+                if item.transaction_id in seen:
+                    self.report.duplicates += 1
+                else:
+                    seen.add(item.transaction_id)
+                    accepted.append(item)
+            if accepted:
+                self._chunks += 1
+            for dimension, counts in self._counts.items():
+                keys = {getattr(item, dimension) for item in accepted} - {None}
+                unseen = keys - counts.keys()
+                if unseen:
+                    counts.update(service.velocity_counts(dimension, unseen))
+                last_chunk = self._last_chunk[dimension]
+                for key in keys:
+                    counts.move_to_end(key)
+                    last_chunk[key] = self._chunks
+
+        assessments = self.rules.evaluate_in_order(accepted, self._counts)
+        rows = []
+        for item, assessment, now in zip(
+            accepted, assessments, batch_timestamps(len(accepted))
+        ):
+            rows.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "transaction_id": item.transaction_id,
+                    "user_ip": item.user_ip,
+                    "device_id": item.device_id,
+                    "user_id": item.user_id,
+                    "risk_level": assessment.level,
+                    "additional_data": item.additional_data,
+                    "is_blocked": False,
+                    "block_reason": None,
+                    "attempt_count": 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        with self.engine.begin() as conn:
+            return self.write(conn, rows)
+
+    def _collect(self, entry: PendingChunk) -> None:
+        inserted = entry.future.result()
+        self.report.inserted += inserted
+        # Rows written concurrently by another process lose the conflict
+        self.report.duplicates += len(entry.transaction_ids) - inserted
+        # Chunks are collected in order, so a user's last refresh follows
+        # the last write of their records
+        with self.engine.begin() as conn:
+            refresh_summaries(conn, entry.user_ids)
+        self._written = entry.number
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used counts beyond max_keys.
+
+        Only keys whose chunks are all written are dropped, so the database
+        has every record counted in them when they are read back.
+        """
+        for dimension, counts in self._counts.items():
+            last_chunk = self._last_chunk[dimension]
+            while len(counts) > self.max_keys:
+                key = next(iter(counts))
+                if last_chunk[key] > self._written:
+                    break
+                del counts[key]
+                del last_chunk[key]
+
+
+def create_ingest_engine(db_url: str, workers: int) -> Engine:
+    if db_url.startswith("sqlite"):
+        return create_engine(db_url, connect_args={"check_same_thread": False})
+    return create_engine(db_url, pool_size=workers, max_overflow=0, pool_pre_ping=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", help="NDJSON file, or - for stdin")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--method", choices=["auto", *WRITERS], default="auto",
+        help="copy (PostgreSQL only) or executemany; auto picks copy when possible",
+    )
+    parser.add_argument(
+        "--max-keys", type=int, default=DEFAULT_MAX_KEYS,
+        help="Velocity counts kept in memory per dimension",
+    )
+    parser.add_argument("--db-url", default=None, help="Defaults to the service database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_ingest_engine(args.db_url or get_connection_string(), args.workers)
+    ingestor = Ingestor(
+        engine, args.chunk_size, args.workers, args.method, max_keys=args.max_keys
+    )
+    try:
+        if args.path == "-":
+            report = ingestor.run(sys.stdin.buffer)
+        else:
+            with open(args.path, "rb") as lines:
+                report = ingestor.run(lines)
+    finally:
+        engine.dispose()
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
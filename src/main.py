@@ -1,33 +1,139 @@
-from fastapi import FastAPI
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
 
-from src.database.database import Base, setup_database
-from src.routes.fraud_prevention import router as fraud_prevention_router
+from src.database.database import (
+    Base,
+    is_async_mode,
+    setup_async_database,
+    setup_database,
+)
+from src.metrics import get_metrics_pipeline
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.rules import get_rule_engine
+from src.services.velocity import get_velocity_store
+from src.services.write_behind import get_write_behind, shutdown_write_behind
 
-# Initialize database
-engine, _ = setup_database()
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Fraud Prevention API",
-    description="API for fraud prevention and risk assessment",
-    version="1.0.0",
-)
+POOL_TIMEOUT_DETAIL = "Database busy, retry shortly"
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# Include routers
-app.include_router(fraud_prevention_router)
+def create_schema_enabled() -> bool:
+    # Production schemas are managed with Alembic migrations
+    default = "false" if os.getenv("ENVIRONMENT") == "production" else "true"
+    return os.getenv("CREATE_SCHEMA", default) == "true"
+
+
+def warm_up(db: Session) -> None:
+    """Load in-process state and compile hot queries before accepting requests.
+
+    Every worker process runs this in its startup hook, and the server only
+    routes requests to a worker once the hook has finished.
+    """
+    # Warm velocity counters so risk assessment does not hit the database. Off
+    # by default: it scans the table on every worker start, and unless this
+    # process is the single writer, loaded keys are soon reloaded anyway
+    if os.getenv("VELOCITY_WARMUP", "false") == "true":
+        try:
+            get_velocity_store().warm(db)
+        except SQLAlchemyError:
+            logger.warning("Velocity store warmup failed", exc_info=True)
+    if os.getenv("QUERY_WARMUP", "true") == "true":
+        try:
+            FraudPreventionService(db).warm_up()
+        except SQLAlchemyError:
+            logger.warning("Query warmup failed", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile risk rules and configure metrics and the write-behind writer up
+    # front so configuration errors fail startup
+    get_rule_engine()
+    get_metrics_pipeline()
+    get_write_behind()
+
+    # The first database connection is opened here rather than at import,
+    # after the app can already be loaded by the server
+    create_schema = create_schema_enabled()
+    if app.state.async_mode:
+        async_engine, AsyncSessionLocal = setup_async_database()
+        if create_schema:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(warm_up)
+    else:
+        engine, SessionLocal = setup_database()
+        if create_schema:
+            Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            warm_up(db)
+    yield
+    shutdown_write_behind()
+
+
+def debug_endpoints_enabled() -> bool:
+    default = "false" if os.getenv("ENVIRONMENT") == "production" else "true"
+    return os.getenv("DEBUG_ENDPOINTS", default) == "true"
+
+
+def create_app(async_mode: Optional[bool] = None) -> FastAPI:
+    """Build the application; async_mode defaults to the ASYNC_MODE setting."""
+    if async_mode is None:
+        async_mode = is_async_mode()
+
+    app = FastAPI(
+        title="Fraud Prevention API",
+        description="API for fraud prevention and risk assessment",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.async_mode = async_mode
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Include routers, importing only the ones served
+    if async_mode:
+        from src.routes import fraud_prevention_async as routes
+    else:
+        from src.routes import fraud_prevention as routes
+    app.include_router(routes.router)
+    if debug_endpoints_enabled():
+        from src.routes import debug
+
+        app.include_router(debug.router)
+
+    # Every database connection stayed checked out for the whole pool timeout
+    @app.exception_handler(PoolTimeoutError)
+    async def pool_timeout_handler(request: Request, error: PoolTimeoutError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": POOL_TIMEOUT_DETAIL},
+            headers={"Retry-After": "1"},
+        )
+
+    # Health check endpoint
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    return app
 
 
-# Health check endpoint
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+app = create_app()
@@ -1,70 +1,483 @@
+import atexit
+import logging
 import os
-from typing import Optional
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, Optional, Tuple
 
-from opentelemetry import metrics
-from opentelemetry.exporter.cloud_monitoring import CloudMonitoringMetricsExporter
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
-from opentelemetry.sdk.resources import Resource
+if TYPE_CHECKING:
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import MetricReader
 
-# Create a resource to identify our service
-resource = Resource.create(
-    {
+logger = logging.getLogger(__name__)
+
+
+def instance_id() -> str:
+    """Identifies this serving process: the revision, process id and a random suffix.
+
+    Every worker process of every instance exports its own time series, so
+    their cumulative counters never overwrite each other.
+    """
+    return f"{os.getenv('K_REVISION', 'local')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def resource_attributes() -> Dict[str, str]:
+    """Attributes identifying our service and this process."""
+    return {
         "service.name": "fraud-prevention-api",
         "service.namespace": "fraud-prevention",
-        "service.instance.id": os.getenv("K_REVISION", "local"),
+        "service.instance.id": instance_id(),
         "environment": os.getenv("ENVIRONMENT", "development"),
     }
-)
 
-# Initialize the Cloud Monitoring exporter
-exporter = CloudMonitoringMetricsExporter(project_id=os.getenv("GOOGLE_CLOUD_PROJECT"))
 
-# Create a metric reader that will periodically export metrics
-reader = PeriodicExportingMetricReader(
-    exporter,
-    export_interval_millis=10000,  # Export every 10 seconds
-    export_timeout_millis=5000,  # Timeout after 5 seconds
-)
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+GAUGE = "gauge"
+
+# Our metrics: name -> (kind, description, unit)
+INSTRUMENTS = {
+    "fraud_prevention_attempts_total": (
+        COUNTER, "Total number of fraud prevention attempts", "1"
+    ),
+    "fraud_prevention_blocked_total": (
+        COUNTER, "Total number of blocked fraud attempts", "1"
+    ),
+    "fraud_prevention_request_duration_seconds": (
+        HISTOGRAM, "Duration of fraud prevention requests", "s"
+    ),
+    "fraud_prevention_cache_hits_total": (
+        COUNTER, "Total number of record cache hits", "1"
+    ),
+    "fraud_prevention_cache_misses_total": (
+        COUNTER, "Total number of record cache misses", "1"
+    ),
+    "fraud_prevention_cache_evictions_total": (
+        COUNTER, "Total number of record cache entries evicted or expired", "1"
+    ),
+    "fraud_prevention_rule_duration_seconds": (
+        HISTOGRAM, "Time spent evaluating each risk rule", "s"
+    ),
+    "fraud_prevention_stage_duration_seconds": (
+        HISTOGRAM, "Duration of each stage of handling a request", "s"
+    ),
+    "fraud_prevention_write_queue_depth": (
+        HISTOGRAM, "Records waiting in the write-behind queue, sampled per flush", "1"
+    ),
+    "fraud_prevention_write_flush_duration_seconds": (
+        HISTOGRAM, "Duration of each write-behind batch insert and commit", "s"
+    ),
+    "fraud_prevention_write_behind_records_total": (
+        COUNTER, "Records handled by the write-behind writer, by outcome", "1"
+    ),
+    "fraud_prevention_db_pool_in_use": (
+        GAUGE, "Database connections checked out of the pool", "1"
+    ),
+    "fraud_prevention_db_pool_overflow": (
+        GAUGE, "Checked out connections opened beyond the pool size", "1"
+    ),
+    "fraud_prevention_db_pool_waiting": (
+        GAUGE, "Requests waiting for a database connection", "1"
+    ),
+    "fraud_prevention_db_pool_timeouts_total": (
+        COUNTER, "Checkouts that gave up waiting for a database connection", "1"
+    ),
+    "fraud_prevention_db_replica_ejections_total": (
+        COUNTER, "Read replicas taken out of rotation after a connection failure", "1"
+    ),
+    "fraud_prevention_metrics_dropped_total": (
+        COUNTER, "Metric events dropped because the buffer was full", "1"
+    ),
+}
+
+# (instrument name, value, attributes as sorted items)
+Event = Tuple[str, float, Tuple[Tuple[str, str], ...]]
+
+
+# The OpenTelemetry SDK and exporters are imported on first flush, off the
+# request path and out of startup
+
+def _cloud_reader() -> "MetricReader":
+    from opentelemetry.exporter.cloud_monitoring import CloudMonitoringMetricsExporter
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+
+    return PeriodicExportingMetricReader(
+        CloudMonitoringMetricsExporter(project_id=os.getenv("GOOGLE_CLOUD_PROJECT")),
+        export_interval_millis=10000,  # Export every 10 seconds
+        export_timeout_millis=5000,  # Timeout after 5 seconds
+    )
+
+
+def _stdout_reader() -> "MetricReader":
+    from opentelemetry.sdk.metrics.export import (
+        ConsoleMetricExporter,
+        PeriodicExportingMetricReader,
+    )
+
+    return PeriodicExportingMetricReader(
+        ConsoleMetricExporter(), export_interval_millis=10000
+    )
+
+
+def _memory_reader() -> "MetricReader":
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    return InMemoryMetricReader()
+
+
+# Metric readers by METRICS_EXPORTER name; "none" records without exporting
+EXPORTERS: Dict[str, Callable[[], Optional["MetricReader"]]] = {
+    "cloud": _cloud_reader,
+    "stdout": _stdout_reader,
+    "memory": _memory_reader,
+    "none": lambda: None,
+}
+
+
+class MetricsPipeline:
+    """Buffers metric events on the request path and records them in the background.
+
+    ``emit`` only appends to a bounded deque, so it never blocks on a lock,
+    waits on the exporter or raises. A worker thread drains the buffer every
+    ``flush_interval`` seconds (sooner when it is half full), sums counter
+    increments with the same attributes and hands them to the OpenTelemetry
+    instruments; gauges keep only their latest value. When the buffer is
+    full, the ``drop`` policy discards either the new event ("newest") or the
+    oldest buffered one ("oldest"); drops are counted and reported as
+    fraud_prevention_metrics_dropped_total.
+    """
+
+    def __init__(
+        self,
+        reader_factory: Callable[[], Optional["MetricReader"]],
+        max_events: int = 10_000,
+        flush_interval: float = 1.0,
+        drop: str = "newest",
+    ):
+        if drop not in ("newest", "oldest"):
+            raise ValueError(f"Unknown metrics drop policy: {drop}")
+        self.reader_factory = reader_factory
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.drop = drop
+        self.dropped = 0
+        self.reader: Optional["MetricReader"] = None
+        self._events: Deque[Event] = deque()
+        self._reported_drops = 0
+        self._provider: Optional["MeterProvider"] = None
+        self._instruments: Dict[str, object] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def emit(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        if self._worker is None:
+            self._start()
+        if len(self._events) >= self.max_events:
+            self.dropped += 1
+            if self.drop == "newest":
+                return
+            try:
+                self._events.popleft()
+            except IndexError:
+                pass
+        self._events.append((name, value, tuple(sorted(attributes.items()))))
+        if len(self._events) >= self.max_events // 2:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Record buffered events on the instruments."""
+        with self._flush_lock:
+            try:
+                self._setup()
+                counters: Dict[Tuple[str, tuple], float] = defaultdict(float)
+                gauges: Dict[Tuple[str, tuple], float] = {}
+                histograms = []
+                # Bounded so a busy producer cannot keep the worker here forever
+                for _ in range(len(self._events)):
+                    name, value, attributes = self._events.popleft()
+                    kind = INSTRUMENTS[name][0]
+                    if kind == COUNTER:
+                        counters[(name, attributes)] += value
+                    elif kind == GAUGE:
+                        gauges[(name, attributes)] = value
+                    else:
+                        histograms.append((name, value, attributes))
+
+                dropped, self._reported_drops = (
+                    self.dropped - self._reported_drops,
+                    self.dropped,
+                )
+                if dropped:
+                    counters[("fraud_prevention_metrics_dropped_total", ())] += dropped
+
+                # Metrics whose instrument could not be created are skipped
+                instruments = self._instruments
+                for (name, attributes), total in counters.items():
+                    if name in instruments:
+                        instruments[name].add(total, dict(attributes))
+                for (name, attributes), value in gauges.items():
+                    if name in instruments:
+                        instruments[name].set(value, dict(attributes))
+                for name, value, attributes in histograms:
+                    if name in instruments:
+                        instruments[name].record(value, dict(attributes))
+            except Exception:
+                logger.warning("Failed to record metrics", exc_info=True)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join(timeout=5)
+        self.flush()
+        if self._provider is not None:
+            self._provider.shutdown()
+
+    def _setup(self) -> None:
+        if self._provider is not None:
+            return
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.resources import OTELResourceDetector, Resource
+
+        try:
+            self.reader = self.reader_factory()
+        except Exception:
+            logger.warning(
+                "Metrics exporter unavailable; metrics will not be exported",
+                exc_info=True,
+            )
+            self.reader = None
+        readers = [self.reader] if self.reader is not None else []
+        # Not Resource.create(): it runs detectors on a thread pool, which cannot
+        # start once the interpreter is exiting, when a short-lived process may
+        # flush for the first time
+        resource = OTELResourceDetector().detect().merge(
+            Resource(resource_attributes())
+        )
+        # Shut down by the pipeline, after its final flush
+        self._provider = MeterProvider(
+            metric_readers=readers, resource=resource, shutdown_on_exit=False
+        )
+        meter = self._provider.get_meter("fraud-prevention")
+        for name, (kind, description, unit) in INSTRUMENTS.items():
+            try:
+                # create_counter, create_histogram or create_gauge
+                factory = getattr(meter, f"create_{kind}")
+                self._instruments[name] = factory(
+                    name=name, description=description, unit=unit
+                )
+            except Exception:
+                logger.error(
+                    "Cannot create metric %s; it will not be recorded", name, exc_info=True
+                )
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="metrics-pipeline", daemon=True
+            )
+            self._worker.start()
+            atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        # Build the provider right away, so a short-lived process does not
+        # first import the SDK while exiting
+        self.flush()
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def _build_pipeline() -> MetricsPipeline:
+    exporter = os.getenv("METRICS_EXPORTER", "cloud")
+    if exporter not in EXPORTERS:
+        raise ValueError(f"Unknown METRICS_EXPORTER: {exporter}")
+    return MetricsPipeline(
+        EXPORTERS[exporter],
+        max_events=int(os.getenv("METRICS_BUFFER_SIZE", "10000")),
+        flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "1")),
+        drop=os.getenv("METRICS_DROP_POLICY", "newest"),
+    )
+
 
-# Create a meter provider with our reader
-provider = MeterProvider(metric_readers=[reader], resource=resource)
+_pipeline: Optional[MetricsPipeline] = None
 
-# Set the global meter provider
-metrics.set_meter_provider(provider)
 
-# Create a meter to record metrics
-meter = metrics.get_meter("fraud-prevention")
+def get_metrics_pipeline() -> MetricsPipeline:
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = _build_pipeline()
+    return _pipeline
 
-# Define our metrics
-fraud_prevention_attempts = meter.create_counter(
-    name="fraud_prevention_attempts_total",
-    description="Total number of fraud prevention attempts",
-    unit="1",
-)
 
-fraud_prevention_blocked = meter.create_counter(
-    name="fraud_prevention_blocked_total",
-    description="Total number of blocked fraud attempts",
-    unit="1",
-)
+def set_metrics_pipeline(pipeline: Optional[MetricsPipeline]) -> None:
+    """Replace the process-wide pipeline; None rebuilds it from configuration on next use."""
+    global _pipeline
+    _pipeline = pipeline
 
-fraud_prevention_request_duration = meter.create_histogram(
-    name="fraud_prevention_request_duration_seconds",
-    description="Duration of fraud prevention requests",
-    unit="s",
-)
+
+def _reset_after_fork() -> None:
+    """A forked worker builds its own pipeline, with its own instance id.
+
+    The parent's buffered events and exit hook stay with the parent, so the
+    child neither exports them twice nor waits on a worker thread it lacks.
+    """
+    global _pipeline
+    if _pipeline is not None:
+        atexit.unregister(_pipeline.shutdown)
+    _pipeline = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class StageTimings:
+    """The most recent durations of each stage, summarized as percentiles."""
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, max_samples: int = 2048):
+        self.max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def record(self, stage: str, duration: float) -> None:
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples.setdefault(stage, deque(maxlen=self.max_samples))
+        samples.append(duration)
+        self._counts[stage] += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Nearest-rank percentiles in seconds over each stage's recent samples."""
+        summary = {}
+        for stage, samples in list(self._samples.items()):
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            stats = {"count": self._counts[stage], "samples": len(ordered)}
+            for percentile in self.PERCENTILES:
+                rank = max(0, -(-percentile * len(ordered) // 100) - 1)
+                stats[f"p{percentile}"] = round(ordered[rank], 6)
+            stats["max"] = round(ordered[-1], 6)
+            summary[stage] = stats
+        return summary
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._counts.clear()
+
+
+stage_timings = StageTimings(int(os.getenv("STAGE_TIMING_SAMPLES", "2048")))
 
 
 # Helper functions to record metrics
 def record_attempt(success: bool, duration: float, risk_level: Optional[str] = None):
     """Record a fraud prevention attempt with its outcome and duration."""
     attributes = {"success": str(success), "risk_level": risk_level or "unknown"}
-    fraud_prevention_attempts.add(1, attributes)
-    fraud_prevention_request_duration.record(duration, attributes)
+    pipeline = get_metrics_pipeline()
+    pipeline.emit("fraud_prevention_attempts_total", 1, attributes)
+    pipeline.emit("fraud_prevention_request_duration_seconds", duration, attributes)
 
 
 def record_blocked(risk_level: Optional[str] = None):
     """Record a blocked fraud attempt."""
     attributes = {"risk_level": risk_level or "unknown"}
-    fraud_prevention_blocked.add(1, attributes)
+    get_metrics_pipeline().emit("fraud_prevention_blocked_total", 1, attributes)
+
+
+def record_cache_hit(cache: str):
+    """Record a cache lookup answered from the cache."""
+    get_metrics_pipeline().emit("fraud_prevention_cache_hits_total", 1, {"cache": cache})
+
+
+def record_cache_miss(cache: str):
+    """Record a cache lookup that fell through to the database."""
+    get_metrics_pipeline().emit("fraud_prevention_cache_misses_total", 1, {"cache": cache})
+
+
+def record_cache_eviction(cache: str, reason: str):
+    """Record a cache entry removed for capacity ("size") or age ("expired")."""
+    get_metrics_pipeline().emit(
+        "fraud_prevention_cache_evictions_total", 1, {"cache": cache, "reason": reason}
+    )
+
+
+def record_rule_timings(timings: Dict[str, float]):
+    """Record the evaluation time of each risk rule run for a request."""
+    pipeline = get_metrics_pipeline()
+    for rule, duration in timings.items():
+        pipeline.emit("fraud_prevention_rule_duration_seconds", duration, {"rule": rule})
+
+
+def record_write_flush(
+    depth: int, duration: float, written: int, duplicates: int, failed: int
+):
+    """Record one write-behind flush and the queue depth when it started."""
+    pipeline = get_metrics_pipeline()
+    pipeline.emit("fraud_prevention_write_queue_depth", depth, {})
+    pipeline.emit("fraud_prevention_write_flush_duration_seconds", duration, {})
+    for outcome, count in (
+        ("written", written), ("duplicate", duplicates), ("failed", failed)
+    ):
+        if count:
+            pipeline.emit(
+                "fraud_prevention_write_behind_records_total", count, {"outcome": outcome}
+            )
+
+
+def record_write_rejected():
+    """Record a create rejected because the write-behind queue was full."""
+    get_metrics_pipeline().emit(
+        "fraud_prevention_write_behind_records_total", 1, {"outcome": "rejected"}
+    )
+
+
+def record_pool_state(pool: str, in_use: int, overflow: int, waiting: int):
+    """Record how many connections a pool has checked out and how many callers wait."""
+    pipeline = get_metrics_pipeline()
+    attributes = {"pool": pool}
+    pipeline.emit("fraud_prevention_db_pool_in_use", in_use, attributes)
+    pipeline.emit("fraud_prevention_db_pool_overflow", overflow, attributes)
+    pipeline.emit("fraud_prevention_db_pool_waiting", waiting, attributes)
+
+
+def record_pool_timeout(pool: str):
+    """Record a checkout that timed out waiting for a connection."""
+    get_metrics_pipeline().emit(
+        "fraud_prevention_db_pool_timeouts_total", 1, {"pool": pool}
+    )
+
+
+def record_replica_ejection(replica: str):
+    """Record a read replica skipped after failing, labelled by its position."""
+    get_metrics_pipeline().emit(
+        "fraud_prevention_db_replica_ejections_total", 1, {"replica": replica}
+    )
+
+
+def record_stage(stage: str, duration: float):
+    """Record the duration of one stage of handling a request."""
+    stage_timings.record(stage, duration)
+    get_metrics_pipeline().emit(
+        "fraud_prevention_stage_duration_seconds", duration, {"stage": stage}
+    )
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a request stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
@@ -4,7 +4,7 @@ from typing import Optional
 
 from sqlalchemy import JSON, Boolean, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import Integer, String
+from sqlalchemy import Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.database.database import Base
@@ -19,6 +19,17 @@ class RiskLevel(str, Enum):
 
 class FraudPrevention(Base):
     __tablename__ = "fraud_prevention"
+    __table_args__ = (
+        # Lookups by transaction id; also guarantees one record per transaction
+        Index("ix_fraud_prevention_transaction_id", "transaction_id", unique=True),
+        # User history and per-user attempt counts, newest first; id breaks ties
+        # for keyset pagination of a user's history
+        Index(
+            "ix_fraud_prevention_user_id_created_at_id", "user_id", "created_at", "id"
+        ),
+        # Listing ordered by creation time; id breaks ties for keyset pagination
+        Index("ix_fraud_prevention_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     transaction_id: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -36,3 +47,45 @@ class FraudPrevention(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+
+
+class FraudPreventionArchive(Base):
+    """Where each record moved out of fraud_prevention by retention is stored."""
+
+    __tablename__ = "fraud_prevention_archive"
+    __table_args__ = (
+        # Creates check it too, so a transaction id is never reused after archiving
+        Index(
+            "ix_fraud_prevention_archive_transaction_id", "transaction_id", unique=True
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    transaction_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Archive file holding the record, relative to the archive directory
+    path: Mapped[str] = mapped_column(String(512), nullable=False)
+
+
+class UserRiskSummary(Base):
+    """Per-user aggregates of fraud_prevention, kept up to date by every write."""
+
+    __tablename__ = "user_risk_summary"
+
+    user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    attempt_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    blocked_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_seen: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Level of the user's latest record
+    risk_level: Mapped[RiskLevel] = mapped_column(SQLEnum(RiskLevel), nullable=False)
+    # Per velocity window: the current bucket (epoch seconds // window width),
+    # the records created in it and the records created in the bucket before
+    bucket_1m: Mapped[int] = mapped_column(Integer, nullable=False)
+    count_1m: Mapped[int] = mapped_column(Integer, nullable=False)
+    previous_1m: Mapped[int] = mapped_column(Integer, nullable=False)
+    bucket_1h: Mapped[int] = mapped_column(Integer, nullable=False)
+    count_1h: Mapped[int] = mapped_column(Integer, nullable=False)
+    previous_1h: Mapped[int] = mapped_column(Integer, nullable=False)
+    bucket_24h: Mapped[int] = mapped_column(Integer, nullable=False)
+    count_24h: Mapped[int] = mapped_column(Integer, nullable=False)
+    previous_24h: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,47 @@
+"""Recompute every user's risk summary from the fraud_prevention table.
+
+Usage: python -m src.rebuild_summaries [--db-url URL]
+
+Run after rolling out the migration that adds user_risk_summary, to count
+creates made while it ran, and whenever the summaries are suspected to have
+drifted. The table is replaced in one
+transaction. Creates committed while it runs can be missed, so prefer a quiet
+period. Records moved out by retention are no longer counted.
+"""
+import argparse
+import json
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.database.database import get_connection_string
+from src.services.risk_summary import rebuild_summaries
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db-url", default=None, help="Defaults to the service database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(args.db_url or get_connection_string())
+    start = time.perf_counter()
+    try:
+        with Session(engine) as db:
+            users = rebuild_summaries(db)
+    finally:
+        engine.dispose()
+    print(
+        json.dumps(
+            {"users": users, "seconds": round(time.perf_counter() - start, 3)}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Re-score stored records with the current risk rules.
+
+Usage: python -m src.rescore [--chunk-size 50000] [--dry-run] [--db-url URL]
+
+Each record is scored against the records that preceded it, as it was when it
+was created: velocity counts are cumulative per key in (created_at, id) order
+and windows end at the record's created_at. Counts and rule matches are
+computed with NumPy over the whole table, then changed risk levels are written
+back in bulk UPDATEs, and user risk summaries are rebuilt. Blocked records
+keep their level.
+"""
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+from src.database.database import get_connection_string
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.services.risk_summary import rebuild_summaries
+from src.services.rules import LEVELS, RuleEngine, get_rule_engine
+from src.services.velocity import WINDOWS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+@dataclass
+class RecordArrays:
+    """Columns needed for scoring, one array element per record."""
+
+    ids: np.ndarray
+    # Milliseconds since the epoch
+    created_ms: np.ndarray
+    # Object arrays of key strings, None where the record has no key
+    keys: Dict[str, np.ndarray]
+    # additionalData values per field, NaN where missing or not numeric
+    amounts: Dict[str, np.ndarray]
+    is_blocked: np.ndarray
+    # Index into LEVELS
+    levels: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _amount(data: Optional[Dict[str, Any]], field: str) -> float:
+    value = (data or {}).get(field)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def load_records(
+    db: Session, engine: RuleEngine, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> RecordArrays:
+    """Read records in (created_at, id) order, converting each chunk to arrays."""
+    dimensions = sorted(
+        {spec["dimension"] for spec in engine.specs if "dimension" in spec}
+    )
+    fields = sorted(
+        {spec.get("field", "amount") for spec in engine.specs if spec["type"] == "amount"}
+    )
+    columns = [FraudPrevention.id, FraudPrevention.created_at, FraudPrevention.is_blocked]
+    columns += [FraudPrevention.risk_level]
+    columns += [getattr(FraudPrevention, dimension) for dimension in dimensions]
+    if fields:
+        columns.append(FraudPrevention.additional_data)
+    stmt = (
+        select(*columns)
+        .order_by(FraudPrevention.created_at, FraudPrevention.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    chunks: Dict[str, List[np.ndarray]] = {}
+
+    def add(name: str, array: np.ndarray) -> None:
+        chunks.setdefault(name, []).append(array)
+
+    for partition in db.execute(stmt).partitions():
+        rows = list(zip(*partition))
+        add("ids", np.array(rows[0], dtype=object))
+        add("created_ms", np.array(rows[1], dtype="datetime64[ms]").astype(np.int64))
+        add("is_blocked", np.array(rows[2], dtype=bool))
+        add("levels", np.array([LEVELS.index(level) for level in rows[3]], dtype=np.int8))
+        for offset, dimension in enumerate(dimensions, start=4):
+            add(f"key:{dimension}", np.array(rows[offset], dtype=object))
+        for field in fields:
+            add(f"amount:{field}", np.array([_amount(data, field) for data in rows[-1]]))
+
+    if not chunks:
+        empty = np.array([], dtype=object)
+        return RecordArrays(
+            ids=empty,
+            created_ms=np.array([], dtype=np.int64),
+            keys={dimension: empty for dimension in dimensions},
+            amounts={field: np.array([]) for field in fields},
+            is_blocked=np.array([], dtype=bool),
+            levels=np.array([], dtype=np.int8),
+        )
+    arrays = {name: np.concatenate(parts) for name, parts in chunks.items()}
+    return RecordArrays(
+        ids=arrays["ids"],
+        created_ms=arrays["created_ms"],
+        keys={dimension: arrays[f"key:{dimension}"] for dimension in dimensions},
+        amounts={field: arrays[f"amount:{field}"] for field in fields},
+        is_blocked=arrays["is_blocked"],
+        levels=arrays["levels"],
+    )
+
+
+def velocity_counts(keys: np.ndarray, created_ms: np.ndarray) -> Dict[str, np.ndarray]:
+    """Previous records with the same key, in total and per window, for each record.
+
+    ``created_ms`` must be ascending. Records without a key get -1.
+    """
+    present = np.flatnonzero(np.not_equal(keys, None))
+    counts = {name: np.full(len(keys), -1, dtype=np.int64) for name in ["total", *WINDOWS]}
+    if not len(present):
+        return counts
+
+    _, codes = np.unique(keys[present].astype(str), return_inverse=True)
+    # A stable sort by key keeps each key's records in time order
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    sorted_ms = created_ms[present][order]
+    positions = np.arange(len(order))
+    group_starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+    targets = present[order]
+    counts["total"][targets] = positions - group_starts[sorted_codes]
+
+    # Lay keys out on one axis, far enough apart that no window spans two keys
+    widths = {name: seconds * 1000 for name, seconds in WINDOWS.items()}
+    base = sorted_ms.min()
+    spacing = int(sorted_ms.max() - base) + max(widths.values()) + 1
+    if (int(sorted_codes[-1]) + 1) * spacing >= np.iinfo(np.int64).max:
+        raise ValueError("Time range too wide to score in one pass")
+    axis = sorted_codes.astype(np.int64) * spacing + (sorted_ms - base)
+    for name, width in widths.items():
+        first_in_window = np.searchsorted(axis, axis - width, side="right")
+        counts[name][targets] = positions - first_in_window
+    return counts
+
+
+def score(records: RecordArrays, engine: RuleEngine) -> np.ndarray:
+    """Risk level index per record: the most severe level among matching rules."""
+    levels = np.zeros(len(records), dtype=np.int8)
+    counts = {
+        dimension: velocity_counts(records.keys[dimension], records.created_ms)
+        for dimension in engine.dimensions
+    }
+    for spec in engine.specs:
+        if spec["type"] == "velocity":
+            window_counts = counts[spec["dimension"]][spec.get("window", "total")]
+            matched = window_counts >= int(spec["threshold"])
+        elif spec["type"] == "amount":
+            with np.errstate(invalid="ignore"):
+                matched = records.amounts[spec.get("field", "amount")] >= float(
+                    spec["threshold"]
+                )
+        else:
+            keys = records.keys[spec["dimension"]]
+            present = np.not_equal(keys, None)
+            matched = np.zeros(len(records), dtype=bool)
+            matched[present] = np.isin(keys[present].astype(str), list(spec["values"]))
+        level = LEVELS.index(RiskLevel(spec["level"]))
+        levels[matched & (levels < level)] = level
+    # Blocking sets a record to critical regardless of its score
+    return np.where(records.is_blocked, records.levels, levels)
+
+
+def write_levels(
+    db: Session,
+    ids: np.ndarray,
+    levels: np.ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """Bulk UPDATE risk levels by primary key, committing per chunk."""
+    now = datetime.utcnow()
+    for start in range(0, len(ids), chunk_size):
+        db.execute(
+            update(FraudPrevention),
+            [
+                {"id": fraud_id, "risk_level": LEVELS[level], "updated_at": now}
+                for fraud_id, level in zip(
+                    ids[start:start + chunk_size], levels[start:start + chunk_size]
+                )
+            ],
+        )
+        db.commit()
+
+
+def rescore(
+    db: Session,
+    engine: Optional[RuleEngine] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    engine = engine if engine is not None else get_rule_engine()
+    timings = {}
+
+    start = time.perf_counter()
+    records = load_records(db, engine, chunk_size)
+    timings["load_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    levels = score(records, engine)
+    changed = np.flatnonzero(levels != records.levels)
+    timings["score_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if not dry_run:
+        write_levels(db, records.ids[changed], levels[changed], chunk_size)
+        rebuild_summaries(db)
+    timings["write_seconds"] = time.perf_counter() - start
+
+    counts = np.bincount(levels, minlength=len(LEVELS))
+    return {
+        "records": len(records),
+        "changed": len(changed),
+        "levels": {level.value: int(count) for level, count in zip(LEVELS, counts)},
+        "dry_run": dry_run,
+        **{name: round(seconds, 3) for name, seconds in timings.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report changes without writing them"
+    )
+    parser.add_argument("--db-url", default=None, help="Defaults to the service database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(args.db_url or get_connection_string())
+    try:
+        with Session(engine) as db:
+            report = rescore(db, chunk_size=args.chunk_size, dry_run=args.dry_run)
+    finally:
+        engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Move records older than the retention period to the archive.
+
+Usage: python -m src.retention [--days 365] [--archive-dir archive]
+       [--chunk-size 5000] [--dry-run] [--interval SECONDS] [--db-url URL]
+
+Records are moved oldest first, a chunk at a time. Each chunk is written to
+gzipped NDJSON files, one per month of creation, and is then indexed in
+fraud_prevention_archive and deleted from fraud_prevention in one
+transaction. A run that stops between the two leaves the records in place,
+and the next run archives them again. With --interval the job repeats until
+stopped.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from src.database.database import get_connection_string
+from src.models.fraud_prevention import FraudPrevention, FraudPreventionArchive
+from src.services.archive import Archive, archive_dir
+from src.services.serialization import RESPONSE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def retention_days() -> int:
+    return int(os.getenv("RETENTION_DAYS", "365"))
+
+
+def archive_records(
+    db: Session,
+    archive: Archive,
+    before: datetime,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Archive and delete every record created before ``before``."""
+    old = FraudPrevention.created_at < before
+    if dry_run:
+        records, oldest = db.execute(
+            select(func.count(), func.min(FraudPrevention.created_at)).where(old)
+        ).one()
+        return {
+            "before": before.isoformat(),
+            "records": records,
+            "oldest": oldest.isoformat() if oldest else None,
+            "dry_run": True,
+        }
+
+    start = time.perf_counter()
+    records = files = 0
+    stmt = (
+        select(*RESPONSE_COLUMNS)
+        .where(old)
+        .order_by(FraudPrevention.created_at, FraudPrevention.id)
+        .limit(chunk_size)
+    )
+    while rows := db.execute(stmt).all():
+        months: Dict[str, List] = {}
+        for row in rows:
+            months.setdefault(f"{row.created_at:%Y-%m}", []).append(row)
+        entries = []
+        for month, month_rows in months.items():
+            first = month_rows[0]
+            path = archive.write(
+                month, f"{first.created_at:%Y%m%dT%H%M%S}-{first.id}", month_rows
+            )
+            entries += [
+                {
+                    "id": row.id,
+                    "transaction_id": row.transaction_id,
+                    "created_at": row.created_at,
+                    "path": path,
+                }
+                for row in month_rows
+            ]
+        db.execute(insert(FraudPreventionArchive), entries)
+        db.execute(
+            delete(FraudPrevention).where(
+                FraudPrevention.id.in_([row.id for row in rows])
+            )
+        )
+        db.commit()
+        records += len(rows)
+        files += len(months)
+        logger.info("Archived %d records", records)
+
+    return {
+        "before": before.isoformat(),
+        "records": records,
+        "files": files,
+        "dry_run": False,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--days", type=int, default=retention_days(), help="Records kept in the table"
+    )
+    parser.add_argument("--archive-dir", default=archive_dir())
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report what would be archived"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=None, help="Seconds between runs"
+    )
+    parser.add_argument("--db-url", default=None, help="Defaults to the service database")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    archive = Archive(args.archive_dir)
+    engine = create_engine(args.db_url or get_connection_string())
+    try:
+        while True:
+            before = datetime.utcnow() - timedelta(days=args.days)
+            with Session(engine) as db:
+                report = archive_records(
+                    db, archive, before, args.chunk_size, args.dry_run
+                )
+            print(json.dumps(report, indent=2), flush=True)
+            if args.interval is None:
+                break
+            time.sleep(args.interval)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+from typing import Dict
+
+from fastapi import APIRouter
+
+from src.metrics import stage_timings
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/timings", response_model=Dict[str, Dict[str, float]])
+def get_timings():
+    """Percentiles of recent durations per request stage, in seconds."""
+    return stage_timings.summary()
+
+
+@router.delete("/timings", status_code=204)
+def clear_timings():
+    stage_timings.clear()
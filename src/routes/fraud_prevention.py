@@ -1,44 +1,329 @@
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
-from src.database.database import get_db
+from src.database.database import get_db, get_session_factory
+from src.metrics import timed_stage
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
 from src.schemas.fraud_prevention import (
+    BatchCreateResponse,
+    BatchItemResult,
     BlockTransactionRequest,
+    BulkBlockRequest,
+    BulkBlockResponse,
     FraudPreventionCreate,
     FraudPreventionResponse,
     FraudPreventionUpdate,
+    UserSummaryResponse,
 )
-from src.services.fraud_prevention import FraudPreventionService
+from src.services.export import MEDIA_TYPES, ExportFormat, render
+from src.services.fraud_prevention import (
+    BLOCK_LIMIT,
+    DuplicateTransactionError,
+    FraudPreventionService,
+)
+from src.services.pagination import (
+    Cursor,
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+)
+from src.services.serialization import json_response, record_dicts
+from src.services.write_behind import WriteBehindFullError
 
 router = APIRouter(prefix="/api/fraud-preventions", tags=["fraud-prevention"])
 
+MAX_BATCH_SIZE = 1000
+MAX_HISTORY_LIMIT = 1000
+
+DUPLICATE_TRANSACTION_DETAIL = "Fraud prevention record already exists for this transaction"
+WRITE_BEHIND_FULL_DETAIL = "Too many records waiting to be saved; retry shortly"
 
-@router.post("", response_model=FraudPreventionResponse)
+IDEMPOTENCY_KEY_DESCRIPTION = (
+    "Client key for retries; a repeated key returns the record created by the first "
+    "request. Without it, retries are matched by transactionId"
+)
+CURSOR_DESCRIPTION = (
+    "Opaque nextCursor from a previous response; switches to keyset pagination"
+)
+HISTORY_CURSOR_DESCRIPTION = (
+    "X-Next-Cursor header from a previous response, to fetch older records"
+)
+INCLUDE_TOTAL_DESCRIPTION = (
+    "Include the total count. Exact and on by default for page-based requests; "
+    "approximate and off by default for cursor-based requests"
+)
+
+# Documents the body that create_payload parses
+CREATE_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": FraudPreventionCreate.model_json_schema(by_alias=True)
+            }
+        },
+    }
+}
+
+
+async def create_payload(request: Request) -> FraudPreventionCreate:
+    """Parse and validate a create request body, timed as the validation stage."""
+    body = await request.body()
+    with timed_stage("validation"):
+        try:
+            return FraudPreventionCreate.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+            )
+
+
+@router.post("", response_model=FraudPreventionResponse, openapi_extra=CREATE_BODY)
 def create_fraud_prevention(
-    fraud_data: FraudPreventionCreate, db: Session = Depends(get_db)
+    fraud_data: FraudPreventionCreate = Depends(create_payload),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", description=IDEMPOTENCY_KEY_DESCRIPTION
+    ),
+    db: Session = Depends(get_db),
+):
+    service = FraudPreventionService(db)
+    try:
+        fraud, created = service.create_or_get(fraud_data, idempotency_key)
+    except DuplicateTransactionError:
+        raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+    except WriteBehindFullError:
+        raise HTTPException(
+            status_code=503, detail=WRITE_BEHIND_FULL_DETAIL, headers={"Retry-After": "1"}
+        )
+    return timed_response(fraud, replayed=not created)
+
+
+def timed_response(fraud: FraudPrevention, replayed: bool = False) -> JSONResponse:
+    """Render a record as the response_model would, timed as the serialization stage."""
+    with timed_stage("serialization"):
+        return JSONResponse(
+            FraudPreventionResponse.model_validate(fraud).model_dump(
+                mode="json", by_alias=True
+            ),
+            headers={"Idempotent-Replayed": "true"} if replayed else None,
+        )
+
+
+def validate_batch(
+    items: List[Any],
+) -> Tuple[List[BatchItemResult], List[Tuple[int, FraudPreventionCreate]]]:
+    """Validate batch items one by one, returning failures and the valid items."""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=422, detail=f"Batch size exceeds {MAX_BATCH_SIZE} items"
+        )
+
+    failures: List[BatchItemResult] = []
+    valid = []
+    with timed_stage("validation"):
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, FraudPreventionCreate.model_validate(item)))
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_context=False)
+                failures.append(
+                    BatchItemResult(index=index, success=False, errors=errors)
+                )
+    return failures, valid
+
+
+def reject_duplicates(
+    failures: List[BatchItemResult],
+    valid: List[Tuple[int, FraudPreventionCreate]],
+    existing: Set[str],
+) -> Tuple[List[BatchItemResult], List[Tuple[int, FraudPreventionCreate]]]:
+    """Fail items whose transaction id already exists or repeats within the batch."""
+    seen = set(existing)
+    accepted = []
+    for index, fraud_data in valid:
+        if fraud_data.transaction_id in seen:
+            error = {
+                "type": "duplicate",
+                "loc": ["transactionId"],
+                "msg": DUPLICATE_TRANSACTION_DETAIL,
+            }
+            failures.append(BatchItemResult(index=index, success=False, errors=[error]))
+        else:
+            seen.add(fraud_data.transaction_id)
+            accepted.append((index, fraud_data))
+    return failures, accepted
+
+
+def batch_response(
+    failures: List[BatchItemResult],
+    valid: List[Tuple[int, FraudPreventionCreate]],
+    frauds: List[FraudPrevention],
+) -> BatchCreateResponse:
+    results = failures + [
+        BatchItemResult(
+            index=index, success=True, data=FraudPreventionResponse.model_validate(fraud)
+        )
+        for (index, _), fraud in zip(valid, frauds)
+    ]
+    results.sort(key=lambda result: result.index)
+    return BatchCreateResponse(
+        results=results, created=len(frauds), failed=len(failures)
+    )
+
+
+def page_response(
+    frauds: List[Row], total: Optional[int], page: int, limit: int
+) -> Response:
+    response = {
+        "data": record_dicts(frauds),
+        "page": page,
+        "nextCursor": None,
+    }
+    if total is not None:
+        response["total"] = total
+        response["pages"] = (total + limit - 1) // limit
+        has_more = (page - 1) * limit + len(frauds) < total
+    else:
+        has_more = len(frauds) == limit
+    if frauds and has_more:
+        response["nextCursor"] = encode_cursor(frauds[-1])
+    return json_response(response)
+
+
+def cursor_response(
+    frauds: List[Row], has_more: bool, total: Optional[int]
+) -> Response:
+    response = {
+        "data": record_dicts(frauds),
+        "nextCursor": encode_cursor(frauds[-1]) if has_more else None,
+    }
+    if total is not None:
+        response["total"] = total
+        response["totalIsApproximate"] = True
+    return json_response(response)
+
+
+def bulk_block_response(
+    frauds: List[FraudPrevention], block_data: BulkBlockRequest
+) -> BulkBlockResponse:
+    return BulkBlockResponse(
+        blocked=len(frauds),
+        more=block_data.user_id is not None and len(frauds) == BLOCK_LIMIT,
+        data=[FraudPreventionResponse.model_validate(fraud) for fraud in frauds],
+    )
+
+
+def history_window(
+    since: Optional[datetime] = Query(
+        None, description="Only records created at or after this time"
+    ),
+    until: Optional[datetime] = Query(
+        None, description="Only records created before this time"
+    ),
+) -> Dict[str, Any]:
+    return {"since": since, "until": until}
+
+
+def user_history_response(frauds: List[Row], has_more: bool) -> Response:
+    headers = {"X-Next-Cursor": encode_cursor(frauds[-1])} if has_more else None
+    return json_response(record_dicts(frauds), headers=headers)
+
+
+def export_filters(
+    created_from: Optional[datetime] = Query(None, alias="createdFrom"),
+    created_to: Optional[datetime] = Query(None, alias="createdTo"),
+    risk_level: Optional[RiskLevel] = Query(None, alias="riskLevel"),
+    is_blocked: Optional[bool] = Query(None, alias="isBlocked"),
+) -> Dict[str, Any]:
+    return {
+        "created_from": created_from,
+        "created_to": created_to,
+        "risk_level": risk_level,
+        "is_blocked": is_blocked,
+    }
+
+
+def export_headers(export_format: ExportFormat) -> Dict[str, str]:
+    return {
+        "Content-Disposition": (
+            f'attachment; filename="fraud-preventions.{export_format.value}"'
+        )
+    }
+
+
+def parse_cursor(cursor: str) -> Cursor:
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.post("/batch", response_model=BatchCreateResponse)
+def create_fraud_prevention_batch(
+    items: List[Any] = Body(...), db: Session = Depends(get_db)
 ):
+    failures, valid = validate_batch(items)
     service = FraudPreventionService(db)
-    return service.create(fraud_data)
+    existing = service.existing_transaction_ids(
+        [fraud_data.transaction_id for _, fraud_data in valid]
+    )
+    failures, valid = reject_duplicates(failures, valid, existing)
+    try:
+        frauds = service.create_batch([fraud_data for _, fraud_data in valid])
+    except DuplicateTransactionError:
+        raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+    return batch_response(failures, valid, frauds)
 
 
 @router.get("", response_model=Dict[str, Any])
 def get_all_fraud_preventions(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: Optional[bool] = Query(
+        None, alias="includeTotal", description=INCLUDE_TOTAL_DESCRIPTION
+    ),
     db: Session = Depends(get_db),
 ):
     service = FraudPreventionService(db)
+    if cursor is not None:
+        frauds, has_more = service.get_page(cursor=parse_cursor(cursor), limit=limit)
+        total = service.get_approximate_total() if include_total else None
+        return cursor_response(frauds, has_more, total)
+
     skip = (page - 1) * limit
-    frauds, total = service.get_all(skip=skip, limit=limit)
+    frauds, total = service.get_all(
+        skip=skip, limit=limit, with_total=include_total is not False
+    )
+    return page_response(frauds, total, page, limit)
 
-    return {
-        "data": [FraudPreventionResponse.model_validate(fraud) for fraud in frauds],
-        "total": total,
-        "page": page,
-        "pages": (total + limit - 1) // limit,
-    }
+
+@router.get("/export")
+def export_fraud_preventions(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    filters: Dict[str, Any] = Depends(export_filters),
+    session_factory=Depends(get_session_factory),
+):
+    # The session outlives the request handler, so it is opened by the stream itself
+    def stream():
+        db = session_factory()
+        try:
+            yield from render(FraudPreventionService(db).export_rows(**filters), export_format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=MEDIA_TYPES[export_format],
+        headers=export_headers(export_format),
+    )
 
 
 @router.get("/{fraud_id}", response_model=FraudPreventionResponse)
@@ -60,10 +345,31 @@ def get_by_transaction_id(transaction_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/user/{user_id}", response_model=List[FraudPreventionResponse])
-def get_by_user_id(user_id: str, db: Session = Depends(get_db)):
+def get_by_user_id(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    cursor: Optional[str] = Query(None, description=HISTORY_CURSOR_DESCRIPTION),
+    window: Dict[str, Any] = Depends(history_window),
+    db: Session = Depends(get_db),
+):
+    service = FraudPreventionService(db)
+    frauds, has_more = service.get_user_page(
+        user_id,
+        cursor=parse_cursor(cursor) if cursor is not None else None,
+        limit=limit,
+        **window,
+    )
+    return user_history_response(frauds, has_more)
+
+
+@router.get("/user/{user_id}/summary", response_model=UserSummaryResponse)
+def get_user_summary(
+    user_id: str,
+    window: Dict[str, Any] = Depends(history_window),
+    db: Session = Depends(get_db),
+):
     service = FraudPreventionService(db)
-    frauds = service.get_by_user_id(user_id)
-    return [FraudPreventionResponse.model_validate(fraud) for fraud in frauds]
+    return service.get_user_summary(user_id, **window)
 
 
 @router.patch("/{fraud_id}", response_model=FraudPreventionResponse)
@@ -86,4 +392,11 @@ def block_transaction(
     if not fraud:
         raise HTTPException(status_code=404, detail="Fraud prevention record not found")
     return fraud
- 
\ No newline at end of file
+
+@router.post("/block", response_model=BulkBlockResponse)
+def block_transactions(block_data: BulkBlockRequest, db: Session = Depends(get_db)):
+    service = FraudPreventionService(db)
+    frauds = service.block_many(
+        block_data.reason, ids=block_data.ids, user_id=block_data.user_id
+    )
+    return bulk_block_response(frauds, block_data)
@@ -0,0 +1,214 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.database import get_async_db, get_async_session_factory
+from src.routes.fraud_prevention import (
+    CREATE_BODY,
+    CURSOR_DESCRIPTION,
+    DUPLICATE_TRANSACTION_DETAIL,
+    HISTORY_CURSOR_DESCRIPTION,
+    IDEMPOTENCY_KEY_DESCRIPTION,
+    INCLUDE_TOTAL_DESCRIPTION,
+    MAX_HISTORY_LIMIT,
+    WRITE_BEHIND_FULL_DETAIL,
+    batch_response,
+    bulk_block_response,
+    create_payload,
+    cursor_response,
+    export_filters,
+    export_headers,
+    history_window,
+    page_response,
+    parse_cursor,
+    reject_duplicates,
+    timed_response,
+    user_history_response,
+    validate_batch,
+)
+from src.schemas.fraud_prevention import (
+    BatchCreateResponse,
+    BlockTransactionRequest,
+    BulkBlockRequest,
+    BulkBlockResponse,
+    FraudPreventionCreate,
+    FraudPreventionResponse,
+    FraudPreventionUpdate,
+    UserSummaryResponse,
+)
+from src.services.export import MEDIA_TYPES, ExportFormat, render_async
+from src.services.fraud_prevention import (
+    AsyncFraudPreventionService,
+    DuplicateTransactionError,
+)
+from src.services.write_behind import WriteBehindFullError
+
+router = APIRouter(prefix="/api/fraud-preventions", tags=["fraud-prevention"])
+
+
+@router.post("", response_model=FraudPreventionResponse, openapi_extra=CREATE_BODY)
+async def create_fraud_prevention(
+    fraud_data: FraudPreventionCreate = Depends(create_payload),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", description=IDEMPOTENCY_KEY_DESCRIPTION
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    try:
+        fraud, created = await service.create_or_get(fraud_data, idempotency_key)
+    except DuplicateTransactionError:
+        raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+    except WriteBehindFullError:
+        raise HTTPException(
+            status_code=503, detail=WRITE_BEHIND_FULL_DETAIL, headers={"Retry-After": "1"}
+        )
+    return timed_response(fraud, replayed=not created)
+
+
+@router.post("/batch", response_model=BatchCreateResponse)
+async def create_fraud_prevention_batch(
+    items: List[Any] = Body(...), db: AsyncSession = Depends(get_async_db)
+):
+    failures, valid = validate_batch(items)
+    service = AsyncFraudPreventionService(db)
+    existing = await service.existing_transaction_ids(
+        [fraud_data.transaction_id for _, fraud_data in valid]
+    )
+    failures, valid = reject_duplicates(failures, valid, existing)
+    try:
+        frauds = await service.create_batch([fraud_data for _, fraud_data in valid])
+    except DuplicateTransactionError:
+        raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+    return batch_response(failures, valid, frauds)
+
+
+@router.get("", response_model=Dict[str, Any])
+async def get_all_fraud_preventions(
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: Optional[bool] = Query(
+        None, alias="includeTotal", description=INCLUDE_TOTAL_DESCRIPTION
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    if cursor is not None:
+        frauds, has_more = await service.get_page(
+            cursor=parse_cursor(cursor), limit=limit
+        )
+        total = await service.get_approximate_total() if include_total else None
+        return cursor_response(frauds, has_more, total)
+
+    skip = (page - 1) * limit
+    frauds, total = await service.get_all(
+        skip=skip, limit=limit, with_total=include_total is not False
+    )
+    return page_response(frauds, total, page, limit)
+
+
+@router.get("/export")
+async def export_fraud_preventions(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    filters: Dict[str, Any] = Depends(export_filters),
+    session_factory=Depends(get_async_session_factory),
+):
+    async def stream():
+        async with session_factory() as db:
+            rows = AsyncFraudPreventionService(db).export_rows(**filters)
+            async for chunk in render_async(rows, export_format):
+                yield chunk
+
+    return StreamingResponse(
+        stream(),
+        media_type=MEDIA_TYPES[export_format],
+        headers=export_headers(export_format),
+    )
+
+
+@router.get("/{fraud_id}", response_model=FraudPreventionResponse)
+async def get_fraud_prevention(fraud_id: str, db: AsyncSession = Depends(get_async_db)):
+    service = AsyncFraudPreventionService(db)
+    fraud = await service.get_by_id(fraud_id)
+    if not fraud:
+        raise HTTPException(status_code=404, detail="Fraud prevention record not found")
+    return fraud
+
+
+@router.get("/transaction/{transaction_id}", response_model=FraudPreventionResponse)
+async def get_by_transaction_id(
+    transaction_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    service = AsyncFraudPreventionService(db)
+    fraud = await service.get_by_transaction_id(transaction_id)
+    if not fraud:
+        raise HTTPException(status_code=404, detail="Fraud prevention record not found")
+    return fraud
+
+
+@router.get("/user/{user_id}", response_model=List[FraudPreventionResponse])
+async def get_by_user_id(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_LIMIT),
+    cursor: Optional[str] = Query(None, description=HISTORY_CURSOR_DESCRIPTION),
+    window: Dict[str, Any] = Depends(history_window),
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    frauds, has_more = await service.get_user_page(
+        user_id,
+        cursor=parse_cursor(cursor) if cursor is not None else None,
+        limit=limit,
+        **window,
+    )
+    return user_history_response(frauds, has_more)
+
+
+@router.get("/user/{user_id}/summary", response_model=UserSummaryResponse)
+async def get_user_summary(
+    user_id: str,
+    window: Dict[str, Any] = Depends(history_window),
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    return await service.get_user_summary(user_id, **window)
+
+
+@router.patch("/{fraud_id}", response_model=FraudPreventionResponse)
+async def update_fraud_prevention(
+    fraud_id: str,
+    fraud_data: FraudPreventionUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    fraud = await service.update(fraud_id, fraud_data)
+    if not fraud:
+        raise HTTPException(status_code=404, detail="Fraud prevention record not found")
+    return fraud
+
+
+@router.post("/{fraud_id}/block", response_model=FraudPreventionResponse)
+async def block_transaction(
+    fraud_id: str,
+    block_data: BlockTransactionRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    service = AsyncFraudPreventionService(db)
+    fraud = await service.block_transaction(fraud_id, block_data.reason)
+    if not fraud:
+        raise HTTPException(status_code=404, detail="Fraud prevention record not found")
+    return fraud
+
+
+@router.post("/block", response_model=BulkBlockResponse)
+async def block_transactions(
+    block_data: BulkBlockRequest, db: AsyncSession = Depends(get_async_db)
+):
+    service = AsyncFraudPreventionService(db)
+    frauds = await service.block_many(
+        block_data.reason, ids=block_data.ids, user_id=block_data.user_id
+    )
+    return bulk_block_response(frauds, block_data)
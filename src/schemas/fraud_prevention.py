@@ -1,18 +1,22 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 from src.models.fraud_prevention import RiskLevel
 
 
+def to_camel(name: str) -> str:
+    """snake_case field name to its camelCase API alias."""
+    first, *rest = name.split("_")
+    return first + "".join(word.capitalize() for word in rest)
+
+
 class FraudPreventionBase(BaseModel):
     model_config = ConfigDict(
         from_attributes=True,
         populate_by_name=True,
-        alias_generator=lambda x: "".join(
-            word.capitalize() if i else word for i, word in enumerate(x.split("_"))
-        ),
+        alias_generator=to_camel,
         json_encoders={
             datetime: lambda dt: dt.isoformat(),
         },
@@ -54,9 +58,7 @@ class FraudPreventionUpdate(BaseModel):
     model_config = ConfigDict(
         from_attributes=True,
         populate_by_name=True,
-        alias_generator=lambda x: "".join(
-            word.capitalize() if i else word for i, word in enumerate(x.split("_"))
-        ),
+        alias_generator=to_camel,
     )
 
     risk_level: Optional[RiskLevel] = Field(None, alias="riskLevel")
@@ -81,3 +83,59 @@ class BlockTransactionRequest(BaseModel):
     reason: str = Field(
         ..., min_length=1, description="Reason for blocking the transaction"
     )
+
+
+class BulkBlockRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    ids: Optional[List[str]] = Field(
+        None, max_length=1000, description="Ids of the records to block"
+    )
+    user_id: Optional[str] = Field(
+        None, alias="userId", description="Block every open record of this user"
+    )
+    reason: str = Field(
+        ..., min_length=1, description="Reason for blocking the transactions"
+    )
+
+    @model_validator(mode="after")
+    def _one_target(self):
+        if (self.ids is None) == (self.user_id is None):
+            raise ValueError("Provide either ids or userId")
+        return self
+
+
+class BulkBlockResponse(BaseModel):
+    blocked: int = Field(..., description="Number of records newly blocked")
+    more: bool = Field(
+        False, description="The user may have more open records; repeat to block them"
+    )
+    data: List[FraudPreventionResponse]
+
+
+class UserSummaryResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+
+    user_id: str
+    total: int
+    blocked: int
+    risk_levels: Dict[RiskLevel, int] = Field(
+        ..., description="Record count per risk level"
+    )
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request array")
+    success: bool
+    data: Optional[FraudPreventionResponse] = None
+    errors: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Validation errors for this item"
+    )
+
+
+class BatchCreateResponse(BaseModel):
+    results: List[BatchItemResult]
+    created: int
+    failed: int
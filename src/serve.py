@@ -0,0 +1,62 @@
+"""Serve the API with uvicorn in one or more worker processes.
+
+Usage: python -m src.serve [--workers N|auto] [--host 0.0.0.0] [--port 8080]
+
+Workers default to WEB_CONCURRENCY (1 when unset); "auto" starts one per
+available CPU. Each worker is a separate process that imports the app and,
+in its startup hook, opens its own database pool and warms its own caches
+before it accepts requests. Record caches and idempotency keys are per
+process; velocity counters are too, so with several workers unknown keys are
+counted in the database and loaded keys are reloaded from it every
+VELOCITY_REFRESH_SECONDS, to include records created by other workers.
+"""
+import argparse
+import os
+from typing import List, Optional
+
+import uvicorn
+
+
+def available_cpus() -> int:
+    # sched_getaffinity respects CPU pinning but is missing on macOS and Windows
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def resolve_workers(value: str) -> int:
+    if value == "auto":
+        return available_cpus()
+    workers = int(value)
+    if workers < 1:
+        raise ValueError(f"Worker count must be at least 1, got {workers}")
+    return workers
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", default=os.getenv("WEB_CONCURRENCY", "1"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    workers = resolve_workers(args.workers)
+    # Workers read it to split the instance's connection budget between them
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if workers > 1:
+        # Each worker sees only its own creates, so none can count alone
+        os.environ["VELOCITY_SINGLE_WRITER"] = "false"
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compressed archive of records moved out of the fraud_prevention table.
+
+Records are stored as gzipped NDJSON in the export format, one directory per
+month of creation (``<root>/YYYY-MM/``) and one file per retention chunk.
+The fraud_prevention_archive table maps each archived id and transaction id
+to its file, so a lookup reads a single file instead of scanning the archive.
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+from pydantic_core import to_json
+
+from src.models.fraud_prevention import FraudPrevention
+from src.schemas.fraud_prevention import FraudPreventionResponse
+from src.services.serialization import record_dict
+
+logger = logging.getLogger(__name__)
+
+
+class Archive:
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def write(self, month: str, name: str, rows: Sequence[Sequence[Any]]) -> str:
+        """Write rows of RESPONSE_COLUMNS to ``<month>/<name>.ndjson.gz``.
+
+        Returns the path relative to the archive root. The file only appears
+        under its name once fully written and synced, and writing the same
+        rows again replaces it.
+        """
+        directory = self.root / month
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}.ndjson.gz"
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+                    for row in rows:
+                        out.write(to_json(record_dict(row)) + b"\n")
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return str(path.relative_to(self.root))
+
+    def find(self, path: str, fraud_id: str) -> Optional[FraudPrevention]:
+        """The record with ``fraud_id`` in the file at ``path``, detached."""
+        try:
+            with gzip.open(self.root / path, "rb") as lines:
+                for line in lines:
+                    values = json.loads(line)
+                    if values["id"] == fraud_id:
+                        record = FraudPreventionResponse.model_validate(values)
+                        return FraudPrevention(**record.model_dump())
+        except FileNotFoundError:
+            logger.warning("Archive file %s is missing", path)
+            return None
+        logger.warning("Archived record %s is not in %s", fraud_id, path)
+        return None
+
+
+def archive_dir() -> str:
+    return os.getenv("ARCHIVE_DIR", "archive")
+
+
+def archive_lookups_enabled() -> bool:
+    return os.getenv("ARCHIVE_LOOKUPS", "true") == "true"
+
+
+_archive: Optional[Archive] = None
+
+
+def get_archive() -> Optional[Archive]:
+    """The process-wide archive, or None when ARCHIVE_LOOKUPS=false."""
+    global _archive
+    if _archive is None and archive_lookups_enabled():
+        _archive = Archive(archive_dir())
+    return _archive
+
+
+def set_archive(archive: Optional[Archive]) -> None:
+    """Replace the process-wide archive; None rebuilds it from configuration on next use."""
+    global _archive
+    _archive = archive
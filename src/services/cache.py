@@ -0,0 +1,266 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.metrics import record_cache_eviction, record_cache_hit, record_cache_miss
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+
+
+class CacheBackend(ABC):
+    """Key-value store for JSON-serializable values with per-entry TTL."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for a key, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for ``ttl`` seconds."""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Remove keys if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every key."""
+
+
+class NullCache(CacheBackend):
+    """Backend that stores nothing, so every lookup goes to the database."""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class InMemoryCache(CacheBackend):
+    """Process-local cache with TTL expiry and LRU eviction beyond ``max_entries``."""
+
+    def __init__(self, name: str, max_entries: int = 10_000):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                record_cache_eviction(self.name, "expired")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                record_cache_eviction(self.name, "size")
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def record_to_dict(fraud: FraudPrevention) -> Dict[str, Any]:
+    """JSON-serializable column values, suitable for shared cache backends."""
+    values = {}
+    for column in FraudPrevention.__table__.columns:
+        value = getattr(fraud, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, RiskLevel):
+            value = value.value
+        values[column.key] = value
+    return values
+
+
+def record_from_dict(values: Dict[str, Any]) -> FraudPrevention:
+    """Rebuild a detached record from record_to_dict output."""
+    values = dict(values)
+    for key in ("created_at", "updated_at"):
+        if values.get(key) is not None:
+            values[key] = datetime.fromisoformat(values[key])
+    if values.get("risk_level") is not None:
+        values["risk_level"] = RiskLevel(values["risk_level"])
+    return FraudPrevention(**values)
+
+
+class RecordCache:
+    """Read-through cache of fraud records keyed by id and by transaction id.
+
+    Cached records are detached copies; callers that modify a record must load
+    it from the session and invalidate it here after committing.
+    """
+
+    name = "records"
+
+    def __init__(self, backend: CacheBackend, ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get_by_id(
+        self,
+        fraud_id: str,
+        load: Callable[[], Optional[FraudPrevention]],
+        fill: Callable[[], bool] = lambda: True,
+    ) -> Optional[FraudPrevention]:
+        return self._read_through(f"fraud:id:{fraud_id}", load, fill)
+
+    def get_by_transaction_id(
+        self,
+        transaction_id: str,
+        load: Callable[[], Optional[FraudPrevention]],
+        fill: Callable[[], bool] = lambda: True,
+    ) -> Optional[FraudPrevention]:
+        return self._read_through(f"fraud:tx:{transaction_id}", load, fill)
+
+    def invalidate(self, fraud: FraudPrevention) -> None:
+        self.backend.delete(*self._keys(fraud))
+
+    def _read_through(
+        self,
+        key: str,
+        load: Callable[[], Optional[FraudPrevention]],
+        fill: Callable[[], bool],
+    ) -> Optional[FraudPrevention]:
+        """Return the cached record, or load it on a miss.
+
+        ``fill`` is asked after loading whether the record may be cached.
+        """
+        values = self.backend.get(key)
+        if values is not None:
+            record_cache_hit(self.name)
+            return record_from_dict(values)
+
+        record_cache_miss(self.name)
+        fraud = load()
+        if fraud is not None and fill():
+            values = record_to_dict(fraud)
+            for cache_key in self._keys(fraud):
+                self.backend.set(cache_key, values, self.ttl)
+        return fraud
+
+    @staticmethod
+    def _keys(fraud: FraudPrevention) -> Tuple[str, str]:
+        return f"fraud:id:{fraud.id}", f"fraud:tx:{fraud.transaction_id}"
+
+
+class RecentKeys:
+    """Records returned by recent creates, keyed by idempotency key.
+
+    Lets a client retrying a create get the original record back without a
+    database round trip. Creates without an idempotency key are keyed by
+    transaction id, in a separate namespace so a client key equal to another
+    record's transaction id matches nothing. Entries are the record as first
+    returned and are not invalidated by later writes.
+    """
+
+    name = "idempotency"
+
+    def __init__(self, backend: CacheBackend, ttl: float = 300.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(
+        self, transaction_id: str, idempotency_key: Optional[str] = None
+    ) -> Optional[FraudPrevention]:
+        values = self.backend.get(self._key(transaction_id, idempotency_key))
+        if values is None:
+            record_cache_miss(self.name)
+            return None
+        record_cache_hit(self.name)
+        return record_from_dict(values)
+
+    def remember(
+        self, fraud: FraudPrevention, idempotency_key: Optional[str] = None
+    ) -> None:
+        self.backend.set(
+            self._key(fraud.transaction_id, idempotency_key),
+            record_to_dict(fraud),
+            self.ttl,
+        )
+
+    @staticmethod
+    def _key(transaction_id: str, idempotency_key: Optional[str]) -> str:
+        if idempotency_key is not None:
+            return f"idem:key:{idempotency_key}"
+        return f"idem:tx:{transaction_id}"
+
+
+def _build_record_cache() -> RecordCache:
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    if backend == "none":
+        cache_backend = NullCache()
+    elif backend == "memory":
+        cache_backend = InMemoryCache(
+            RecordCache.name, max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+        )
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+    return RecordCache(cache_backend, ttl=float(os.getenv("CACHE_TTL_SECONDS", "30")))
+
+
+_record_cache: Optional[RecordCache] = None
+
+
+def get_record_cache() -> RecordCache:
+    global _record_cache
+    if _record_cache is None:
+        _record_cache = _build_record_cache()
+    return _record_cache
+
+
+def set_record_cache(cache: Optional[RecordCache]) -> None:
+    """Replace the process-wide cache; None rebuilds it from configuration on next use."""
+    global _record_cache
+    _record_cache = cache
+
+
+_recent_keys: Optional[RecentKeys] = None
+
+
+def get_recent_keys() -> RecentKeys:
+    global _recent_keys
+    if _recent_keys is None:
+        _recent_keys = RecentKeys(
+            InMemoryCache(
+                RecentKeys.name,
+                max_entries=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+            ),
+            ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "300")),
+        )
+    return _recent_keys
+
+
+def set_recent_keys(recent_keys: Optional[RecentKeys]) -> None:
+    """Replace the process-wide recent keys; None rebuilds them from configuration on next use."""
+    global _recent_keys
+    _recent_keys = recent_keys
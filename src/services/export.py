@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from pydantic_core import to_json
+from sqlalchemy import Select, select
+from sqlalchemy.engine import Row
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.services.serialization import FIELD_NAMES, RESPONSE_COLUMNS, record_dict
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
+
+# Rows fetched per round trip; server-side cursors keep memory flat regardless of table size
+EXPORT_CHUNK_SIZE = 1000
+
+
+def export_statement(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    risk_level: Optional[RiskLevel] = None,
+    is_blocked: Optional[bool] = None,
+) -> Select:
+    """Oldest-first selection of export columns, streamed in EXPORT_CHUNK_SIZE rows."""
+    stmt = select(*RESPONSE_COLUMNS).order_by(
+        FraudPrevention.created_at, FraudPrevention.id
+    )
+    if created_from is not None:
+        stmt = stmt.where(FraudPrevention.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(FraudPrevention.created_at < created_to)
+    if risk_level is not None:
+        stmt = stmt.where(FraudPrevention.risk_level == risk_level)
+    if is_blocked is not None:
+        stmt = stmt.where(FraudPrevention.is_blocked == is_blocked)
+    return stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+def _ndjson_line(row: Row) -> bytes:
+    return to_json(record_dict(row)) + b"\n"
+
+
+def _csv_value(value):
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, RiskLevel):
+        return value.value
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def __call__(self, values) -> bytes:
+        self.writer.writerow(values)
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line.encode()
+
+
+def _encoder(export_format: ExportFormat):
+    if export_format == ExportFormat.NDJSON:
+        return _ndjson_line, b""
+    encode = _CsvEncoder()
+    return (lambda row: encode([_csv_value(value) for value in row])), encode(FIELD_NAMES)
+
+
+def render(rows: Iterable[Row], export_format: ExportFormat) -> Iterator[bytes]:
+    """Encode rows, yielding one chunk per EXPORT_CHUNK_SIZE rows."""
+    encode, header = _encoder(export_format)
+    chunk = [header]
+    for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def render_async(
+    rows: AsyncIterator[Row], export_format: ExportFormat
+) -> AsyncIterator[bytes]:
+    encode, header = _encoder(export_format)
+    chunk = [header]
+    async for row in rows:
+        chunk.append(encode(row))
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
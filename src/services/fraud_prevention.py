@@ -1,95 +1,543 @@
 import time
 import uuid
-from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
 
+from sqlalchemy import (
+    Insert,
+    Select,
+    case,
+    cast,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.metrics import record_attempt, record_blocked
-from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.database.database import PRIMARY_READS, replica_reads
+from src.metrics import (
+    record_attempt,
+    record_blocked,
+    record_rule_timings,
+    timed_stage,
+)
+from src.models.fraud_prevention import (
+    FraudPrevention,
+    FraudPreventionArchive,
+    RiskLevel,
+    UserRiskSummary,
+)
 from src.schemas.fraud_prevention import FraudPreventionCreate, FraudPreventionUpdate
+from src.services.archive import Archive, get_archive
+from src.services.cache import (
+    RecentKeys,
+    RecordCache,
+    get_recent_keys,
+    get_record_cache,
+)
+from src.services.export import export_statement
+from src.services.pagination import Cursor, total_count_cache
+from src.services.risk_summary import (
+    refresh_summaries,
+    summarize_attempts,
+    summarize_blocks,
+    window_counts,
+)
+from src.services.rules import Counts, RuleEngine, get_rule_engine
+from src.services.serialization import RESPONSE_COLUMNS
+from src.services.velocity import (
+    WINDOWS,
+    VelocityStore,
+    get_velocity_store,
+    to_epoch,
+)
+from src.services.write_behind import WriteBehindWriter, get_write_behind
+
+
+# Looked up by warm_up; matches no record
+WARMUP_KEY = "warmup"
+
+# Most records one block by user updates and returns
+BLOCK_LIMIT = 1000
+
+
+def batch_timestamps(count: int) -> List[datetime]:
+    """Creation times for records inserted together, strictly increasing in input
+    order so that ordering by created_at reproduces the order they were scored in."""
+    now = datetime.utcnow()
+    return [now + timedelta(microseconds=offset) for offset in range(count)]
+
+
+class DuplicateTransactionError(Exception):
+    """A fraud prevention record already exists for the transaction id."""
+
+
+def insert_ignoring_duplicates(dialect: str) -> Insert:
+    """INSERT that skips rows whose transaction id already exists, where supported."""
+    if dialect == "postgresql":
+        return postgresql.insert(FraudPrevention).on_conflict_do_nothing(
+            index_elements=["transaction_id"]
+        )
+    if dialect == "sqlite":
+        return sqlite.insert(FraudPrevention).on_conflict_do_nothing(
+            index_elements=["transaction_id"]
+        )
+    return insert(FraudPrevention)
 
 
 class FraudPreventionService:
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        velocity: Optional[VelocityStore] = None,
+        cache: Optional[RecordCache] = None,
+        rules: Optional[RuleEngine] = None,
+        recent_keys: Optional[RecentKeys] = None,
+        writer: Optional[WriteBehindWriter] = None,
+        archive: Optional[Archive] = None,
+    ):
         self.db = db
+        self.velocity = velocity if velocity is not None else get_velocity_store()
+        self.cache = cache if cache is not None else get_record_cache()
+        self.rules = rules if rules is not None else get_rule_engine()
+        self.recent_keys = recent_keys if recent_keys is not None else get_recent_keys()
+        # Write-behind mode when set: creates are queued instead of inserted
+        self.writer = writer if writer is not None else get_write_behind()
+        # Lookups by id and transaction id fall back to it when set
+        self.archive = archive if archive is not None else get_archive()
 
     def create(self, fraud_data: FraudPreventionCreate) -> FraudPrevention:
+        return self.create_or_get(fraud_data)[0]
+
+    def create_or_get(
+        self, fraud_data: FraudPreventionCreate, idempotency_key: Optional[str] = None
+    ) -> Tuple[FraudPrevention, bool]:
+        """Create a record, or return the one already stored for its transaction id.
+
+        Returns the record and whether this call created it. Retries are answered
+        from the recent keys (``idempotency_key``, else the transaction id) when
+        possible, and otherwise by INSERT ... ON CONFLICT DO NOTHING, so a
+        repeated transaction id neither adds a row nor counts as another attempt.
+        Raises DuplicateTransactionError when the stored record was created from
+        a different payload.
+        """
+        recent = self.recent_keys.get(fraud_data.transaction_id, idempotency_key)
+        if recent is not None:
+            return self._replay(recent, fraud_data), False
+        if self.writer is not None:
+            # The writer drops rows whose transaction id is stored or archived,
+            # so answer with that record rather than an id that will never exist
+            existing = self._existing(fraud_data)
+            if existing is not None:
+                self.recent_keys.remember(existing, idempotency_key)
+                return existing, False
+
         start_time = time.time()
         try:
-            risk_level = self._assess_risk(fraud_data.user_id)
-            db_fraud = FraudPrevention(
-                id=str(uuid.uuid4()),
-                transaction_id=fraud_data.transaction_id,
-                user_ip=fraud_data.user_ip,
-                device_id=fraud_data.device_id,
-                user_id=fraud_data.user_id,
-                risk_level=risk_level,
-                additional_data=fraud_data.additional_data,
-                attempt_count=0,
-                is_blocked=False,
-            )
-            self.db.add(db_fraud)
-            self.db.commit()
-            self.db.refresh(db_fraud)
+            with timed_stage("risk_assessment"):
+                risk_level = self._assess_risk(fraud_data)
+            now = datetime.utcnow()
+            # Every column is set here, so nothing needs reading back after the INSERT
+            values = {
+                "id": str(uuid.uuid4()),
+                "transaction_id": fraud_data.transaction_id,
+                "user_ip": fraud_data.user_ip,
+                "device_id": fraud_data.device_id,
+                "user_id": fraud_data.user_id,
+                "risk_level": risk_level,
+                "additional_data": fraud_data.additional_data,
+                "attempt_count": 0,
+                "is_blocked": False,
+                "block_reason": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            if self.writer is not None:
+                # Persisted by the writer shortly after; duplicates are dropped there
+                with timed_stage("enqueue"):
+                    self.writer.enqueue(values)
+            else:
+                with timed_stage("insert"):
+                    inserted = self._insert(values)
+                if not inserted:
+                    existing = self._replay(
+                        self._load_by_transaction_id(fraud_data), fraud_data
+                    )
+                    self.recent_keys.remember(existing, idempotency_key)
+                    return existing, False
+                with timed_stage("summary"):
+                    summarize_attempts(self.db, [values])
+                with timed_stage("commit"):
+                    self.db.commit()
+            db_fraud = FraudPrevention(**values)
+            self.recent_keys.remember(db_fraud, idempotency_key)
+            self.velocity.record(db_fraud)
             duration = time.time() - start_time
             record_attempt(success=True, duration=duration, risk_level=risk_level.value)
-            return db_fraud
+            return db_fraud, True
         except Exception as e:
             duration = time.time() - start_time
             record_attempt(success=False, duration=duration, risk_level="unknown")
             raise e
 
+    def _insert(self, values: Dict[str, object]) -> bool:
+        """INSERT the record unless its transaction id is stored or archived; True
+        if inserted.
+
+        Retention moves records out of the unique index, so ON CONFLICT cannot see
+        archived transaction ids; the INSERT selects its values only where the
+        archive has none, keeping the check in the same round trip.
+        """
+        dialect = self.db.get_bind().dialect.name
+        columns = FraudPrevention.__table__.columns
+        row = [
+            # Postgres resolves a bare parameter's type from the SELECT, not the target
+            cast(literal(value, columns[name].type), columns[name].type)
+            if dialect == "postgresql"
+            else literal(value, columns[name].type)
+            for name, value in values.items()
+        ]
+        not_archived = ~exists().where(
+            FraudPreventionArchive.transaction_id == values["transaction_id"]
+        )
+        stmt = insert_ignoring_duplicates(dialect).from_select(
+            list(values), select(*row).where(not_archived)
+        )
+        try:
+            return self.db.execute(
+                stmt.returning(FraudPrevention.id)
+            ).first() is not None
+        except IntegrityError:
+            # Dialects without ON CONFLICT report the duplicate as an error
+            self.db.rollback()
+            return False
+
+    def _existing(
+        self, fraud_data: FraudPreventionCreate
+    ) -> Optional[FraudPrevention]:
+        """The stored or archived record for the transaction id, if any.
+
+        New transaction ids, the common case, cost one round trip that checks
+        both tables; the record itself is only loaded when one has it.
+        """
+        transaction_id = fraud_data.transaction_id
+        stored_id, archived = self.db.execute(
+            select(
+                select(FraudPrevention.id)
+                .where(FraudPrevention.transaction_id == transaction_id)
+                .scalar_subquery(),
+                exists().where(FraudPreventionArchive.transaction_id == transaction_id),
+            )
+        ).one()
+        if stored_id is not None:
+            return self._replay(self._load_by_transaction_id(fraud_data), fraud_data)
+        if archived:
+            return self._archived_transaction(fraud_data)
+        return None
+
+    def _stored(self, transaction_id: str) -> Optional[FraudPrevention]:
+        """The record stored for ``transaction_id``, read from the primary."""
+        return self.db.scalar(
+            select(FraudPrevention).where(
+                FraudPrevention.transaction_id == transaction_id
+            )
+        )
+
+    def _archived_transaction(
+        self, fraud_data: FraudPreventionCreate
+    ) -> Optional[FraudPrevention]:
+        """The archived record for the transaction id, or None if it was never archived.
+
+        Raises DuplicateTransactionError when it was archived but cannot be read
+        here, so it is still never created twice.
+        """
+        entry = self.db.scalar(
+            select(FraudPreventionArchive).where(
+                FraudPreventionArchive.transaction_id == fraud_data.transaction_id
+            )
+        )
+        if entry is None:
+            return None
+        fraud = self.archive.find(entry.path, entry.id) if self.archive else None
+        if fraud is None:
+            raise DuplicateTransactionError(fraud_data.transaction_id)
+        return self._replay(fraud, fraud_data)
+
+    def _load_by_transaction_id(
+        self, fraud_data: FraudPreventionCreate
+    ) -> FraudPrevention:
+        fraud = self._stored(fraud_data.transaction_id)
+        if fraud is None:
+            fraud = self._archived_transaction(fraud_data)
+        if fraud is None:
+            # Deleted between the conflicting INSERT and this read
+            raise DuplicateTransactionError(fraud_data.transaction_id)
+        return fraud
+
+    @staticmethod
+    def _replay(
+        fraud: FraudPrevention, fraud_data: FraudPreventionCreate
+    ) -> FraudPrevention:
+        """Return ``fraud`` if it was created from the same payload as ``fraud_data``."""
+        fields = ("transaction_id", "user_ip", "device_id", "user_id", "additional_data")
+        if any(getattr(fraud, name) != getattr(fraud_data, name) for name in fields):
+            raise DuplicateTransactionError(fraud_data.transaction_id)
+        return fraud
+
+    def create_batch(
+        self, items: List[FraudPreventionCreate]
+    ) -> List[FraudPrevention]:
+        """Score and insert many records with one aggregate query and one commit.
+
+        Records for the same user within the batch are scored in order, each one
+        seeing the attempts that precede it, exactly as sequential creates would.
+        """
+        if not items:
+            return []
+        start_time = time.time()
+        try:
+            assessments = self.rules.evaluate_in_order(items, self._prior_counts(items))
+            timestamps = batch_timestamps(len(items))
+            rows = []
+            for item, assessment, now in zip(items, assessments, timestamps):
+                record_rule_timings(assessment.timings)
+                risk_level = assessment.level
+                rows.append(
+                    {
+                        "id": str(uuid.uuid4()),
+                        "transaction_id": item.transaction_id,
+                        "user_ip": item.user_ip,
+                        "device_id": item.device_id,
+                        "user_id": item.user_id,
+                        "risk_level": risk_level,
+                        "additional_data": item.additional_data,
+                        "attempt_count": 0,
+                        "is_blocked": False,
+                        "block_reason": None,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+            if self._archived_transaction_ids([item.transaction_id for item in items]):
+                raise DuplicateTransactionError()
+            try:
+                self.db.execute(insert(FraudPrevention), rows)
+                summarize_attempts(self.db, rows)
+                self.db.commit()
+            except IntegrityError as e:
+                self.db.rollback()
+                raise DuplicateTransactionError() from e
+
+            frauds = [FraudPrevention(**row) for row in rows]
+            # Spread the batch duration across its items so per-attempt latency stays comparable
+            duration = (time.time() - start_time) / len(frauds)
+            for fraud in frauds:
+                self.velocity.record(fraud, to_epoch(fraud.created_at))
+                record_attempt(
+                    success=True, duration=duration, risk_level=fraud.risk_level.value
+                )
+            return frauds
+        except Exception as e:
+            duration = time.time() - start_time
+            for _ in items:
+                record_attempt(success=False, duration=duration, risk_level="unknown")
+            raise e
+
+    def existing_transaction_ids(self, transaction_ids: List[str]) -> Set[str]:
+        """The given transaction ids that are stored or archived."""
+        if not transaction_ids:
+            return set()
+        return set(
+            self.db.scalars(
+                select(FraudPrevention.transaction_id).where(
+                    FraudPrevention.transaction_id.in_(transaction_ids)
+                )
+            )
+        ) | self._archived_transaction_ids(transaction_ids)
+
+    def _archived_transaction_ids(self, transaction_ids: List[str]) -> Set[str]:
+        return set(
+            self.db.scalars(
+                select(FraudPreventionArchive.transaction_id).where(
+                    FraudPreventionArchive.transaction_id.in_(transaction_ids)
+                )
+            )
+        )
+
+    @replica_reads
     def get_all(
-        self, skip: int = 0, limit: int = 10
-    ) -> Tuple[List[FraudPrevention], int]:
-        total = self.db.query(FraudPrevention).count()
-        frauds = (
-            self.db.query(FraudPrevention)
-            .order_by(FraudPrevention.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+        self, skip: int = 0, limit: int = 10, with_total: bool = True
+    ) -> Tuple[List[Row], Optional[int]]:
+        """A page of RESPONSE_COLUMNS rows, newest first, and the total count."""
+        total = self.db.query(FraudPrevention).count() if with_total else None
+        frauds = list(
+            self.db.execute(
+                select(*RESPONSE_COLUMNS)
+                .order_by(FraudPrevention.created_at.desc(), FraudPrevention.id.desc())
+                .offset(skip)
+                .limit(limit)
+            )
         )
         return frauds, total
 
-    def get_by_id(self, fraud_id: str) -> Optional[FraudPrevention]:
-        return (
-            self.db.query(FraudPrevention)
-            .filter(FraudPrevention.id == fraud_id)
-            .first()
+    @replica_reads
+    def get_page(
+        self, cursor: Optional[Cursor] = None, limit: int = 10
+    ) -> Tuple[List[Row], bool]:
+        """Keyset page after ``cursor`` in listing order, and whether more rows follow."""
+        stmt = (
+            select(*RESPONSE_COLUMNS)
+            .order_by(FraudPrevention.created_at.desc(), FraudPrevention.id.desc())
+            .limit(limit + 1)
         )
+        if cursor is not None:
+            stmt = stmt.where(
+                tuple_(FraudPrevention.created_at, FraudPrevention.id) < tuple_(*cursor)
+            )
+        frauds = list(self.db.execute(stmt))
+        return frauds[:limit], len(frauds) > limit
+
+    @replica_reads
+    def get_approximate_total(self) -> int:
+        return total_count_cache.get(self.db)
+
+    @replica_reads
+    def export_rows(self, **filters) -> Iterator[Row]:
+        """Stream export rows matching ``export_statement`` filters."""
+        return iter(self.db.execute(export_statement(**filters)))
 
+    @replica_reads
+    def get_by_id(self, fraud_id: str) -> Optional[FraudPrevention]:
+        def load() -> Optional[FraudPrevention]:
+            return self._load(fraud_id) or self._load_archived(
+                FraudPreventionArchive.id == fraud_id
+            )
+
+        if self.db.info.get(PRIMARY_READS):
+            return load()
+        return self.cache.get_by_id(fraud_id, load, self._read_primary)
+
+    @replica_reads
     def get_by_transaction_id(self, transaction_id: str) -> Optional[FraudPrevention]:
-        return (
-            self.db.query(FraudPrevention)
-            .filter(FraudPrevention.transaction_id == transaction_id)
-            .first()
+        def load() -> Optional[FraudPrevention]:
+            return self.db.query(FraudPrevention).filter(
+                FraudPrevention.transaction_id == transaction_id
+            ).first() or self._load_archived(
+                FraudPreventionArchive.transaction_id == transaction_id
+            )
+
+        if self.db.info.get(PRIMARY_READS):
+            return load()
+        return self.cache.get_by_transaction_id(
+            transaction_id, load, self._read_primary
+        )
+
+    def _read_primary(self) -> bool:
+        """Whether the session's reads so far were served by the primary.
+
+        Only those fill the record cache: a lagging replica could cache a
+        record as it was before its latest write.
+        """
+        return self.db.info.get("replica") is None
+
+    @replica_reads
+    def get_by_user_id(self, user_id: str) -> List[Row]:
+        """The user's records as RESPONSE_COLUMNS rows, newest first."""
+        return list(self.db.execute(self._user_history(user_id)))
+
+    @replica_reads
+    def get_user_page(
+        self,
+        user_id: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = 100,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Tuple[List[Row], bool]:
+        """Keyset page of the user's records created in [since, until), newest first."""
+        stmt = self._user_history(user_id, since, until).limit(limit + 1)
+        if cursor is not None:
+            stmt = stmt.where(
+                tuple_(FraudPrevention.created_at, FraudPrevention.id) < tuple_(*cursor)
+            )
+        frauds = list(self.db.execute(stmt))
+        return frauds[:limit], len(frauds) > limit
+
+    @replica_reads
+    def get_user_summary(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Dict[str, object]:
+        """Counts by risk level, blocked count and first/last seen, aggregated in SQL."""
+        stmt = (
+            select(
+                FraudPrevention.risk_level,
+                func.count(),
+                func.sum(case((FraudPrevention.is_blocked, 1), else_=0)),
+                func.min(FraudPrevention.created_at),
+                func.max(FraudPrevention.created_at),
+            )
+            .where(*self._user_filters(user_id, since, until))
+            .group_by(FraudPrevention.risk_level)
         )
+        rows = self.db.execute(stmt).all()
+        by_level = {row[0]: row[1] for row in rows}
+        return {
+            "user_id": user_id,
+            "total": sum(row[1] for row in rows),
+            "blocked": sum(row[2] for row in rows),
+            "risk_levels": {level: by_level.get(level, 0) for level in RiskLevel},
+            "first_seen": min((row[3] for row in rows), default=None),
+            "last_seen": max((row[4] for row in rows), default=None),
+        }
+
+    @staticmethod
+    def _user_filters(
+        user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> list:
+        filters = [FraudPrevention.user_id == user_id]
+        if since is not None:
+            filters.append(FraudPrevention.created_at >= since)
+        if until is not None:
+            filters.append(FraudPrevention.created_at < until)
+        return filters
 
-    def get_by_user_id(self, user_id: str) -> List[FraudPrevention]:
+    def _user_history(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Select:
         return (
-            self.db.query(FraudPrevention)
-            .filter(FraudPrevention.user_id == user_id)
-            .order_by(FraudPrevention.created_at.desc())
-            .all()
+            select(*RESPONSE_COLUMNS)
+            .where(*self._user_filters(user_id, since, until))
+            .order_by(FraudPrevention.created_at.desc(), FraudPrevention.id.desc())
         )
 
     def update(
         self, fraud_id: str, fraud_data: FraudPreventionUpdate
     ) -> Optional[FraudPrevention]:
-        db_fraud = self.get_by_id(fraud_id)
-        if not db_fraud:
-            return None
-
         update_data = fraud_data.model_dump(exclude_unset=True)
         if "risk_level" in update_data:
             update_data["risk_level"] = RiskLevel(update_data["risk_level"])
 
-        for key, value in update_data.items():
-            setattr(db_fraud, key, value)
-
+        db_fraud = self._update_returning(fraud_id, **update_data)
+        if not db_fraud:
+            return None
+        if {"risk_level", "is_blocked"} & update_data.keys():
+            refresh_summaries(self.db, [db_fraud.user_id])
         self.db.commit()
-        self.db.refresh(db_fraud)
+        self.cache.invalidate(db_fraud)
         return db_fraud
 
     def block_transaction(
@@ -97,17 +545,35 @@ class FraudPreventionService:
     ) -> Optional[FraudPrevention]:
         start_time = time.time()
         try:
-            db_fraud = self.get_by_id(fraud_id)
-            if not db_fraud:
+            now = datetime.utcnow()
+            already_blocked = FraudPrevention.is_blocked.is_(True)
+            stmt = self._update(
+                fraud_id,
+                is_blocked=True,
+                # A record already blocked keeps the reason and time of its first block
+                block_reason=case(
+                    (already_blocked, FraudPrevention.block_reason), else_=reason
+                ),
+                updated_at=case(
+                    (already_blocked, FraudPrevention.updated_at), else_=now
+                ),
+                risk_level=RiskLevel.CRITICAL,
+                # Incremented by the database, so concurrent blocks are all counted
+                attempt_count=FraudPrevention.attempt_count + 1,
+            )
+            # Only the block that found the record open stamped it with ``now``.
+            # The database compares them, as it stored ``now``, so precision it
+            # drops cannot make them differ
+            newly_blocked = case((FraudPrevention.updated_at == now, True), else_=False)
+            row = self.db.execute(
+                stmt.returning(FraudPrevention, newly_blocked.label("newly_blocked"))
+            ).first()
+            if row is None:
                 return None
-
-            db_fraud.is_blocked = True
-            db_fraud.block_reason = reason
-            db_fraud.risk_level = RiskLevel.CRITICAL
-            db_fraud.attempt_count += 1
-
+            db_fraud = row.FraudPrevention
+            summarize_blocks(self.db, [db_fraud], bool(row.newly_blocked))
             self.db.commit()
-            self.db.refresh(db_fraud)
+            self.cache.invalidate(db_fraud)
 
             duration = time.time() - start_time
             record_attempt(
@@ -120,18 +586,355 @@ class FraudPreventionService:
             record_attempt(success=False, duration=duration, risk_level="unknown")
             raise e
 
-    def _assess_risk(self, user_id: str) -> RiskLevel:
-        # Count recent attempts by this user
-        recent_attempts = (
-            self.db.query(FraudPrevention)
-            .filter(FraudPrevention.user_id == user_id)
-            .count()
-        )
-
-        if recent_attempts >= 10:
-            return RiskLevel.CRITICAL
-        elif recent_attempts >= 5:
-            return RiskLevel.HIGH
-        elif recent_attempts >= 3:
-            return RiskLevel.MEDIUM
-        return RiskLevel.LOW
+    def block_many(
+        self,
+        reason: str,
+        ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        limit: int = BLOCK_LIMIT,
+    ) -> List[FraudPrevention]:
+        """Block open records by id or by user in one conditional UPDATE ... RETURNING.
+
+        Records that are already blocked are left untouched and not returned. A
+        block by user takes at most ``limit`` of their open records, oldest first;
+        repeating it blocks the next ones.
+        """
+        if ids is not None and not ids:
+            return []
+        if ids is not None:
+            target = FraudPrevention.id.in_(ids)
+        else:
+            target = FraudPrevention.id.in_(
+                select(FraudPrevention.id)
+                .where(
+                    FraudPrevention.user_id == user_id,
+                    FraudPrevention.is_blocked.is_(False),
+                )
+                .order_by(FraudPrevention.created_at, FraudPrevention.id)
+                .limit(limit)
+            )
+        start_time = time.time()
+        try:
+            frauds = self.db.scalars(
+                update(FraudPrevention)
+                .where(target, FraudPrevention.is_blocked.is_(False))
+                .values(
+                    is_blocked=True,
+                    block_reason=reason,
+                    risk_level=RiskLevel.CRITICAL,
+                    attempt_count=FraudPrevention.attempt_count + 1,
+                    updated_at=datetime.utcnow(),
+                )
+                .returning(FraudPrevention)
+                .execution_options(populate_existing=True)
+            ).all()
+            summarize_blocks(self.db, frauds)
+            self.db.commit()
+            for fraud in frauds:
+                self.cache.invalidate(fraud)
+            duration = (time.time() - start_time) / max(len(frauds), 1)
+            for fraud in frauds:
+                record_attempt(
+                    success=True, duration=duration, risk_level=RiskLevel.CRITICAL.value
+                )
+                record_blocked(risk_level=RiskLevel.CRITICAL.value)
+            return frauds
+        except Exception as e:
+            duration = time.time() - start_time
+            record_attempt(success=False, duration=duration, risk_level="unknown")
+            raise e
+
+    def _update_returning(self, fraud_id: str, **values) -> Optional[FraudPrevention]:
+        """UPDATE one record and read it back in the same statement."""
+        return self.db.scalar(self._update(fraud_id, **values).returning(FraudPrevention))
+
+    @staticmethod
+    def _update(fraud_id: str, **values):
+        return (
+            update(FraudPrevention)
+            .where(FraudPrevention.id == fraud_id)
+            .values(**{"updated_at": datetime.utcnow(), **values})
+            .execution_options(populate_existing=True)
+        )
+
+    def _load(self, fraud_id: str) -> Optional[FraudPrevention]:
+        """Load a record into the session, bypassing the cache."""
+        return self.db.get(FraudPrevention, fraud_id)
+
+    def _load_archived(self, condition) -> Optional[FraudPrevention]:
+        """Read a record moved to the archive by retention, detached and read-only."""
+        if self.archive is None:
+            return None
+        entry = self.db.scalar(
+            select(FraudPreventionArchive)
+            .where(condition)
+            .order_by(FraudPreventionArchive.created_at.desc())
+            .limit(1)
+        )
+        if entry is None:
+            return None
+        return self.archive.find(entry.path, entry.id)
+
+    def warm_up(self) -> None:
+        """Run the hot read queries once, opening a pooled connection and
+        filling the engine's compiled SQL cache before traffic arrives."""
+        self.get_page(limit=1)
+        self.get_user_page(WARMUP_KEY, limit=1)
+        self._load(WARMUP_KEY)
+        self._user_counts({WARMUP_KEY})
+        self.db.query(FraudPrevention).filter(
+            FraudPrevention.transaction_id == WARMUP_KEY
+        ).first()
+        self.db.rollback()
+
+    @replica_reads
+    def get_velocity(self, dimension: str, key: str) -> Dict[str, int]:
+        """Velocity counts for a key, loading it from the database on a store miss."""
+        counts = self.velocity.get(dimension, key)
+        if counts is not None:
+            return counts
+
+        column = getattr(FraudPrevention, dimension)
+        total = self.db.query(FraudPrevention).filter(column == key).count()
+        since = datetime.utcnow() - timedelta(seconds=max(WINDOWS.values()))
+        recent = [
+            to_epoch(created_at)
+            for (created_at,) in self.db.query(FraudPrevention.created_at).filter(
+                column == key, FraudPrevention.created_at >= since
+            )
+        ]
+        self.velocity.seed(dimension, key, total, recent)
+        counts = self.velocity.get(dimension, key)
+        if counts is None:
+            # Store declined to keep the key; answer from what we just loaded
+            now = time.time()
+            counts = {
+                name: sum(1 for ts in recent if now - ts < width)
+                for name, width in WINDOWS.items()
+            }
+            counts["total"] = total
+        return counts
+
+    def _prior_counts(
+        self, items: List[FraudPreventionCreate]
+    ) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Velocity counts for every key the rules will look up for ``items``."""
+        return {
+            dimension: self.velocity_counts(
+                dimension,
+                {getattr(item, dimension) for item in items} - {None},
+            )
+            for dimension in self.rules.dimensions
+        }
+
+    def velocity_counts(self, dimension: str, keys: Set[str]) -> Dict[str, Counts]:
+        """Velocity counts per key of ``dimension``, as risk assessment reads them."""
+        if self._counts_from_summary(dimension):
+            return self._user_counts(keys)
+        return self._key_counts(dimension, keys)
+
+    def _counts_from_summary(self, dimension: str) -> bool:
+        """Whether risk counts for ``dimension`` come from user_risk_summary.
+
+        In write-behind mode the summary lags the queue, so users are counted
+        by the in-memory counters, which include queued records.
+        """
+        return dimension == "user_id" and self.writer is None
+
+    def _user_counts(self, user_ids: Set[str]) -> Dict[str, Counts]:
+        """Velocity counts per user, by primary key from user_risk_summary.
+
+        Read from the primary: the summary is shared by every instance, and a
+        replica's lag would let a burst of attempts go uncounted.
+        """
+        summaries = {
+            summary.user_id: summary
+            for summary in self.db.execute(
+                select(*UserRiskSummary.__table__.columns).where(
+                    UserRiskSummary.user_id.in_(user_ids)
+                )
+            )
+        }
+        now = time.time()
+        return {
+            user_id: window_counts(summaries.get(user_id), now) for user_id in user_ids
+        }
+
+    @replica_reads
+    def _key_counts(
+        self, dimension: str, keys: Set[str]
+    ) -> Dict[str, Dict[str, int]]:
+        """Velocity counts per key: store hits first, then one grouped query."""
+        counts = {}
+        missing = []
+        for key in keys:
+            key_counts = self.velocity.get(dimension, key)
+            if key_counts is None:
+                missing.append(key)
+            else:
+                counts[key] = key_counts
+        if missing:
+            column = getattr(FraudPrevention, dimension)
+            now = datetime.utcnow()
+            windows = [
+                func.sum(
+                    case(
+                        (FraudPrevention.created_at >= now - timedelta(seconds=width), 1),
+                        else_=0,
+                    )
+                )
+                for width in WINDOWS.values()
+            ]
+            zero = {"total": 0, **{name: 0 for name in WINDOWS}}
+            counts.update({key: dict(zero) for key in missing})
+            for key, total, *window_counts in self.db.execute(
+                select(column, func.count(), *windows)
+                .where(column.in_(missing))
+                .group_by(column)
+            ):
+                counts[key] = {"total": total, **dict(zip(WINDOWS, window_counts))}
+        return counts
+
+    def _risk_counts(self, dimension: str, key: str) -> Counts:
+        if self._counts_from_summary(dimension):
+            return self._user_counts({key})[key]
+        return self.get_velocity(dimension, key)
+
+    def _assess_risk(self, fraud_data: FraudPreventionCreate) -> RiskLevel:
+        assessment = self.rules.evaluate(fraud_data, self._risk_counts)
+        record_rule_timings(assessment.timings)
+        return assessment.level
+
+
+class AsyncFraudPreventionService:
+    """Async variant of FraudPreventionService.
+
+    Every method runs the sync service against the AsyncSession's underlying
+    Session via ``run_sync``, so database IO is awaited on the event loop through
+    the async driver instead of blocking a threadpool worker.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        velocity: Optional[VelocityStore] = None,
+        cache: Optional[RecordCache] = None,
+        rules: Optional[RuleEngine] = None,
+        recent_keys: Optional[RecentKeys] = None,
+        writer: Optional[WriteBehindWriter] = None,
+        archive: Optional[Archive] = None,
+    ):
+        self.db = db
+        self.velocity = velocity if velocity is not None else get_velocity_store()
+        self.cache = cache if cache is not None else get_record_cache()
+        self.rules = rules if rules is not None else get_rule_engine()
+        self.recent_keys = recent_keys if recent_keys is not None else get_recent_keys()
+        # Write-behind mode when set: creates are queued instead of inserted
+        self.writer = writer if writer is not None else get_write_behind()
+        # Lookups by id and transaction id fall back to it when set
+        self.archive = archive if archive is not None else get_archive()
+
+    async def _run(self, method: str, *args, **kwargs):
+        def call(session: Session):
+            service = FraudPreventionService(
+                session,
+                velocity=self.velocity,
+                cache=self.cache,
+                rules=self.rules,
+                recent_keys=self.recent_keys,
+                writer=self.writer,
+                archive=self.archive,
+            )
+            return getattr(service, method)(*args, **kwargs)
+
+        return await self.db.run_sync(call)
+
+    async def create(self, fraud_data: FraudPreventionCreate) -> FraudPrevention:
+        return await self._run("create", fraud_data)
+
+    async def create_or_get(
+        self, fraud_data: FraudPreventionCreate, idempotency_key: Optional[str] = None
+    ) -> Tuple[FraudPrevention, bool]:
+        return await self._run("create_or_get", fraud_data, idempotency_key)
+
+    async def create_batch(
+        self, items: List[FraudPreventionCreate]
+    ) -> List[FraudPrevention]:
+        return await self._run("create_batch", items)
+
+    async def existing_transaction_ids(self, transaction_ids: List[str]) -> Set[str]:
+        return await self._run("existing_transaction_ids", transaction_ids)
+
+    async def get_all(
+        self, skip: int = 0, limit: int = 10, with_total: bool = True
+    ) -> Tuple[List[Row], Optional[int]]:
+        return await self._run("get_all", skip=skip, limit=limit, with_total=with_total)
+
+    async def get_page(
+        self, cursor: Optional[Cursor] = None, limit: int = 10
+    ) -> Tuple[List[Row], bool]:
+        return await self._run("get_page", cursor=cursor, limit=limit)
+
+    async def get_approximate_total(self) -> int:
+        return await self._run("get_approximate_total")
+
+    async def export_rows(self, **filters) -> AsyncIterator[Row]:
+        # Streams directly on the AsyncSession; run_sync would buffer the whole result
+        result = await self.db.stream(export_statement(**filters))
+        async for row in result:
+            yield row
+
+    async def warm_up(self) -> None:
+        await self._run("warm_up")
+
+    async def get_by_id(self, fraud_id: str) -> Optional[FraudPrevention]:
+        return await self._run("get_by_id", fraud_id)
+
+    async def get_by_transaction_id(
+        self, transaction_id: str
+    ) -> Optional[FraudPrevention]:
+        return await self._run("get_by_transaction_id", transaction_id)
+
+    async def get_by_user_id(self, user_id: str) -> List[Row]:
+        return await self._run("get_by_user_id", user_id)
+
+    async def get_user_page(
+        self,
+        user_id: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = 100,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Tuple[List[Row], bool]:
+        return await self._run(
+            "get_user_page", user_id, cursor=cursor, limit=limit, since=since, until=until
+        )
+
+    async def get_user_summary(
+        self,
+        user_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Dict[str, object]:
+        return await self._run("get_user_summary", user_id, since=since, until=until)
+
+    async def update(
+        self, fraud_id: str, fraud_data: FraudPreventionUpdate
+    ) -> Optional[FraudPrevention]:
+        return await self._run("update", fraud_id, fraud_data)
+
+    async def block_transaction(
+        self, fraud_id: str, reason: str
+    ) -> Optional[FraudPrevention]:
+        return await self._run("block_transaction", fraud_id, reason)
+
+    async def block_many(
+        self,
+        reason: str,
+        ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        limit: int = BLOCK_LIMIT,
+    ) -> List[FraudPrevention]:
+        return await self._run(
+            "block_many", reason, ids=ids, user_id=user_id, limit=limit
+        )
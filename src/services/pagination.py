@@ -0,0 +1,77 @@
+import base64
+import binascii
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from src.models.fraud_prevention import FraudPrevention
+
+# Position in the (created_at DESC, id DESC) listing order
+Cursor = Tuple[datetime, str]
+
+
+class InvalidCursorError(ValueError):
+    """The cursor was not produced by encode_cursor."""
+
+
+def encode_cursor(fraud: FraudPrevention) -> str:
+    raw = f"{fraud.created_at.isoformat()}|{fraud.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, fraud_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), fraud_id
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(cursor) from e
+
+
+class TotalCountCache:
+    """Row count of the fraud table, served from a short-lived cache.
+
+    On PostgreSQL the planner's estimate (pg_class.reltuples) is used, which is
+    read from the catalog instead of scanning the table. Other databases fall
+    back to an exact COUNT(*) that is reused for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now < self._expires:
+                return self._value
+        value = self._estimate(db)
+        with self._lock:
+            self._value, self._expires = value, now + self.ttl
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value = None
+
+    @staticmethod
+    def _estimate(db: Session) -> int:
+        if db.get_bind().dialect.name == "postgresql":
+            estimate = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                {"table": FraudPrevention.__tablename__},
+            ).scalar()
+            # -1 means the table has never been analyzed
+            if estimate is not None and estimate >= 0:
+                return estimate
+        return db.scalar(select(func.count()).select_from(FraudPrevention))
+
+
+total_count_cache = TotalCountCache(ttl=float(os.getenv("COUNT_CACHE_TTL_SECONDS", "10")))
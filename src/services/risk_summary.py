@@ -0,0 +1,307 @@
+"""Per-user risk aggregates, maintained incrementally in user_risk_summary.
+
+Every write that adds or blocks records upserts its users' rows in the same
+transaction, so risk assessment reads a user's counts with one primary key
+lookup instead of aggregating their records. Velocity windows are kept as two
+fixed buckets per window; the sliding count weights the previous bucket by the
+share of it still inside the window, as rate limiters do. Rows can always be
+recomputed from fraud_prevention with ``rebuild_summaries``.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from sqlalchemy import (
+    Integer,
+    Select,
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel, UserRiskSummary
+from src.services.rules import Counts
+from src.services.velocity import WINDOWS, to_epoch
+
+SUMMARY_COLUMNS = [
+    "user_id", "attempt_count", "blocked_count", "last_seen", "risk_level",
+    *(f"{column}_{name}" for name in WINDOWS for column in ("bucket", "count", "previous")),
+]
+
+# Users refreshed per statement
+REFRESH_CHUNK_SIZE = 500
+
+
+def _from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def window_counts(summary: Optional[Row], now: float) -> Counts:
+    """Velocity counts at ``now`` (epoch seconds) from a user's summary row."""
+    if summary is None:
+        return {"total": 0, **{name: 0 for name in WINDOWS}}
+    counts = {"total": summary.attempt_count}
+    for name, width in WINDOWS.items():
+        current, offset = divmod(now, width)
+        bucket = getattr(summary, f"bucket_{name}")
+        count = getattr(summary, f"count_{name}")
+        # Share of the bucket before ``current`` that is still inside the window
+        weight = 1 - offset / width
+        if bucket >= current:
+            estimate = count + getattr(summary, f"previous_{name}") * weight
+        elif bucket == current - 1:
+            estimate = count * weight
+        else:
+            estimate = 0
+        counts[name] = round(estimate)
+    return counts
+
+
+def _dialect(db: Union[Session, Connection]) -> str:
+    bind = db.get_bind() if isinstance(db, Session) else db
+    return bind.dialect.name
+
+
+def _upsert(
+    db: Union[Session, Connection],
+    rows: List[Dict[str, Any]],
+    assignments: Callable[[Any, Any], List[Tuple[str, Any]]],
+) -> None:
+    """INSERT summary rows, or UPDATE existing ones with ``assignments(table, new)``.
+
+    ``new`` gives the proposed row's values by column name. Assignments are
+    applied in order and, as on MySQL, may see columns assigned before them,
+    so each one must only read columns assigned after it.
+    """
+    table = UserRiskSummary.__table__.c
+    dialect = _dialect(db)
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(UserRiskSummary)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_=dict(assignments(table, stmt.excluded)),
+            ),
+            rows,
+        )
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(UserRiskSummary)
+        db.execute(stmt.on_duplicate_key_update(assignments(table, stmt.inserted)), rows)
+    else:
+        # Portable fallback: one UPDATE per user, then an INSERT if it had no row
+        for row in rows:
+            new = {name: literal(value, table[name].type) for name, value in row.items()}
+            stmt = (
+                update(UserRiskSummary)
+                .where(UserRiskSummary.user_id == row["user_id"])
+                .values(dict(assignments(table, new)))
+            )
+            if db.execute(stmt).rowcount:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(insert(UserRiskSummary).values(**row))
+            except IntegrityError:
+                # Inserted concurrently since the UPDATE
+                db.execute(stmt)
+
+
+def _summaries(
+    records: Iterable[Tuple[str, datetime, RiskLevel]], blocked: bool
+) -> List[Dict[str, Any]]:
+    """One summary row per user for ``(user_id, created_at, risk_level)`` records."""
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for user_id, created_at, risk_level in sorted(records, key=lambda record: record[1]):
+        epoch = to_epoch(created_at)
+        summary = summaries.get(user_id)
+        if summary is None:
+            summary = summaries[user_id] = {"user_id": user_id, "attempt_count": 0}
+            summary["blocked_count"] = 0
+            for name, width in WINDOWS.items():
+                summary[f"bucket_{name}"] = int(epoch // width)
+                summary[f"count_{name}"] = summary[f"previous_{name}"] = 0
+        summary["attempt_count"] += 1
+        summary["blocked_count"] += int(blocked)
+        summary["last_seen"] = created_at
+        summary["risk_level"] = risk_level
+        for name, width in WINDOWS.items():
+            bucket = int(epoch // width)
+            if bucket == summary[f"bucket_{name}"] + 1:
+                summary[f"previous_{name}"] = summary[f"count_{name}"]
+                summary[f"count_{name}"] = 0
+            elif bucket > summary[f"bucket_{name}"]:
+                summary[f"previous_{name}"] = summary[f"count_{name}"] = 0
+            summary[f"bucket_{name}"] = bucket
+            summary[f"count_{name}"] += 1
+    return list(summaries.values())
+
+
+def summarize_attempts(
+    db: Union[Session, Connection], rows: List[Mapping[str, Any]]
+) -> None:
+    """Add newly inserted records, as column dicts, to their users' summaries."""
+    if not rows:
+        return
+
+    def assignments(table, new) -> List[Tuple[str, Any]]:
+        newer = new["last_seen"] >= table.last_seen
+        values = [
+            ("attempt_count", table.attempt_count + new["attempt_count"]),
+            ("blocked_count", table.blocked_count + new["blocked_count"]),
+            ("risk_level", case((newer, new["risk_level"]), else_=table.risk_level)),
+            ("last_seen", case((newer, new["last_seen"]), else_=table.last_seen)),
+        ]
+        for name in WINDOWS:
+            bucket, new_bucket = table[f"bucket_{name}"], new[f"bucket_{name}"]
+            count, new_count = table[f"count_{name}"], new[f"count_{name}"]
+            previous, new_previous = table[f"previous_{name}"], new[f"previous_{name}"]
+            values += [
+                (
+                    f"previous_{name}",
+                    case(
+                        (bucket >= new_bucket, previous + new_previous),
+                        (bucket == new_bucket - 1, count + new_previous),
+                        else_=new_previous,
+                    ),
+                ),
+                (
+                    f"count_{name}",
+                    case((bucket >= new_bucket, count + new_count), else_=new_count),
+                ),
+                # A stored bucket ahead of this one (another instance's clock) is kept
+                (
+                    f"bucket_{name}",
+                    case((bucket > new_bucket, bucket), else_=new_bucket),
+                ),
+            ]
+        return values
+
+    _upsert(
+        db,
+        _summaries(
+            ((row["user_id"], row["created_at"], row["risk_level"]) for row in rows),
+            blocked=False,
+        ),
+        assignments,
+    )
+
+
+def summarize_blocks(
+    db: Union[Session, Connection],
+    frauds: List[FraudPrevention],
+    newly_blocked: bool = True,
+) -> None:
+    """Count blocked records in their users' summaries.
+
+    Records blocked again are passed with ``newly_blocked=False``: they only
+    raise the user's level if they are the latest record.
+    """
+    if not frauds:
+        return
+
+    def assignments(table, new) -> List[Tuple[str, Any]]:
+        return [
+            ("blocked_count", table.blocked_count + new["blocked_count"]),
+            (
+                "risk_level",
+                case(
+                    (new["last_seen"] >= table.last_seen, new["risk_level"]),
+                    else_=table.risk_level,
+                ),
+            ),
+        ]
+
+    _upsert(
+        db,
+        _summaries(
+            ((fraud.user_id, fraud.created_at, fraud.risk_level) for fraud in frauds),
+            blocked=newly_blocked,
+        ),
+        assignments,
+    )
+
+
+def _aggregate(now: datetime, user_ids: Optional[List[str]] = None) -> Select:
+    """Summary rows computed from fraud_prevention, in SUMMARY_COLUMNS order."""
+    latest = aliased(FraudPrevention)
+    columns = [
+        FraudPrevention.user_id,
+        func.count(),
+        func.sum(case((FraudPrevention.is_blocked, 1), else_=0)),
+        func.max(FraudPrevention.created_at),
+        select(latest.risk_level)
+        .where(latest.user_id == FraudPrevention.user_id)
+        .order_by(latest.created_at.desc(), latest.id.desc())
+        .limit(1)
+        .scalar_subquery(),
+    ]
+    epoch = to_epoch(now)
+    for width in WINDOWS.values():
+        bucket = int(epoch // width)
+        start = _from_epoch(bucket * width)
+        previous_start = _from_epoch((bucket - 1) * width)
+        columns += [
+            literal(bucket, Integer),
+            func.sum(case((FraudPrevention.created_at >= start, 1), else_=0)),
+            func.sum(
+                case(
+                    (
+                        and_(
+                            FraudPrevention.created_at >= previous_start,
+                            FraudPrevention.created_at < start,
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            ),
+        ]
+    stmt = select(*columns).group_by(FraudPrevention.user_id)
+    if user_ids is not None:
+        stmt = stmt.where(FraudPrevention.user_id.in_(user_ids))
+    return stmt
+
+
+def refresh_summaries(db: Union[Session, Connection], user_ids: Iterable[str]) -> None:
+    """Recompute the given users' summaries from their records."""
+    user_ids = sorted(set(user_ids))
+    now = datetime.utcnow()
+    dialect = _dialect(db)
+    for start in range(0, len(user_ids), REFRESH_CHUNK_SIZE):
+        chunk = user_ids[start:start + REFRESH_CHUNK_SIZE]
+        aggregate = _aggregate(now, chunk)
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (postgresql if dialect == "postgresql" else sqlite).insert(
+                UserRiskSummary
+            ).from_select(SUMMARY_COLUMNS, aggregate)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={name: stmt.excluded[name] for name in SUMMARY_COLUMNS[1:]},
+            )
+        elif dialect in ("mysql", "mariadb"):
+            stmt = mysql.insert(UserRiskSummary).from_select(SUMMARY_COLUMNS, aggregate)
+            stmt = stmt.on_duplicate_key_update(
+                {name: stmt.inserted[name] for name in SUMMARY_COLUMNS[1:]}
+            )
+        else:
+            db.execute(delete(UserRiskSummary).where(UserRiskSummary.user_id.in_(chunk)))
+            stmt = insert(UserRiskSummary).from_select(SUMMARY_COLUMNS, aggregate)
+        db.execute(stmt)
+
+
+def rebuild_summaries(db: Session) -> int:
+    """Replace every summary with one recomputed from fraud_prevention; returns the user count."""
+    db.execute(delete(UserRiskSummary))
+    db.execute(
+        insert(UserRiskSummary).from_select(SUMMARY_COLUMNS, _aggregate(datetime.utcnow()))
+    )
+    db.commit()
+    return db.scalar(select(func.count()).select_from(UserRiskSummary))
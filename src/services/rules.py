@@ -0,0 +1,206 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from src.models.fraud_prevention import RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.velocity import DIMENSIONS, WINDOWS
+
+# Severity order; a request is scored with the highest level among matching rules
+LEVELS = [RiskLevel.LOW, RiskLevel.MEDIUM, RiskLevel.HIGH, RiskLevel.CRITICAL]
+
+# The thresholds the service has always applied to a user's previous attempts
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"type": "velocity", "dimension": "user_id", "threshold": 10, "level": "critical"},
+    {"type": "velocity", "dimension": "user_id", "threshold": 5, "level": "high"},
+    {"type": "velocity", "dimension": "user_id", "threshold": 3, "level": "medium"},
+]
+
+# Counts per velocity window (plus "total") for one key
+Counts = Dict[str, int]
+VelocityLookup = Callable[[str, str], Counts]
+
+
+class Features:
+    """Per-request inputs to rules; velocity counts are fetched once per dimension."""
+
+    def __init__(self, fraud_data: FraudPreventionCreate, velocity: VelocityLookup):
+        self.fraud_data = fraud_data
+        self._velocity = velocity
+        self._counts: Dict[str, Optional[Counts]] = {}
+
+    def key(self, dimension: str) -> Optional[str]:
+        return getattr(self.fraud_data, dimension)
+
+    def velocity(self, dimension: str) -> Optional[Counts]:
+        if dimension not in self._counts:
+            key = self.key(dimension)
+            self._counts[dimension] = (
+                None if key is None else self._velocity(dimension, key)
+            )
+        return self._counts[dimension]
+
+
+@dataclass
+class Rule:
+    name: str
+    level: RiskLevel
+    check: Callable[[Features], bool]
+    # Relative evaluation cost; cheaper rules run first within a level
+    cost: int
+
+
+@dataclass
+class RiskAssessment:
+    level: RiskLevel
+    rule: Optional[str] = None
+    # Seconds spent in each rule evaluated for this request
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _level(spec: Dict[str, Any]) -> RiskLevel:
+    return RiskLevel(spec["level"])
+
+
+def _dimension(spec: Dict[str, Any]) -> str:
+    dimension = spec["dimension"]
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown rule dimension: {dimension}")
+    return dimension
+
+
+def _velocity_rule(spec: Dict[str, Any]) -> Rule:
+    dimension = _dimension(spec)
+    window = spec.get("window", "total")
+    if window != "total" and window not in WINDOWS:
+        raise ValueError(f"Unknown velocity window: {window}")
+    threshold = int(spec["threshold"])
+
+    def check(features: Features) -> bool:
+        counts = features.velocity(dimension)
+        return counts is not None and counts[window] >= threshold
+
+    name = spec.get("name", f"velocity:{dimension}:{window}>={threshold}")
+    return Rule(name, _level(spec), check, cost=2)
+
+
+def _amount_rule(spec: Dict[str, Any]) -> Rule:
+    key = spec.get("field", "amount")
+    threshold = float(spec["threshold"])
+
+    def check(features: Features) -> bool:
+        value = (features.fraud_data.additional_data or {}).get(key)
+        return (
+            isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and value >= threshold
+        )
+
+    name = spec.get("name", f"amount:{key}>={spec['threshold']}")
+    return Rule(name, _level(spec), check, cost=0)
+
+
+def _blocklist_rule(spec: Dict[str, Any]) -> Rule:
+    dimension = _dimension(spec)
+    values = frozenset(spec["values"])
+
+    def check(features: Features) -> bool:
+        return features.key(dimension) in values
+
+    name = spec.get("name", f"blocklist:{dimension}")
+    return Rule(name, _level(spec), check, cost=0)
+
+
+RULE_TYPES: Dict[str, Callable[[Dict[str, Any]], Rule]] = {
+    "velocity": _velocity_rule,
+    "amount": _amount_rule,
+    "blocklist": _blocklist_rule,
+}
+
+
+def compile_rule(spec: Dict[str, Any]) -> Rule:
+    try:
+        factory = RULE_TYPES[spec["type"]]
+    except KeyError:
+        raise ValueError(f"Unknown rule type: {spec.get('type')}")
+    return factory(spec)
+
+
+class RuleEngine:
+    """Scores requests with rules compiled once into an evaluation plan.
+
+    Rules run from the most to the least severe level, cheapest first within a
+    level, and evaluation stops at the first match: no later rule can raise the
+    score. Velocity counts are looked up lazily and shared between rules.
+    """
+
+    def __init__(self, specs: List[Dict[str, Any]]):
+        self.specs = specs
+        rules = [compile_rule(spec) for spec in specs]
+        self.plan = sorted(rules, key=lambda rule: (-LEVELS.index(rule.level), rule.cost))
+        self.dimensions = sorted(
+            {spec["dimension"] for spec in specs if spec["type"] == "velocity"}
+        )
+
+    def evaluate(
+        self, fraud_data: FraudPreventionCreate, velocity: VelocityLookup
+    ) -> RiskAssessment:
+        features = Features(fraud_data, velocity)
+        timings = {}
+        for rule in self.plan:
+            start = time.perf_counter()
+            matched = rule.check(features)
+            timings[rule.name] = time.perf_counter() - start
+            if matched:
+                return RiskAssessment(rule.level, rule.name, timings)
+        return RiskAssessment(RiskLevel.LOW, None, timings)
+
+    def evaluate_in_order(
+        self,
+        items: List[FraudPreventionCreate],
+        counts: Dict[str, Dict[str, Counts]],
+    ) -> List[RiskAssessment]:
+        """Score items as if created one after another.
+
+        ``counts`` holds prior counts per dimension and key for every key in
+        ``items``; it is advanced past each item so later items see earlier ones.
+        """
+        assessments = []
+        for item in items:
+            assessments.append(
+                self.evaluate(item, lambda dimension, key: counts[dimension][key])
+            )
+            for dimension in self.dimensions:
+                key = getattr(item, dimension)
+                if key is not None:
+                    key_counts = counts[dimension][key]
+                    for window in key_counts:
+                        key_counts[window] += 1
+        return assessments
+
+
+def load_rules() -> List[Dict[str, Any]]:
+    """Rule specs from the JSON file named by RISK_RULES_FILE, else the defaults."""
+    path = os.getenv("RISK_RULES_FILE")
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return json.load(f)
+
+
+_rule_engine: Optional[RuleEngine] = None
+
+
+def get_rule_engine() -> RuleEngine:
+    global _rule_engine
+    if _rule_engine is None:
+        _rule_engine = RuleEngine(load_rules())
+    return _rule_engine
+
+
+def set_rule_engine(engine: Optional[RuleEngine]) -> None:
+    """Replace the process-wide engine; None recompiles from configuration on next use."""
+    global _rule_engine
+    _rule_engine = engine
@@ -0,0 +1,35 @@
+"""Render records straight to JSON bytes.
+
+List endpoints select only the response columns and encode the rows with
+pydantic-core's serializer, skipping per-record model validation and FastAPI's
+response_model pass. The output matches FraudPreventionResponse's JSON.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from fastapi.responses import Response
+from pydantic_core import to_json
+
+from src.models.fraud_prevention import FraudPrevention
+from src.schemas.fraud_prevention import FraudPreventionResponse
+
+# (column, camelCase field name) in response field order
+RESPONSE_FIELDS = [
+    (getattr(FraudPrevention, name), field.alias)
+    for name, field in FraudPreventionResponse.model_fields.items()
+]
+RESPONSE_COLUMNS = [column for column, _ in RESPONSE_FIELDS]
+FIELD_NAMES = [name for _, name in RESPONSE_FIELDS]
+
+
+def record_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    """A row of RESPONSE_COLUMNS keyed by response field name."""
+    return dict(zip(FIELD_NAMES, row))
+
+
+def record_dicts(rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    return [dict(zip(FIELD_NAMES, row)) for row in rows]
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Encode ``content`` once into a JSON response, with no response_model pass."""
+    return Response(to_json(content), media_type="application/json", headers=headers)
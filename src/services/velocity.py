@@ -0,0 +1,311 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.models.fraud_prevention import FraudPrevention
+
+logger = logging.getLogger(__name__)
+
+# Dimensions tracked for every fraud prevention record
+DIMENSIONS = ("user_id", "user_ip", "device_id")
+
+# Sliding windows (name -> width in seconds); each window keeps WINDOW_BUCKETS buckets
+WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}
+WINDOW_BUCKETS = 60
+
+
+def to_epoch(dt: datetime) -> float:
+    """Convert a naive UTC datetime (as stored by the model) to epoch seconds."""
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window counter made of fixed-width time buckets."""
+
+    __slots__ = ("step", "buckets", "total")
+
+    def __init__(self, width: int, buckets: int = WINDOW_BUCKETS):
+        self.step = width / buckets
+        self.buckets = deque()  # [bucket_index, count], oldest first
+        self.total = 0
+
+    def add(self, ts: float, amount: int = 1) -> None:
+        index = int(ts // self.step)
+        for bucket in reversed(self.buckets):
+            if bucket[0] == index:
+                bucket[1] += amount
+                self.total += amount
+                return
+            if bucket[0] < index:
+                break
+        if self.buckets and self.buckets[-1][0] > index:
+            # Out-of-order event older than the newest bucket; only seen during warmup
+            self.buckets.append([index, amount])
+            self.buckets = deque(sorted(self.buckets))
+        else:
+            self.buckets.append([index, amount])
+        self.total += amount
+
+    def count(self, now: float) -> int:
+        oldest = int(now // self.step) - WINDOW_BUCKETS + 1
+        while self.buckets and self.buckets[0][0] < oldest:
+            self.total -= self.buckets.popleft()[1]
+        return self.total
+
+
+class VelocityEntry:
+    """Lifetime total plus sliding windows for a single key."""
+
+    __slots__ = ("total", "windows", "last_seen", "loaded_at")
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.windows = {name: SlidingWindowCounter(width) for name, width in WINDOWS.items()}
+        self.last_seen = self.loaded_at = time.time()
+
+    def snapshot(self, now: float) -> Dict[str, int]:
+        counts = {name: counter.count(now) for name, counter in self.windows.items()}
+        counts["total"] = self.total
+        return counts
+
+
+class VelocityStore(ABC):
+    """Interface for velocity counters keyed by (dimension, value)."""
+
+    @abstractmethod
+    def get(self, dimension: str, key: str) -> Optional[Dict[str, int]]:
+        """Return {"total", "1m", "1h", "24h"} for a key, or None if the store cannot answer."""
+
+    @abstractmethod
+    def seed(
+        self, dimension: str, key: str, total: int, recent: Iterable[float] = ()
+    ) -> None:
+        """Store a key loaded from the database: lifetime total and recent event times."""
+
+    @abstractmethod
+    def record(self, fraud: FraudPrevention, ts: Optional[float] = None) -> None:
+        """Count a newly persisted record against all of its dimensions."""
+
+    def warm(self, db: Session) -> None:
+        """Preload counters from the database. Optional for backends."""
+
+
+class NullVelocityStore(VelocityStore):
+    """Store that never answers, so every lookup falls back to the database."""
+
+    def get(self, dimension: str, key: str) -> Optional[Dict[str, int]]:
+        return None
+
+    def seed(
+        self, dimension: str, key: str, total: int, recent: Iterable[float] = ()
+    ) -> None:
+        pass
+
+    def record(self, fraud: FraudPrevention, ts: Optional[float] = None) -> None:
+        pass
+
+
+class InMemoryVelocityStore(VelocityStore):
+    """Process-local velocity counters with idle eviction and a bounded key budget.
+
+    Each dimension keeps at most ``max_keys`` entries in LRU order. Keys idle for
+    longer than ``idle_ttl`` seconds are swept periodically. A warmed store only
+    reports unknown keys as zero when this process is the ``single_writer``:
+    otherwise other workers and instances create records it never sees, so
+    unknown keys return None and callers fall back to the database. Once a key
+    has been evicted the store is no longer authoritative either. For the same
+    reason, without a single writer a loaded key only counts this process's
+    records on top of what was loaded, so it is dropped ``refresh_seconds``
+    after loading and the next lookup reloads it from the database.
+    """
+
+    def __init__(
+        self,
+        max_keys: int = 100_000,
+        idle_ttl: float = 86400.0,
+        single_writer: bool = False,
+        refresh_seconds: float = 5.0,
+    ):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.single_writer = single_writer
+        self.refresh_seconds = refresh_seconds
+        self.authoritative = False
+        self.evictions = 0
+        self._next_sweep = 0.0
+        self._entries: Dict[str, "OrderedDict[str, VelocityEntry]"] = {
+            dimension: OrderedDict() for dimension in DIMENSIONS
+        }
+        self._lock = threading.Lock()
+
+    def get(self, dimension: str, key: str) -> Optional[Dict[str, int]]:
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries[dimension].get(key)
+            if (
+                entry is not None
+                and not self.single_writer
+                and now - entry.loaded_at >= self.refresh_seconds
+            ):
+                del self._entries[dimension][key]
+                entry = None
+            if entry is None:
+                if self.authoritative:
+                    return {"total": 0, **{name: 0 for name in WINDOWS}}
+                return None
+            self._touch(dimension, key, entry, now)
+            return entry.snapshot(now)
+
+    def seed(
+        self, dimension: str, key: str, total: int, recent: Iterable[float] = ()
+    ) -> None:
+        with self._lock:
+            entries = self._entries[dimension]
+            if key in entries:
+                return
+            entry = entries[key] = VelocityEntry(total)
+            for ts in recent:
+                for counter in entry.windows.values():
+                    counter.add(ts)
+            self._enforce_budget(entries)
+
+    def record(self, fraud: FraudPrevention, ts: Optional[float] = None) -> None:
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._sweep(time.time())
+            for dimension in DIMENSIONS:
+                key = getattr(fraud, dimension)
+                if key is not None:
+                    self._add(dimension, key, ts)
+
+    def warm(self, db: Session) -> None:
+        """Load lifetime totals and the last 24h of events for the most recent keys."""
+        since = datetime.utcnow() - timedelta(seconds=max(WINDOWS.values()))
+        complete = True
+        totals = {}
+        for dimension in DIMENSIONS:
+            column = getattr(FraudPrevention, dimension)
+            rows = (
+                db.query(column, func.count(), func.max(FraudPrevention.created_at))
+                .filter(column.isnot(None))
+                .group_by(column)
+                .order_by(func.max(FraudPrevention.created_at).desc())
+                .limit(self.max_keys + 1)
+                .all()
+            )
+            if len(rows) > self.max_keys:
+                complete = False
+                rows = rows[: self.max_keys]
+            totals[dimension] = rows
+
+        recent = (
+            db.query(
+                FraudPrevention.user_id,
+                FraudPrevention.user_ip,
+                FraudPrevention.device_id,
+                FraudPrevention.created_at,
+            )
+            .filter(FraudPrevention.created_at >= since)
+            .order_by(FraudPrevention.created_at)
+            .yield_per(1000)
+        )
+
+        with self._lock:
+            for dimension, rows in totals.items():
+                entries = self._entries[dimension]
+                entries.clear()
+                # Oldest first so the most recently seen keys end up hottest in LRU order
+                for key, total, _ in reversed(rows):
+                    entries[key] = VelocityEntry(total)
+            for row in recent:
+                ts = to_epoch(row.created_at)
+                for dimension in DIMENSIONS:
+                    entry = self._entries[dimension].get(getattr(row, dimension))
+                    if entry is not None:
+                        for counter in entry.windows.values():
+                            counter.add(ts)
+            self.authoritative = complete and self.single_writer
+        logger.info(
+            "Velocity store warmed: %s",
+            {dimension: len(entries) for dimension, entries in self._entries.items()},
+        )
+
+    def _add(self, dimension: str, key: str, ts: float) -> None:
+        entries = self._entries[dimension]
+        entry = entries.get(key)
+        if entry is None:
+            if not self.authoritative:
+                # Unknown history; leave it to the next lookup to seed from the database
+                return
+            entry = entries[key] = VelocityEntry()
+            self._enforce_budget(entries)
+        entry.total += 1
+        for counter in entry.windows.values():
+            counter.add(ts)
+        self._touch(dimension, key, entry, time.time())
+
+    def _touch(self, dimension: str, key: str, entry: VelocityEntry, now: float) -> None:
+        entry.last_seen = now
+        self._entries[dimension].move_to_end(key)
+
+    def _sweep(self, now: float) -> None:
+        # LRU order matches last_seen order, so idle keys are always at the front
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + min(self.idle_ttl, 60.0)
+        for entries in self._entries.values():
+            while entries:
+                key, entry = next(iter(entries.items()))
+                if now - entry.last_seen <= self.idle_ttl:
+                    break
+                self._evict(entries, key)
+
+    def _enforce_budget(self, entries: "OrderedDict[str, VelocityEntry]") -> None:
+        while len(entries) > self.max_keys:
+            oldest = next(iter(entries))
+            self._evict(entries, oldest)
+
+    def _evict(self, entries: "OrderedDict[str, VelocityEntry]", key: str) -> None:
+        del entries[key]
+        self.evictions += 1
+        self.authoritative = False
+
+
+def _build_store() -> VelocityStore:
+    backend = os.getenv("VELOCITY_BACKEND", "memory")
+    if backend == "none":
+        return NullVelocityStore()
+    if backend == "memory":
+        return InMemoryVelocityStore(
+            max_keys=int(os.getenv("VELOCITY_MAX_KEYS", "100000")),
+            idle_ttl=float(os.getenv("VELOCITY_IDLE_TTL_SECONDS", "86400")),
+            single_writer=os.getenv("VELOCITY_SINGLE_WRITER", "false") == "true",
+            refresh_seconds=float(os.getenv("VELOCITY_REFRESH_SECONDS", "5")),
+        )
+    raise ValueError(f"Unknown VELOCITY_BACKEND: {backend}")
+
+
+_store: Optional[VelocityStore] = None
+
+
+def get_velocity_store() -> VelocityStore:
+    global _store
+    if _store is None:
+        _store = _build_store()
+    return _store
+
+
+def set_velocity_store(store: Optional[VelocityStore]) -> None:
+    """Replace the process-wide store; None rebuilds it from configuration on next use."""
+    global _store
+    _store = store
+
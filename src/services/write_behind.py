@@ -0,0 +1,328 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_core import to_json
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+
+from src.database.database import setup_database
+from src.metrics import record_write_flush, record_write_rejected
+from src.models.fraud_prevention import FraudPrevention
+from src.services.risk_summary import summarize_attempts
+
+logger = logging.getLogger(__name__)
+
+# Backoff between attempts at a batch while the database is unreachable
+RETRY_INITIAL_DELAY = 0.1
+RETRY_MAX_DELAY = 5.0
+
+
+class WriteBehindFullError(Exception):
+    """The write-behind queue stayed full for the whole enqueue timeout."""
+
+
+def _transient(error: Exception) -> bool:
+    """Whether a failed write may succeed later: the database was unreachable,
+    rather than a row being rejected."""
+    if isinstance(error, (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)):
+        return True
+    return isinstance(error, exc.DBAPIError) and error.connection_invalidated
+
+
+class WriteBehindWriter:
+    """Persists scored records in the background, in batches.
+
+    ``enqueue`` hands a row to a bounded queue and returns. A worker thread
+    inserts up to ``batch_size`` rows at a time, as soon as a batch is full or
+    ``flush_interval`` seconds after its first row, with one commit per batch.
+    When the queue is full, ``enqueue`` waits up to ``enqueue_timeout`` seconds
+    and then raises WriteBehindFullError, so callers slow down instead of
+    buffering without bound. ``shutdown`` writes everything still queued.
+
+    While the database is unreachable a batch is retried with exponential
+    backoff for up to ``retry_seconds``, then put back in the queue if it has
+    room. A batch the database rejects is written one row at a time, so one
+    bad row does not cost the others. Rows that cannot be written or requeued
+    are appended as NDJSON to ``dead_letter_path`` instead of being dropped;
+    it should be on durable storage, as they were already acknowledged.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        dead_letter_path: str,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        max_queue: int = 10_000,
+        enqueue_timeout: float = 0.5,
+        retry_seconds: float = 30.0,
+    ):
+        self.engine = engine
+        self.dead_letter_path = dead_letter_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_seconds = retry_seconds
+        self.written = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.requeued = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, row: Dict[str, Any]) -> None:
+        if self._worker is None:
+            self._start()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            record_write_rejected()
+            raise WriteBehindFullError()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def shutdown(self) -> None:
+        """Stop the worker once every queued row is written."""
+        self._stop.set()
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join()
+        # Rows enqueued after the worker exited, or with no worker at all
+        while self._queue.qsize():
+            self._flush(self._take(timeout=0))
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="write-behind", daemon=True
+            )
+            self._worker.start()
+            atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._take(timeout=self.flush_interval)
+            if batch:
+                self._flush(batch)
+
+    def _take(self, timeout: float) -> List[Dict[str, Any]]:
+        """Up to batch_size rows, waiting at most ``timeout`` after the first one."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            # Once stopping, write what is queued without waiting for more
+            remaining = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        depth = self._queue.qsize() + len(batch)
+        start = time.perf_counter()
+        written = 0
+        rejected: List[Dict[str, Any]] = []
+        retry: List[Dict[str, Any]] = []
+        try:
+            written = self._write_retrying(batch)
+        except Exception as error:
+            if _transient(error):
+                logger.warning(
+                    "Write-behind batch of %d failed for %.0fs", len(batch),
+                    self.retry_seconds, exc_info=True,
+                )
+                retry = batch
+            else:
+                logger.warning(
+                    "Write-behind batch of %d was rejected; writing rows one at a time",
+                    len(batch),
+                    exc_info=True,
+                )
+                written, rejected, retry = self._write_each(batch)
+        unqueued = self._requeue(retry)
+        rejected += unqueued
+        self._dead_letter(rejected)
+        requeued = len(retry) - len(unqueued)
+        failed = len(rejected)
+        duplicates = len(batch) - written - failed - requeued
+        self.written += written
+        self.duplicates += duplicates
+        self.failed += failed
+        self.requeued += requeued
+        duration = time.perf_counter() - start
+        record_write_flush(depth, duration, written, duplicates, failed)
+
+    def _write_retrying(self, rows: List[Dict[str, Any]]) -> int:
+        """Write rows, backing off exponentially for up to retry_seconds while the
+        database is unreachable."""
+        deadline = time.monotonic() + self.retry_seconds
+        delay = RETRY_INITIAL_DELAY
+        while True:
+            try:
+                return self._write(rows)
+            except Exception as error:
+                if not _transient(error) or time.monotonic() + delay > deadline:
+                    raise
+                logger.info("Write-behind batch failed; retrying in %.1fs", delay)
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    def _write_each(
+        self, rows: List[Dict[str, Any]]
+    ) -> Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Write rows one per transaction.
+
+        Returns the count written, the rows the database rejected and the rows
+        that failed because it became unreachable.
+        """
+        written = 0
+        rejected = []
+        retry = []
+        for row in rows:
+            try:
+                written += self._write([row])
+            except Exception as error:
+                logger.warning(
+                    "Write-behind record %s failed", row["transaction_id"], exc_info=True
+                )
+                (retry if _transient(error) else rejected).append(row)
+        return written, rejected, retry
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Put rows back in the queue for a later batch; returns those that did not fit.
+
+        Nothing is requeued while stopping, since nothing would take it.
+        """
+        if not rows:
+            return []
+        if self._stop.is_set() or self._queue.maxsize - self._queue.qsize() < len(rows):
+            return rows
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                # Filled by concurrent creates since the check
+                return rows[index:]
+        logger.warning("Requeued %d write-behind records", len(rows))
+        return []
+
+    def _dead_letter(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        transaction_ids = [row["transaction_id"] for row in rows]
+        try:
+            with open(self.dead_letter_path, "ab") as out:
+                for row in rows:
+                    out.write(to_json(row) + b"\n")
+                out.flush()
+                os.fsync(out.fileno())
+        except Exception:
+            logger.critical(
+                "Losing %d write-behind records, the dead-letter file is not writable: %s",
+                len(rows),
+                [to_json(row).decode() for row in rows],
+                exc_info=True,
+            )
+            return
+        logger.error(
+            "Wrote %d write-behind records that failed to insert to %s: %s",
+            len(rows),
+            self.dead_letter_path,
+            transaction_ids,
+        )
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        # Imported on use: the service module imports this one
+        from src.services.fraud_prevention import insert_ignoring_duplicates
+
+        with self.engine.begin() as conn:
+            stmt = insert_ignoring_duplicates(conn.dialect.name)
+            if conn.dialect.insert_executemany_returning:
+                stmt = stmt.returning(
+                    FraudPrevention.user_id,
+                    FraudPrevention.created_at,
+                    FraudPrevention.risk_level,
+                )
+                # Only the rows actually inserted come back, so duplicates are not counted
+                inserted = [row._mapping for row in conn.execute(stmt, rows)]
+            else:
+                # Without ON CONFLICT a duplicate fails the batch, so all rows were inserted
+                conn.execute(stmt, rows)
+                inserted = rows
+            summarize_attempts(conn, inserted)
+            return len(inserted)
+
+
+def write_behind_enabled() -> bool:
+    return os.getenv("WRITE_BEHIND", "false") == "true"
+
+
+def _build_writer() -> WriteBehindWriter:
+    dead_letter_path = os.getenv("WRITE_BEHIND_DEAD_LETTER_PATH")
+    if not dead_letter_path:
+        raise ValueError(
+            "WRITE_BEHIND_DEAD_LETTER_PATH must be set when WRITE_BEHIND=true"
+        )
+    engine, _ = setup_database()
+    return WriteBehindWriter(
+        engine,
+        dead_letter_path,
+        batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")),
+        flush_interval=float(
+            os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "0.2")
+        ),
+        max_queue=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")),
+        enqueue_timeout=float(
+            os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS", "0.5")
+        ),
+        retry_seconds=float(os.getenv("WRITE_BEHIND_RETRY_SECONDS", "30")),
+    )
+
+
+_writer: Optional[WriteBehindWriter] = None
+
+
+def get_write_behind() -> Optional[WriteBehindWriter]:
+    """The process-wide writer, or None unless WRITE_BEHIND=true."""
+    global _writer
+    if _writer is None and write_behind_enabled():
+        _writer = _build_writer()
+    return _writer
+
+
+def set_write_behind(writer: Optional[WriteBehindWriter]) -> None:
+    """Replace the process-wide writer; None rebuilds it from configuration on next use."""
+    global _writer
+    _writer = writer
+
+
+def shutdown_write_behind() -> None:
+    """Write every queued record before the process exits."""
+    if _writer is not None:
+        _writer.shutdown()
+
+
+def _reset_after_fork() -> None:
+    # Rows queued in the parent are written by the parent
+    global _writer
+    if _writer is not None:
+        atexit.unregister(_writer.shutdown)
+    _writer = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,33 +1,93 @@
+import functools
+import inspect
 import os
 from unittest.mock import MagicMock, patch
 
 import pytest
+from anyio.from_thread import start_blocking_portal
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 
 # Set testing environment before importing the app
 os.environ["TESTING"] = "true"
+os.environ["VELOCITY_WARMUP"] = "false"
+os.environ["QUERY_WARMUP"] = "false"
+# Test fixtures create the schema on the connections they serve
+os.environ["CREATE_SCHEMA"] = "false"
+# Keep metrics in memory instead of exporting to Cloud Monitoring
+os.environ["METRICS_EXPORTER"] = "memory"
 
-# Create mock for Cloud Monitoring
-mock_exporter = MagicMock()
 mock_metrics = MagicMock()
 mock_metrics.record_attempt = MagicMock()
 mock_metrics.record_blocked = MagicMock()
 
-# Patch both the exporter and the metrics module
-with patch(
-    "opentelemetry.exporter.cloud_monitoring.CloudMonitoringMetricsExporter",
-    return_value=mock_exporter,
-), patch("src.metrics.record_attempt", mock_metrics.record_attempt), patch(
+# Patch the metrics helpers the service imports
+with patch("src.metrics.record_attempt", mock_metrics.record_attempt), patch(
     "src.metrics.record_blocked", mock_metrics.record_blocked
 ):
-    from src.database.database import Base, get_db, setup_database
-    from src.main import app
+    from src.database.database import (
+        Base,
+        get_async_db,
+        get_async_session_factory,
+        get_db,
+        get_session_factory,
+        setup_database,
+    )
+    from src.main import app, create_app
+    from src.metrics import stage_timings
+    from src.services.archive import set_archive
+    from src.services.cache import set_recent_keys, set_record_cache
+    from src.services.pagination import total_count_cache
+    from src.services.fraud_prevention import (
+        AsyncFraudPreventionService,
+        FraudPreventionService,
+    )
+    from src.services.rules import set_rule_engine
+    from src.services.velocity import set_velocity_store
 
 # Initialize test database
 engine, SessionLocal = setup_database()
+
+
+# Let SQLAlchemy emit BEGIN itself so SAVEPOINTs nest inside the test transaction
+# (https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl)
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# Reconnect with the listeners in place, then create the schema
+engine.dispose()
 Base.metadata.create_all(bind=engine)
 
+# The same routes served by async handlers over an async driver
+async_app = create_app(async_mode=True)
+
+
+@pytest.fixture(autouse=True)
+def reset_process_state():
+    """Start every test with empty in-process counters and caches."""
+    set_velocity_store(None)
+    set_record_cache(None)
+    set_recent_keys(None)
+    set_rule_engine(None)
+    set_archive(None)
+    total_count_cache.clear()
+    stage_timings.clear()
+    yield
+    set_velocity_store(None)
+    set_record_cache(None)
+    set_recent_keys(None)
+    set_rule_engine(None)
+    set_archive(None)
+
 
 @pytest.fixture
 def metrics_mocks():
@@ -43,7 +103,8 @@ def db_session():
     """Create a fresh database session for each test."""
     connection = engine.connect()
     transaction = connection.begin()
-    session = SessionLocal(bind=connection)
+    # Savepoints keep service-level rollbacks from ending the test transaction
+    session = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
 
     yield session
 
@@ -52,9 +113,41 @@ def db_session():
     connection.close()
 
 
+class _Statements(list):
+    """SQL statements in the order issued, with each one's parameters."""
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = []
+
+    def clear(self):
+        super().clear()
+        self.parameters.clear()
+
+
 @pytest.fixture
-def client(db_session):
-    """Create a test client with a test database session."""
+def statements(db_session):
+    """SQL statements issued on the test connection."""
+    issued = _Statements()
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        # Savepoints come from the test transaction, not the code under test
+        if not statement.startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")):
+            issued.append(statement)
+            issued.parameters.append(parameters)
+
+    bind = db_session.connection()
+    event.listen(bind, "before_cursor_execute", listener)
+    yield issued
+    event.remove(bind, "before_cursor_execute", listener)
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, db_session):
+    """Create a test client with a test database, once per execution mode."""
+    if request.param == "async":
+        yield from _async_client()
+        return
 
     def override_get_db():
         try:
@@ -63,6 +156,77 @@ def client(db_session):
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: lambda: db_session
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+
+
+def _async_client():
+    """Serve the async app from a fresh in-memory aiosqlite database."""
+    async_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def create_schema():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    async_app.dependency_overrides[get_async_session_factory] = lambda: AsyncSessionLocal
+    with TestClient(async_app) as test_client:
+        test_client.portal.call(create_schema)
+        yield test_client
+        test_client.portal.call(async_engine.dispose)
+    async_app.dependency_overrides.clear()
+
+
+@pytest.fixture(params=["sync", "async"])
+def service(request, db_session):
+    """Create a fraud prevention service, once per execution mode.
+
+    The async service is driven from the test through a blocking portal, so the
+    same synchronous test body covers both.
+    """
+    if request.param == "sync":
+        yield FraudPreventionService(db_session)
+        return
+
+    async_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def create_schema():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    with start_blocking_portal("asyncio") as portal:
+        portal.call(create_schema)
+        session = AsyncSessionLocal()
+        yield _Blocking(AsyncFraudPreventionService(session), portal)
+        portal.call(session.close)
+        portal.call(async_engine.dispose)
+
+
+class _Blocking:
+    """Expose an async service's coroutine methods as blocking calls."""
+
+    def __init__(self, target, portal):
+        self._target = target
+        self._portal = portal
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "db":
+            return _Blocking(attr, self._portal)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._portal.call(functools.partial(attr, *args, **kwargs))
+
+        return call
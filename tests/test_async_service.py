@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.database import Base
+from src.models.fraud_prevention import RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import AsyncFraudPreventionService
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def async_db_session():
+    """Create an async session over a fresh in-memory database."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with AsyncSessionLocal() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_async_create_and_lookup(async_db_session):
+    """Test creating and reading back a record through the async service."""
+    service = AsyncFraudPreventionService(async_db_session)
+
+    fraud_data = FraudPreventionCreate(
+        transaction_id="async-tx", user_ip="192.168.1.1", user_id="async-user"
+    )
+    created = await service.create(fraud_data)
+    assert created.risk_level == RiskLevel.LOW
+
+    result = await service.get_by_transaction_id("async-tx")
+    assert result.id == created.id
+
+    blocked = await service.block_transaction(created.id, "Async block")
+    assert blocked.is_blocked
+    assert blocked.attempt_count == 1
+
+
+@pytest.mark.anyio
+async def test_async_risk_assessment(async_db_session):
+    """Test risk escalation is identical in async mode."""
+    service = AsyncFraudPreventionService(async_db_session)
+    for i in range(6):
+        result = await service.create(
+            FraudPreventionCreate(
+                transaction_id=f"async-risk-{i}", user_ip="192.168.1.1", user_id="u"
+            )
+        )
+    assert result.risk_level == RiskLevel.HIGH
@@ -0,0 +1,120 @@
+import json
+from unittest.mock import patch
+
+from src.database.database import PRIMARY_READS
+from src.models.fraud_prevention import RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate, FraudPreventionUpdate
+from src.services.cache import CacheBackend, InMemoryCache, RecordCache
+from src.services.fraud_prevention import FraudPreventionService
+
+
+class FakeSharedCache(CacheBackend):
+    """Stands in for a networked cache: values cross the boundary as JSON."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        raw = self.data.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.data[key] = json.dumps(value)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+def _create(service, transaction_id="cache-tx"):
+    return service.create(
+        FraudPreventionCreate(
+            transaction_id=transaction_id, user_ip="192.168.1.1", user_id="cache-user"
+        )
+    )
+
+
+def _new_request(db_session):
+    """Forget the session's writes, so its reads may use the cache again as in a
+    request that has not written."""
+    db_session.info.pop(PRIMARY_READS, None)
+
+
+def test_in_memory_cache_ttl_and_lru():
+    """Entries expire after their TTL and the least recently used go first."""
+    cache = InMemoryCache("test", max_entries=2)
+    with patch("src.services.cache.record_cache_eviction") as evicted:
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        assert cache.get("a") == 1
+        cache.set("c", 3, ttl=60)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+        cache.set("d", 4, ttl=0)
+        assert cache.get("d") is None
+        assert [call.args for call in evicted.call_args_list] == [
+            ("test", "size"),
+            ("test", "size"),
+            ("test", "expired"),
+        ]
+
+
+def test_lookups_are_served_from_cache(db_session, statements):
+    """Repeated lookups by id and transaction id skip the database."""
+    cache = RecordCache(InMemoryCache("records"))
+    service = FraudPreventionService(db_session, cache=cache)
+    created = _create(service)
+    _new_request(db_session)
+
+    with patch("src.services.cache.record_cache_hit") as hit, patch(
+        "src.services.cache.record_cache_miss"
+    ) as miss:
+        db_session.expunge_all()
+        statements.clear()
+        assert service.get_by_id(created.id).transaction_id == "cache-tx"
+        assert len(statements) == 1
+
+        assert service.get_by_id(created.id).id == created.id
+        fraud = service.get_by_transaction_id("cache-tx")
+        assert fraud.id == created.id
+        assert fraud.risk_level == RiskLevel.LOW
+        assert len(statements) == 1
+    assert miss.call_count == 1
+    assert hit.call_count == 2
+
+
+def test_update_and_block_invalidate(db_session):
+    """Writes drop cached entries so readers see the new state."""
+    service = FraudPreventionService(db_session, cache=RecordCache(InMemoryCache("t")))
+    created = _create(service)
+    _new_request(db_session)
+    service.get_by_id(created.id)
+
+    service.update(created.id, FraudPreventionUpdate(risk_level=RiskLevel.HIGH))
+    _new_request(db_session)
+    assert service.get_by_id(created.id).risk_level == RiskLevel.HIGH
+
+    service.block_transaction(created.id, "Cached block")
+    _new_request(db_session)
+    assert service.get_by_transaction_id("cache-tx").is_blocked
+
+
+def test_shared_backend_invalidation_across_services(db_session):
+    """An invalidation by one instance is visible to another sharing the backend."""
+    backend = FakeSharedCache()
+    writer = FraudPreventionService(db_session, cache=RecordCache(backend))
+    reader = FraudPreventionService(db_session, cache=RecordCache(backend))
+    created = _create(writer)
+    _new_request(db_session)
+
+    assert reader.get_by_id(created.id).attempt_count == 0
+    assert f"fraud:tx:{created.transaction_id}" in backend.data
+
+    writer.block_transaction(created.id, "Shared block")
+    assert backend.data == {}
+    _new_request(db_session)
+    assert reader.get_by_id(created.id).attempt_count == 1
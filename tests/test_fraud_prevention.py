@@ -1,7 +1,12 @@
+import csv
+import io
+import json
 import uuid
 
 from fastapi import status
 
+from src.schemas.fraud_prevention import FraudPreventionCreate
+
 
 def test_health_check(client):
     """Test the health check endpoint."""
@@ -34,6 +39,19 @@ def test_create_fraud_prevention(client):
     assert data["blockReason"] is None
 
 
+def test_create_rejects_invalid_body(client):
+    """Test invalid create bodies get a 422 naming the body field at fault."""
+    response = client.post(
+        "/api/fraud-preventions", json={"transactionId": "test-tx-invalid"}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    locations = {tuple(error["loc"]) for error in response.json()["detail"]}
+    assert locations == {("body", "userIp"), ("body", "userId")}
+
+    response = client.post("/api/fraud-preventions", content=b"{not json")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_get_nonexistent_fraud_prevention(client):
     """Test getting a non-existent fraud prevention record."""
     random_id = str(uuid.uuid4())
@@ -69,6 +87,49 @@ def test_block_transaction(client):
     assert blocked_data["attemptCount"] == 1
 
 
+def test_bulk_block_by_ids_and_user(client):
+    """Bulk blocking blocks open records in one request and skips blocked ones."""
+    ids = []
+    for i, user_id in enumerate(["bulk-user-a", "bulk-user-a", "bulk-user-b"]):
+        response = client.post(
+            "/api/fraud-preventions",
+            json={"transactionId": f"bulk-tx-{i}", "userIp": "10.0.0.1", "userId": user_id},
+        )
+        ids.append(response.json()["id"])
+
+    response = client.post(
+        "/api/fraud-preventions/block",
+        json={"ids": [ids[0], ids[2], "missing-id"], "reason": "Chargeback"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["blocked"] == 2
+    assert {fraud["id"] for fraud in body["data"]} == {ids[0], ids[2]}
+    assert all(fraud["riskLevel"] == "critical" for fraud in body["data"])
+    assert all(fraud["attemptCount"] == 1 for fraud in body["data"])
+
+    # Only the user's record that was still open is blocked
+    response = client.post(
+        "/api/fraud-preventions/block",
+        json={"userId": "bulk-user-a", "reason": "Account takeover"},
+    )
+    body = response.json()
+    assert body["blocked"] == 1
+    assert not body["more"]
+    assert body["data"][0]["id"] == ids[1]
+    assert client.get(f"/api/fraud-preventions/{ids[0]}").json()["blockReason"] == "Chargeback"
+
+
+def test_bulk_block_requires_one_target(client):
+    """Bulk blocking takes either ids or userId, not both or neither."""
+    for body in [
+        {"reason": "Fraud"},
+        {"ids": ["a"], "userId": "u", "reason": "Fraud"},
+    ]:
+        response = client.post("/api/fraud-preventions/block", json=body)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_risk_level_escalation(client):
     """Test that risk level increases with multiple transactions."""
     test_user = "risk-test-user"
@@ -128,3 +189,269 @@ def test_get_all_fraud_preventions(client):
     assert "isBlocked" in record
     assert "createdAt" in record
     assert "updatedAt" in record
+
+
+def test_user_history_pages_and_summary(client):
+    """User history is returned in bounded pages, and the summary aggregates it."""
+    ids = []
+    for i in range(5):
+        response = client.post(
+            "/api/fraud-preventions",
+            json={"transactionId": f"history-tx-{i}", "userIp": "10.0.0.1", "userId": "history-user"},
+        )
+        ids.append(response.json()["id"])
+    client.post(f"/api/fraud-preventions/{ids[0]}/block", json={"reason": "Fraud"})
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/fraud-preventions/user/history-user", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append([fraud["id"] for fraud in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [fraud_id for page in pages for fraud_id in page] == ids[::-1]
+
+    summary = client.get("/api/fraud-preventions/user/history-user/summary").json()
+    assert summary["userId"] == "history-user"
+    assert summary["total"] == 5
+    assert summary["blocked"] == 1
+    assert summary["riskLevels"] == {"low": 2, "medium": 2, "high": 0, "critical": 1}
+    assert summary["firstSeen"] < summary["lastSeen"]
+
+    empty = client.get("/api/fraud-preventions/user/unknown-user/summary").json()
+    assert empty["total"] == 0
+    assert empty["firstSeen"] is None
+
+
+def test_list_responses_match_record_responses(client):
+    """Rows rendered by the list fast path serialize exactly like single records."""
+    created = client.post(
+        "/api/fraud-preventions",
+        json={
+            "transactionId": "fast-path-tx",
+            "userIp": "192.168.1.1",
+            "userId": "fast-path-user",
+            "additionalData": {"amount": 12.5, "tags": ["a"]},
+        },
+    ).json()
+    record = client.get(f"/api/fraud-preventions/{created['id']}").json()
+
+    assert client.get("/api/fraud-preventions/user/fast-path-user").json() == [record]
+    assert client.get("/api/fraud-preventions?limit=1").json()["data"] == [record]
+
+
+def test_create_fraud_prevention_batch(client):
+    """Test batch creation returns per-item results in input order."""
+    items = [
+        {"transactionId": f"test-tx-batch-{i}", "userIp": "10.0.0.1", "userId": "batch-user"}
+        for i in range(4)
+    ]
+    items.insert(2, {"transactionId": "test-tx-batch-invalid", "userIp": "10.0.0.1"})
+
+    response = client.post("/api/fraud-preventions/batch", json=items)
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data["created"] == 4
+    assert data["failed"] == 1
+    assert [result["index"] for result in data["results"]] == [0, 1, 2, 3, 4]
+
+    invalid = data["results"][2]
+    assert not invalid["success"]
+    assert invalid["errors"][0]["loc"] == ["userId"]
+
+    created = [result["data"] for result in data["results"] if result["success"]]
+    assert [record["transactionId"] for record in created] == [
+        f"test-tx-batch-{i}" for i in range(4)
+    ]
+    # Items for the same user escalate in order, like sequential creates
+    assert [record["riskLevel"] for record in created] == ["low", "low", "low", "medium"]
+
+    response = client.get("/api/fraud-preventions/user/batch-user")
+    assert len(response.json()) == 4
+
+
+def test_create_fraud_prevention_batch_too_large(client):
+    """Test batches above the size limit are rejected."""
+    items = [{"transactionId": "tx", "userIp": "10.0.0.1", "userId": "u"}] * 1001
+    response = client.post("/api/fraud-preventions/batch", json=items)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_create_duplicate_transaction(client):
+    """Test a repeated create returns the original record instead of a new one."""
+    test_data = {
+        "transactionId": "test-tx-duplicate",
+        "userIp": "192.168.1.1",
+        "userId": "test-user-duplicate",
+    }
+    first = client.post("/api/fraud-preventions", json=test_data)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    response = client.post("/api/fraud-preventions", json=test_data)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == first.json()
+    assert response.headers["Idempotent-Replayed"] == "true"
+    history = client.get("/api/fraud-preventions/user/test-user-duplicate").json()
+    assert len(history) == 1
+
+    # The same transaction id with a different payload is a conflict
+    response = client.post(
+        "/api/fraud-preventions", json={**test_data, "userIp": "10.0.0.1"}
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    batch = [test_data, {**test_data, "transactionId": "test-tx-new"}]
+    batch.append(batch[1])
+    response = client.post("/api/fraud-preventions/batch", json=batch)
+    data = response.json()
+    assert data["created"] == 1
+    assert [result["success"] for result in data["results"]] == [False, True, False]
+    assert data["results"][0]["errors"][0]["type"] == "duplicate"
+
+
+def test_create_with_idempotency_key(client):
+    """Test retries with an Idempotency-Key replay the first response."""
+    test_data = {
+        "transactionId": "test-tx-idempotent",
+        "userIp": "192.168.1.1",
+        "userId": "test-user-idempotent",
+    }
+    headers = {"Idempotency-Key": "retry-key-1"}
+    first = client.post("/api/fraud-preventions", json=test_data, headers=headers)
+    retry = client.post("/api/fraud-preventions", json=test_data, headers=headers)
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    # Reusing the key for another transaction is a conflict
+    response = client.post(
+        "/api/fraud-preventions",
+        json={**test_data, "transactionId": "test-tx-other"},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    # A key equal to another record's transaction id does not match that record
+    plain = {**test_data, "transactionId": "test-tx-plain"}
+    assert client.post("/api/fraud-preventions", json=plain).status_code == 200
+    response = client.post(
+        "/api/fraud-preventions",
+        json={**test_data, "transactionId": "test-tx-keyed"},
+        headers={"Idempotency-Key": "test-tx-plain"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["transactionId"] == "test-tx-keyed"
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_cursor_pagination(client):
+    """Test walking the list with nextCursor returns every record exactly once."""
+    for i in range(5):
+        test_data = {
+            "transactionId": f"test-tx-cursor-{i}",
+            "userIp": "192.168.1.1",
+            "userId": f"test-user-cursor-{i}",
+        }
+        assert client.post("/api/fraud-preventions", json=test_data).status_code == 200
+
+    first = client.get("/api/fraud-preventions?limit=2").json()
+    assert first["total"] == 5
+    seen = [record["id"] for record in first["data"]]
+
+    cursor = first["nextCursor"]
+    while cursor:
+        response = client.get(f"/api/fraud-preventions?limit=2&cursor={cursor}")
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        assert "total" not in page
+        seen.extend(record["id"] for record in page["data"])
+        cursor = page["nextCursor"]
+
+    assert len(seen) == len(set(seen)) == 5
+
+    response = client.get(
+        f"/api/fraud-preventions?cursor={first['nextCursor']}&includeTotal=true"
+    )
+    assert response.json()["total"] == 5
+
+
+def test_invalid_cursor(client):
+    """Test a malformed cursor is rejected."""
+    response = client.get("/api/fraud-preventions?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_ndjson(client):
+    """Test exporting streams one JSON record per line, honouring filters."""
+    for i in range(3):
+        test_data = {
+            "transactionId": f"test-tx-export-{i}",
+            "userIp": "192.168.1.1",
+            "userId": "test-user-export",
+        }
+        fraud = client.post("/api/fraud-preventions", json=test_data).json()
+    client.post(f"/api/fraud-preventions/{fraud['id']}/block", json={"reason": "Export"})
+
+    response = client.get("/api/fraud-preventions/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["transactionId"] for record in records] == [
+        f"test-tx-export-{i}" for i in range(3)
+    ]
+    assert records[0]["riskLevel"] == "low"
+
+    response = client.get("/api/fraud-preventions/export?isBlocked=true")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [fraud["id"]]
+
+    response = client.get(
+        "/api/fraud-preventions/export",
+        params={"riskLevel": "high", "createdFrom": records[0]["createdAt"]},
+    )
+    assert response.text == ""
+
+
+def test_export_csv(client):
+    """Test exporting as CSV with a header row."""
+    test_data = {
+        "transactionId": "test-tx-export-csv",
+        "userIp": "192.168.1.1",
+        "userId": "test-user-export",
+        "additionalData": {"amount": 100},
+    }
+    client.post("/api/fraud-preventions", json=test_data)
+
+    response = client.get("/api/fraud-preventions/export?format=csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    header, row = csv.reader(io.StringIO(response.text))
+    record = dict(zip(header, row))
+    assert record["transactionId"] == "test-tx-export-csv"
+    assert json.loads(record["additionalData"]) == {"amount": 100}
+
+
+def test_debug_timings_cover_create_stages(client):
+    """Test creating a record reports each stage of the create path."""
+    test_data = {
+        "transactionId": "test-tx-timings",
+        "userIp": "192.168.1.1",
+        "userId": "test-user-timings",
+    }
+    assert client.post("/api/fraud-preventions", json=test_data).status_code == 200
+
+    timings = client.get("/debug/timings").json()
+    stages = {"validation", "risk_assessment", "insert", "commit", "serialization"}
+    assert stages <= set(timings)
+    assert timings["commit"]["count"] == 1
+    assert timings["commit"]["p50"] <= timings["commit"]["p99"]
+
+    assert client.delete("/debug/timings").status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/debug/timings").json() == {}
+
+    # Only request bodies are timed, not models built elsewhere
+    FraudPreventionCreate.model_validate(test_data)
+    assert client.get("/debug/timings").json() == {}
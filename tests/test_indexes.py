@@ -0,0 +1,142 @@
+import os
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+
+from src.database.database import Base
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.velocity import NullVelocityStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _query_plans(db_session, statements, call):
+    """Run a service call and return the SQLite query plan of each SELECT it issued."""
+    statements.clear()
+    call()
+    issued = list(zip(statements, statements.parameters))
+
+    bind = db_session.connection()
+    plans = []
+    for statement, parameters in issued:
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = bind.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append(" / ".join(row[-1] for row in rows))
+    return plans
+
+
+def _service(db_session):
+    # Without the in-memory counters, risk assessment goes to the database
+    service = FraudPreventionService(db_session, velocity=NullVelocityStore())
+    service.create(
+        FraudPreventionCreate(
+            transaction_id="plan-tx", user_ip="192.168.1.1", user_id="plan-user"
+        )
+    )
+    return service
+
+
+def test_transaction_lookup_uses_unique_index(db_session, statements):
+    """Test get_by_transaction_id searches the transaction_id index."""
+    service = _service(db_session)
+    (plan,) = _query_plans(
+        db_session, statements, lambda: service.get_by_transaction_id("plan-tx")
+    )
+    assert "USING INDEX ix_fraud_prevention_transaction_id" in plan
+
+
+def test_user_queries_use_user_created_at_index(db_session, statements):
+    """Test user history and velocity loads search the (user_id, created_at, id) index."""
+    service = _service(db_session)
+    (history,) = _query_plans(
+        db_session, statements, lambda: service.get_by_user_id("plan-user")
+    )
+    assert "ix_fraud_prevention_user_id_created_at_id (user_id=?)" in history
+    assert "TEMP B-TREE" not in history
+
+    plans = _query_plans(
+        db_session, statements, lambda: service.get_velocity("user_id", "other-user")
+    )
+    assert plans
+    for plan in plans:
+        assert "ix_fraud_prevention_user_id_created_at_id (user_id=?" in plan
+
+
+def test_risk_assessment_is_one_summary_lookup(db_session, statements):
+    """Test default rules read the user's counts by primary key, not from their records."""
+    service = _service(db_session)
+    fraud_data = FraudPreventionCreate(
+        transaction_id="plan-tx-2", user_ip="192.168.1.1", user_id="plan-user"
+    )
+    (plan,) = _query_plans(
+        db_session, statements, lambda: service._assess_risk(fraud_data)
+    )
+    assert plan == (
+        "SEARCH user_risk_summary USING INDEX sqlite_autoindex_user_risk_summary_1 (user_id=?)"
+    )
+
+
+def test_listing_uses_created_at_index(db_session, statements):
+    """Test get_all pages in created_at order without sorting the table."""
+    service = _service(db_session)
+    plans = _query_plans(
+        db_session, statements, lambda: service.get_all(skip=0, limit=10)
+    )
+    listing = plans[-1]
+    assert "ix_fraud_prevention_created_at_id" in listing
+    assert "TEMP B-TREE" not in listing
+
+
+def test_keyset_page_uses_created_at_id_index(db_session, statements):
+    """Test cursor pages seek into the (created_at, id) index."""
+    service = _service(db_session)
+    (fraud,), _ = service.get_page(limit=1)
+    cursor = (fraud.created_at, fraud.id)
+    (plan,) = _query_plans(
+        db_session, statements, lambda: service.get_page(cursor=cursor, limit=10)
+    )
+    assert "SEARCH fraud_prevention USING INDEX ix_fraud_prevention_created_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_migrations_match_models(tmp_path):
+    """Test a database built by the migrations has no drift from the models."""
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    with create_engine(url).connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+
+
+def test_migrations_add_indexes_to_existing_database(tmp_path):
+    """Test migrating a database created before indexes existed."""
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    engine = create_engine(url)
+    table = Base.metadata.tables["fraud_prevention"]
+    # Create the table the way create_all did before indexes were declared
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE fraud_prevention (id VARCHAR(36) PRIMARY KEY, "
+            "transaction_id VARCHAR(255) NOT NULL, user_ip VARCHAR(100) NOT NULL, "
+            "device_id VARCHAR(255), user_id VARCHAR(255) NOT NULL, "
+            "risk_level VARCHAR(8) NOT NULL, additional_data JSON, "
+            "is_blocked BOOLEAN NOT NULL, block_reason VARCHAR(255), "
+            "attempt_count INTEGER NOT NULL, created_at DATETIME NOT NULL, "
+            "updated_at DATETIME NOT NULL)"
+        )
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes(table.name)}
+    assert set(indexes) == {index.name for index in table.indexes}
+    assert indexes["ix_fraud_prevention_transaction_id"]["unique"]
@@ -0,0 +1,124 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.database.database import Base
+from src.ingest import DEFAULT_MAX_KEYS, Ingestor, main, read_chunks
+from src.models.fraud_prevention import FraudPrevention, RiskLevel, UserRiskSummary
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.velocity import NullVelocityStore
+
+
+@pytest.fixture
+def ingest_engine(tmp_path):
+    """A file-backed database shared by the ingestion workers."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'ingest.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _ndjson(payloads):
+    return "".join(json.dumps(payload) + "\n" for payload in payloads).encode()
+
+
+def _payload(i, user_id):
+    return {"transactionId": f"ingest-tx-{i}", "userIp": "10.0.0.1", "userId": user_id}
+
+
+def _expected_level(previous_attempts):
+    thresholds = ((10, RiskLevel.CRITICAL), (5, RiskLevel.HIGH), (3, RiskLevel.MEDIUM))
+    for threshold, level in thresholds:
+        if previous_attempts >= threshold:
+            return level
+    return RiskLevel.LOW
+
+
+def test_read_chunks_skips_blank_lines():
+    """Test lines are chunked with their line numbers."""
+    chunks = list(read_chunks(io.BytesIO(b"a\n\nb\nc\n"), chunk_size=2))
+    assert chunks == [[(1, b"a\n"), (3, b"b\n")], [(4, b"c\n")]]
+
+
+@pytest.mark.parametrize("max_keys", [DEFAULT_MAX_KEYS, 1])
+def test_ingest_matches_sequential_risk(ingest_engine, max_keys):
+    """Test chunked, parallel ingestion scores users as sequential creates would,
+    also when counts are dropped between chunks and read back."""
+    payloads = [_payload(i, f"user-{i % 3}") for i in range(40)]
+    ingestor = Ingestor(ingest_engine, chunk_size=7, workers=3, max_keys=max_keys)
+    report = ingestor.run(io.BytesIO(_ndjson(payloads)))
+    assert all(len(counts) <= max_keys for counts in ingestor._counts.values())
+    assert (report.lines, report.inserted, report.duplicates, report.invalid) == (
+        40, 40, 0, 0,
+    )
+
+    expected = {}
+    attempts = {}
+    for payload in payloads:
+        user_id = payload["userId"]
+        expected[payload["transactionId"]] = _expected_level(attempts.get(user_id, 0))
+        attempts[user_id] = attempts.get(user_id, 0) + 1
+    with ingest_engine.connect() as conn:
+        rows = conn.execute(
+            select(FraudPrevention.transaction_id, FraudPrevention.risk_level)
+        )
+        stored = {transaction_id: risk_level for transaction_id, risk_level in rows}
+        summaries = dict(
+            conn.execute(
+                select(UserRiskSummary.user_id, UserRiskSummary.attempt_count)
+            ).all()
+        )
+    assert stored == expected
+    assert summaries == attempts
+
+
+def test_ingest_skips_duplicates_and_invalid_lines(ingest_engine):
+    """Test existing and repeated transaction ids are skipped and bad lines counted."""
+    with Session(ingest_engine) as db:
+        FraudPreventionService(db, velocity=NullVelocityStore()).create(
+            FraudPreventionCreate(
+                transaction_id="ingest-tx-0", user_ip="10.0.0.1", user_id="dup-user"
+            )
+        )
+
+    lines = _ndjson([_payload(i, "dup-user") for i in range(4)])
+    lines += b'{"transactionId": "ingest-tx-1"}\nnot json\n'
+    lines += _ndjson([_payload(2, "dup-user")])
+    report = Ingestor(ingest_engine, chunk_size=2, workers=2).run(io.BytesIO(lines))
+    assert (report.lines, report.inserted, report.duplicates, report.invalid) == (
+        7, 3, 2, 2,
+    )
+
+    with ingest_engine.connect() as conn:
+        levels = conn.scalars(
+            select(FraudPrevention.risk_level).order_by(FraudPrevention.transaction_id)
+        ).all()
+    assert levels == [RiskLevel.LOW, RiskLevel.LOW, RiskLevel.LOW, RiskLevel.MEDIUM]
+
+
+def test_copy_requires_postgresql(ingest_engine):
+    """Test COPY is rejected on other databases."""
+    with pytest.raises(ValueError):
+        Ingestor(ingest_engine, method="copy")
+
+
+def test_cli_reports_throughput(tmp_path, capsys):
+    """Test the command line entry point prints a JSON report."""
+    path = tmp_path / "traffic.ndjson"
+    path.write_bytes(_ndjson([_payload(i, "cli-user") for i in range(5)]))
+    db_url = f"sqlite:///{tmp_path / 'cli.db'}"
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    main([str(path), "--db-url", db_url, "--chunk-size", "2", "--workers", "2"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["inserted"] == 5
+    assert report["rows_per_second"] > 0
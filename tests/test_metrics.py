@@ -0,0 +1,162 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from sqlalchemy import create_engine
+
+from src.database.database import TimedQueuePool
+from src.metrics import MetricsPipeline, StageTimings, record_attempt
+
+
+def _points(reader):
+    """Data points per metric name from an in-memory reader."""
+    points = {}
+    for resource_metrics in reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                points[metric.name] = list(metric.data.data_points)
+    return points
+
+
+def test_pipeline_aggregates_counters():
+    """Test buffered counter increments are summed per attribute set."""
+    pipeline = MetricsPipeline(InMemoryMetricReader, flush_interval=60)
+    for _ in range(3):
+        pipeline.emit("fraud_prevention_blocked_total", 1, {"risk_level": "critical"})
+    pipeline.emit("fraud_prevention_blocked_total", 1, {"risk_level": "high"})
+    pipeline.emit("fraud_prevention_request_duration_seconds", 0.5, {"success": "True"})
+    pipeline.flush()
+
+    points = _points(pipeline.reader)
+    blocked = {
+        point.attributes["risk_level"]: point.value
+        for point in points["fraud_prevention_blocked_total"]
+    }
+    assert blocked == {"critical": 3, "high": 1}
+    (duration,) = points["fraud_prevention_request_duration_seconds"]
+    assert duration.count == 1
+    pipeline.shutdown()
+
+
+def test_full_buffer_drops_and_counts():
+    """Test events beyond the buffer size are dropped and reported."""
+    pipeline = MetricsPipeline(InMemoryMetricReader, max_events=4, flush_interval=60)
+    with patch.object(pipeline, "_wake"):
+        for _ in range(10):
+            pipeline.emit("fraud_prevention_cache_hits_total", 1, {"cache": "records"})
+    assert pipeline.dropped == 6
+    pipeline.flush()
+
+    points = _points(pipeline.reader)
+    assert points["fraud_prevention_cache_hits_total"][0].value == 4
+    assert points["fraud_prevention_metrics_dropped_total"][0].value == 6
+    pipeline.shutdown()
+
+
+def test_oldest_drop_policy_keeps_newest_events():
+    """Test the oldest policy evicts buffered events in favour of new ones."""
+    pipeline = MetricsPipeline(
+        InMemoryMetricReader, max_events=2, flush_interval=60, drop="oldest"
+    )
+    for level in ("low", "medium", "high"):
+        pipeline.emit("fraud_prevention_blocked_total", 1, {"risk_level": level})
+    pipeline.flush()
+
+    points = _points(pipeline.reader)["fraud_prevention_blocked_total"]
+    assert {point.attributes["risk_level"] for point in points} == {"medium", "high"}
+    pipeline.shutdown()
+
+
+def test_exporter_failure_never_reaches_the_caller():
+    """Test a broken exporter neither raises nor delays recording."""
+
+    def broken_exporter():
+        time.sleep(0.2)
+        raise RuntimeError("no credentials")
+
+    pipeline = MetricsPipeline(broken_exporter, flush_interval=0.01)
+    with patch("src.metrics.get_metrics_pipeline", return_value=pipeline):
+        start = time.perf_counter()
+        record_attempt(success=True, duration=0.1, risk_level="low")
+        assert time.perf_counter() - start < 0.1
+    pipeline.shutdown()
+    assert pipeline.reader is None
+    assert not pipeline._events
+
+
+def test_stage_timings_percentiles():
+    """Test nearest-rank percentiles over the most recent samples."""
+    timings = StageTimings(max_samples=100)
+    for ms in range(1, 201):
+        timings.record("commit", ms / 1000)
+    summary = timings.summary()["commit"]
+    assert summary["count"] == 200
+    assert summary["samples"] == 100
+    assert (summary["p50"], summary["p95"], summary["p99"], summary["max"]) == (
+        0.15, 0.195, 0.199, 0.2,
+    )
+
+
+def test_pool_checkouts_record_wait(tmp_path):
+    """Test the service engine's pool reports time spent waiting for a connection."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1
+    )
+    with patch("src.database.database.record_stage") as record:
+        with engine.connect():
+            pass
+    engine.dispose()
+    ((stage, duration),) = [call.args for call in record.call_args_list]
+    assert stage == "pool_wait"
+    assert duration >= 0
+
+
+def test_pipeline_gauges_keep_latest_value():
+    """Test gauges report the last value emitted per attribute set."""
+    pipeline = MetricsPipeline(InMemoryMetricReader, flush_interval=60)
+    for in_use in (1, 4, 2):
+        pipeline.emit("fraud_prevention_db_pool_in_use", in_use, {"pool": "sync"})
+    pipeline.flush()
+
+    (point,) = _points(pipeline.reader)["fraud_prevention_db_pool_in_use"]
+    assert point.value == 2
+    pipeline.shutdown()
+
+
+def test_instrument_creation_failures_are_logged():
+    """Test an SDK without synchronous gauges loses only the gauges, and says so."""
+    from opentelemetry.sdk.metrics._internal import Meter
+
+    pipeline = MetricsPipeline(InMemoryMetricReader, flush_interval=60)
+    with patch.object(
+        Meter, "create_gauge", side_effect=AttributeError("create_gauge")
+    ), patch("src.metrics.logger") as logger:
+        pipeline.emit("fraud_prevention_db_pool_in_use", 1, {"pool": "sync"})
+        pipeline.emit("fraud_prevention_blocked_total", 1, {"risk_level": "high"})
+        pipeline.flush()
+
+    points = _points(pipeline.reader)
+    assert points["fraud_prevention_blocked_total"][0].value == 1
+    assert "fraud_prevention_db_pool_in_use" not in points
+    logged = [call.args[1] for call in logger.error.call_args_list]
+    assert "fraud_prevention_db_pool_in_use" in logged
+    pipeline.shutdown()
+
+
+def test_metrics_recorded_just_before_exit_are_flushed():
+    """Test a process exiting right after its first metric still sets up and flushes."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from src.metrics import record_attempt; record_attempt(True, 0.1)",
+        ],
+        env={**os.environ, "METRICS_EXPORTER": "memory"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert "Failed to record metrics" not in result.stderr
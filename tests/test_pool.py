@@ -0,0 +1,102 @@
+import threading
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from src.database.database import TimedQueuePool, get_db, get_pool_settings
+from src.main import create_app
+
+
+def _engine(tmp_path, **kwargs):
+    return create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, **kwargs
+    )
+
+
+def test_pool_settings_follow_configuration(monkeypatch):
+    """Test the pool is sized to instance concurrency unless set explicitly."""
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.delenv("DB_POOL_TIMEOUT_SECONDS", raising=False)
+    monkeypatch.setenv("INSTANCE_CONCURRENCY", "8")
+    settings = get_pool_settings()
+    assert (settings["pool_size"], settings["pool_timeout"]) == (8, 30)
+    assert settings["pool_pre_ping"]
+
+    monkeypatch.setenv("INSTANCE_CONCURRENCY", "80")
+    monkeypatch.setenv("DB_POOL_FAST_FAIL", "true")
+    settings = get_pool_settings()
+    assert (settings["pool_size"], settings["pool_timeout"]) == (10, 1)
+
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_TIMEOUT_SECONDS", "0.25")
+    settings = get_pool_settings()
+    assert (settings["pool_size"], settings["pool_timeout"]) == (3, 0.25)
+
+
+def test_exhausted_pool_fails_fast(tmp_path):
+    """Test checkouts beyond pool size plus overflow time out quickly and are reported."""
+    engine = _engine(tmp_path, pool_size=2, max_overflow=1, pool_timeout=0.05)
+    workers = 12
+    ready = threading.Barrier(workers)
+    outcomes, waits, states = [], [], []
+
+    def checkout():
+        ready.wait()
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                # Hold the connection well past the other checkouts' timeout
+                time.sleep(0.3)
+            outcomes.append("connected")
+        except exc.TimeoutError:
+            waits.append(time.perf_counter() - start)
+            outcomes.append("timeout")
+
+    with patch(
+        "src.database.database.record_pool_state",
+        side_effect=lambda *args, **kwargs: states.append(kwargs),
+    ), patch("src.database.database.record_pool_timeout") as timeouts:
+        threads = [threading.Thread(target=checkout) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    engine.dispose()
+
+    assert outcomes.count("connected") == 3
+    assert outcomes.count("timeout") == workers - 3
+    assert timeouts.call_count == workers - 3
+    assert max(waits) < 0.25
+    assert max(state["in_use"] for state in states) == 3
+    assert max(state["overflow"] for state in states) == 1
+    assert max(state["waiting"] for state in states) >= 1
+    assert states[-1] == {"in_use": 0, "overflow": 0, "waiting": 0}
+
+
+def test_pre_ping_replaces_stale_connections(tmp_path):
+    """Test a connection closed while pooled is replaced on the next checkout."""
+    engine = _engine(tmp_path, pool_size=1, pool_pre_ping=True)
+    with engine.connect() as conn:
+        stale = conn.connection.dbapi_connection
+    stale.close()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert conn.connection.dbapi_connection is not stale
+    engine.dispose()
+
+
+def test_pool_timeout_returns_503():
+    """Test requests that cannot get a connection are told to retry."""
+
+    def exhausted_pool():
+        raise exc.TimeoutError("QueuePool limit reached")
+
+    app = create_app(async_mode=False)
+    app.dependency_overrides[get_db] = exhausted_pool
+    response = TestClient(app).get("/api/fraud-preventions/some-id")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
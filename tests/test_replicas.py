@@ -0,0 +1,171 @@
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import (
+    PRIMARY_READS,
+    Base,
+    ReplicaSet,
+    RoutingSession,
+)
+from src.models.fraud_prevention import FraudPrevention
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.cache import InMemoryCache, RecentKeys, RecordCache
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.velocity import NullVelocityStore
+
+
+@pytest.fixture
+def databases(tmp_path):
+    """A primary and two replica SQLite files, each holding one record named after it."""
+    engines = {
+        name: create_engine(f"sqlite:///{tmp_path / f'{name}.db'}")
+        for name in ("primary", "replica-0", "replica-1")
+    }
+    for name, engine in engines.items():
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(FraudPrevention).values(
+                    id=name, transaction_id=f"tx-{name}", user_ip="10.0.0.1",
+                    user_id="replica-user",
+                )
+            )
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+def _factory(primary, replica_engines, eject_seconds=30):
+    replicas = ReplicaSet(replica_engines, eject_seconds=eject_seconds)
+    return sessionmaker(
+        class_=RoutingSession, replicas=replicas, bind=primary, expire_on_commit=False
+    )
+
+
+def _service(db, cache=None):
+    return FraudPreventionService(
+        db,
+        velocity=NullVelocityStore(),
+        cache=cache or RecordCache(InMemoryCache("test")),
+        recent_keys=RecentKeys(InMemoryCache("test")),
+        writer=None,
+    )
+
+
+def _served_by(service):
+    (row,) = service.get_by_user_id("replica-user")
+    return row.id
+
+
+def test_reads_rotate_across_replicas(databases):
+    """Test each session reads from the next replica and keeps it for the session."""
+    SessionLocal = _factory(
+        databases["primary"], [databases["replica-0"], databases["replica-1"]]
+    )
+    served = []
+    for _ in range(4):
+        with SessionLocal() as db:
+            service = _service(db)
+            served.append(_served_by(service))
+            assert _served_by(service) == served[-1]
+    assert served == ["replica-0", "replica-1", "replica-0", "replica-1"]
+
+
+def test_writes_and_reads_after_writes_use_the_primary(databases):
+    """Test creates go to the primary, and the same session then reads its write."""
+    SessionLocal = _factory(databases["primary"], [databases["replica-0"]])
+    with SessionLocal() as db:
+        service = _service(db)
+        assert _served_by(service) == "replica-0"
+        service.create(
+            FraudPreventionCreate(
+                transaction_id="tx-new", user_ip="10.0.0.2", user_id="new-user"
+            )
+        )
+        (row,) = service.get_by_user_id("new-user")
+        assert row.transaction_id == "tx-new"
+        assert _served_by(service) == "primary"
+
+    with databases["replica-0"].connect() as conn:
+        assert conn.exec_driver_sql(
+            "SELECT count(*) FROM fraud_prevention WHERE user_id = 'new-user'"
+        ).scalar() == 0
+
+
+def test_read_your_writes_reads_from_the_primary(databases):
+    """Test sessions opened for read-your-writes never read from a replica."""
+    SessionLocal = _factory(databases["primary"], [databases["replica-0"]])
+    with SessionLocal(info={PRIMARY_READS: True}) as db:
+        assert _served_by(_service(db)) == "primary"
+
+
+def test_record_cache_is_filled_only_from_the_primary(databases):
+    """Test a lagging replica's copy of a record is not cached, and read-your-writes
+    lookups skip the cache."""
+    for name, blocked in [("primary", True), ("replica-0", False)]:
+        with databases[name].begin() as conn:
+            conn.execute(
+                insert(FraudPrevention).values(
+                    id="lagging", transaction_id="tx-lagging", user_ip="10.0.0.1",
+                    user_id="lagging-user", is_blocked=blocked,
+                )
+            )
+    cache = RecordCache(InMemoryCache("test"))
+
+    SessionLocal = _factory(databases["primary"], [databases["replica-0"]])
+    with SessionLocal() as db:
+        assert not _service(db, cache).get_by_id("lagging").is_blocked
+    assert len(cache.backend) == 0
+    with SessionLocal(info={PRIMARY_READS: True}) as db:
+        assert _service(db, cache).get_by_transaction_id("tx-lagging").is_blocked
+
+    # Without replicas, misses fill the cache, which read-your-writes ignores
+    SessionLocal = _factory(databases["primary"], [])
+    with SessionLocal() as db:
+        assert _service(db, cache).get_by_id("lagging").is_blocked
+    assert len(cache.backend) == 2
+    with databases["primary"].begin() as conn:
+        conn.exec_driver_sql("UPDATE fraud_prevention SET block_reason = 'Fraud'")
+    with SessionLocal(info={PRIMARY_READS: True}) as db:
+        assert _service(db, cache).get_by_id("lagging").block_reason == "Fraud"
+
+
+def test_failed_replica_is_ejected(databases, tmp_path):
+    """Test reads skip a replica that cannot be reached, then fall back to the primary."""
+    missing = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    SessionLocal = _factory(databases["primary"], [missing, databases["replica-1"]])
+
+    with SessionLocal() as db:
+        # The first pick fails to connect, so this read is retried on the primary
+        assert _served_by(_service(db)) == "primary"
+    assert db.replicas.is_ejected(missing)
+    for _ in range(3):
+        with SessionLocal() as db:
+            assert _served_by(_service(db)) == "replica-1"
+
+    # With every replica ejected, reads go straight to the primary
+    SessionLocal = _factory(databases["primary"], [missing])
+    for _ in range(2):
+        with SessionLocal() as db:
+            assert _served_by(_service(db)) == "primary"
+
+
+def test_replica_failing_mid_transaction_is_retried_on_the_primary(databases, tmp_path):
+    """Test a replica that drops its connection during a read does not leave
+    the session in a failed transaction for the retry."""
+    # Reachable, but every query fails as a dropped connection would
+    broken = create_engine(f"sqlite:///{tmp_path / 'broken.db'}")
+
+    @event.listens_for(broken, "handle_error")
+    def disconnect(context):
+        context.is_disconnect = True
+
+    SessionLocal = _factory(databases["primary"], [broken])
+    with SessionLocal() as db:
+        service = _service(db)
+        assert _served_by(service) == "primary"
+        assert db.replicas.is_ejected(broken)
+        assert service.get_by_transaction_id("tx-primary").id == "primary"
+        db.commit()
+    broken.dispose()
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.database.database import Base
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.rescore import rescore, velocity_counts
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.cache import InMemoryCache, RecentKeys
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.rules import DEFAULT_RULES, RuleEngine
+from src.services.velocity import NullVelocityStore
+
+
+@pytest.fixture
+def rescore_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rescore.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        yield db
+    engine.dispose()
+
+
+def _create(db, count, engine=None):
+    # Own recent keys, since each database reuses the same transaction ids
+    service = FraudPreventionService(
+        db,
+        velocity=NullVelocityStore(),
+        rules=engine,
+        recent_keys=RecentKeys(InMemoryCache("test")),
+    )
+    for i in range(count):
+        service.create(
+            FraudPreventionCreate(
+                transaction_id=f"rescore-tx-{i}",
+                user_ip=f"10.0.0.{i % 2}",
+                user_id=f"rescore-user-{i % 3}",
+                additional_data={"amount": i * 100},
+            )
+        )
+    return service
+
+
+def _levels(db):
+    return db.execute(
+        select(FraudPrevention.transaction_id, FraudPrevention.risk_level)
+    ).all()
+
+
+def test_velocity_counts_windows():
+    """Test cumulative and windowed counts per key in time order."""
+    keys = np.array(["a", "b", "a", None, "a", "a"], dtype=object)
+    minute = 60_000
+    created_ms = np.array([0, 0, 30_000, 40_000, 61_000, 10 * minute])
+    counts = velocity_counts(keys, created_ms)
+    assert counts["total"].tolist() == [0, 0, 1, -1, 2, 3]
+    assert counts["1m"].tolist() == [0, 0, 1, -1, 1, 0]
+    assert counts["1h"].tolist() == [0, 0, 1, -1, 2, 3]
+
+
+def test_rescore_with_unchanged_rules_is_a_no_op(rescore_db):
+    """Test vectorized scoring reproduces the levels assigned at creation."""
+    service = _create(rescore_db, 20)
+    # Records created together share a request but are scored in input order
+    service.create_batch(
+        [
+            FraudPreventionCreate(
+                transaction_id=f"rescore-batch-{i}", user_ip="10.0.1.1",
+                user_id="rescore-batch-user",
+            )
+            for i in range(12)
+        ]
+    )
+    report = rescore(rescore_db, RuleEngine(DEFAULT_RULES))
+    assert report["records"] == 32
+    assert report["changed"] == 0
+    assert report["levels"]["critical"] == 2
+    assert report["levels"]["high"] == 5 + 5
+
+
+def test_rescore_matches_sequential_creates(rescore_db, tmp_path):
+    """Test re-scoring with new rules matches creating the records under them."""
+    specs = [
+        {"type": "velocity", "dimension": "user_ip", "window": "1h", "threshold": 4,
+         "level": "high"},
+        {"type": "velocity", "dimension": "user_id", "threshold": 2, "level": "medium"},
+        {"type": "amount", "threshold": 1500, "level": "critical"},
+        {"type": "blocklist", "dimension": "user_ip", "values": ["10.0.0.9"],
+         "level": "critical"},
+    ]
+    _create(rescore_db, 20)
+    blocked = _create(rescore_db, 0).block_transaction(
+        rescore_db.scalar(
+            select(FraudPrevention.id).where(
+                FraudPrevention.transaction_id == "rescore-tx-0"
+            )
+        ),
+        "Manual review",
+    )
+
+    report = rescore(rescore_db, RuleEngine(specs), chunk_size=7)
+    assert report["changed"] > 0
+    assert rescore(rescore_db, RuleEngine(specs), dry_run=True)["changed"] == 0
+
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    Base.metadata.create_all(bind=reference)
+    with Session(reference) as db:
+        _create(db, 20, RuleEngine(specs))
+        expected = dict(_levels(db))
+    reference.dispose()
+    expected[blocked.transaction_id] = RiskLevel.CRITICAL
+    assert dict(_levels(rescore_db)) == expected
+
+
+def test_rescore_windows_use_created_at(rescore_db):
+    """Test window counts are relative to each record's own creation time."""
+    _create(rescore_db, 3)
+    start = datetime(2024, 1, 1)
+    for minutes, fraud in zip([0, 2, 30], rescore_db.scalars(select(FraudPrevention))):
+        fraud.user_ip = "10.1.1.1"
+        fraud.created_at = start + timedelta(minutes=minutes)
+    rescore_db.commit()
+
+    specs = [{"type": "velocity", "dimension": "user_ip", "window": "1m",
+              "threshold": 1, "level": "high"}]
+    assert rescore(rescore_db, RuleEngine(specs))["levels"]["high"] == 0
+    specs[0]["window"] = "1h"
+    assert rescore(rescore_db, RuleEngine(specs))["levels"]["high"] == 2
@@ -0,0 +1,164 @@
+import gzip
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+
+from src.database.database import Base
+from src.models.fraud_prevention import FraudPrevention, FraudPreventionArchive
+from src.retention import archive_records
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.archive import Archive, set_archive
+from src.services.cache import InMemoryCache, RecentKeys, RecordCache
+from src.services.fraud_prevention import (
+    DuplicateTransactionError,
+    FraudPreventionService,
+)
+from src.services.velocity import NullVelocityStore
+
+CUTOFF = datetime(2026, 1, 1)
+CREATED = {
+    "old-tx-0": datetime(2025, 11, 3),
+    "old-tx-1": datetime(2025, 11, 20),
+    "old-tx-2": datetime(2025, 12, 31, 23, 59),
+    "new-tx-0": datetime(2026, 1, 1),
+}
+
+
+@pytest.fixture
+def retention_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        service = _service(db, None)
+        for transaction_id, created_at in CREATED.items():
+            fraud = service.create(
+                FraudPreventionCreate(
+                    transaction_id=transaction_id,
+                    user_ip="10.0.0.1",
+                    user_id="retention-user",
+                    additional_data={"amount": 100},
+                )
+            )
+            db.execute(
+                update(FraudPrevention)
+                .where(FraudPrevention.id == fraud.id)
+                .values(created_at=created_at)
+            )
+        db.commit()
+        yield db
+    engine.dispose()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return Archive(str(tmp_path / "archive"))
+
+
+def _service(db, archive):
+    return FraudPreventionService(
+        db,
+        velocity=NullVelocityStore(),
+        cache=RecordCache(InMemoryCache("test")),
+        recent_keys=RecentKeys(InMemoryCache("test")),
+        writer=None,
+        archive=archive,
+    )
+
+
+def _transaction_ids(db, model):
+    return set(db.scalars(select(model.transaction_id)))
+
+
+def test_old_records_move_to_monthly_archive_files(retention_db, archive):
+    """Test records created before the cutoff are written per month, then deleted."""
+    report = archive_records(retention_db, archive, CUTOFF, chunk_size=2)
+    assert (report["records"], report["files"]) == (3, 2)
+
+    assert _transaction_ids(retention_db, FraudPrevention) == {"new-tx-0"}
+    assert _transaction_ids(retention_db, FraudPreventionArchive) == {
+        "old-tx-0", "old-tx-1", "old-tx-2"
+    }
+    archived = {}
+    for path in sorted(archive.root.glob("*/*.ndjson.gz")):
+        with gzip.open(path) as lines:
+            for line in lines:
+                record = json.loads(line)
+                archived[record["transactionId"]] = path.parent.name
+                assert record["additionalData"] == {"amount": 100}
+    assert archived == {"old-tx-0": "2025-11", "old-tx-1": "2025-11", "old-tx-2": "2025-12"}
+    assert not list(archive.root.glob("*/*.tmp"))
+
+
+def test_archived_records_are_still_found(retention_db, archive):
+    """Test lookups by id and transaction id fall back to the archive."""
+    service = _service(retention_db, archive)
+    before = service.get_by_transaction_id("old-tx-1")
+    archive_records(retention_db, archive, CUTOFF)
+
+    service = _service(retention_db, archive)
+    by_transaction = service.get_by_transaction_id("old-tx-1")
+    by_id = service.get_by_id(before.id)
+    for fraud in (by_transaction, by_id):
+        assert fraud.id == before.id
+        assert fraud.created_at == datetime(2025, 11, 20)
+        assert fraud.risk_level == before.risk_level
+        assert fraud.additional_data == {"amount": 100}
+    assert service.get_by_id("missing") is None
+
+
+def test_archived_transactions_are_not_created_again(retention_db, archive):
+    """Test re-submitting an archived transaction returns the archived record."""
+    before = _service(retention_db, archive).get_by_transaction_id("old-tx-1")
+    archive_records(retention_db, archive, CUTOFF)
+
+    service = _service(retention_db, archive)
+    data = FraudPreventionCreate(
+        transaction_id="old-tx-1",
+        user_ip="10.0.0.1",
+        user_id="retention-user",
+        additional_data={"amount": 100},
+    )
+    fraud, created = service.create_or_get(data)
+    assert (fraud.id, created) == (before.id, False)
+    assert _transaction_ids(retention_db, FraudPrevention) == {"new-tx-0"}
+    assert service.existing_transaction_ids(["old-tx-1", "new-tx-0", "other"]) == {
+        "old-tx-1", "new-tx-0"
+    }
+    with pytest.raises(DuplicateTransactionError):
+        service.create_batch([data])
+    # Without the archive files it cannot be replayed, but is still not duplicated
+    with pytest.raises(DuplicateTransactionError):
+        _service(retention_db, None).create_or_get(data)
+
+
+def test_archive_lookups_can_be_disabled(retention_db, archive, monkeypatch):
+    fraud_id = _service(retention_db, archive).get_by_transaction_id("old-tx-0").id
+    archive_records(retention_db, archive, CUTOFF)
+    monkeypatch.setenv("ARCHIVE_LOOKUPS", "false")
+    set_archive(None)
+    assert _service(retention_db, None).get_by_id(fraud_id) is None
+
+
+def test_dry_run_changes_nothing(retention_db, archive):
+    report = archive_records(retention_db, archive, CUTOFF, dry_run=True)
+    assert (report["records"], report["oldest"]) == (3, "2025-11-03T00:00:00")
+    assert retention_db.scalar(select(func.count(FraudPrevention.id))) == 4
+    assert not archive.root.exists()
+
+
+def test_interrupted_run_is_archived_again(retention_db, archive):
+    """Test a chunk whose transaction fails stays in the table and is archived once on rerun."""
+    with patch.object(retention_db, "commit", side_effect=RuntimeError("crash")):
+        with pytest.raises(RuntimeError):
+            archive_records(retention_db, archive, CUTOFF)
+    retention_db.rollback()
+    assert retention_db.scalar(select(func.count(FraudPrevention.id))) == 4
+
+    report = archive_records(retention_db, archive, CUTOFF)
+    assert report["records"] == 3
+    assert retention_db.scalar(select(func.count(FraudPreventionArchive.id))) == 3
+    assert len(list(archive.root.glob("*/*.ndjson.gz"))) == 2
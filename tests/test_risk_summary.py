@@ -0,0 +1,183 @@
+import os
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+
+from src.models.fraud_prevention import FraudPrevention, RiskLevel, UserRiskSummary
+from src.schemas.fraud_prevention import FraudPreventionCreate, FraudPreventionUpdate
+from src.services.fraud_prevention import FraudPreventionService
+from src.services import risk_summary
+from src.services.risk_summary import _summaries, rebuild_summaries, window_counts
+from src.services.velocity import WINDOWS, InMemoryVelocityStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _fraud_data(i, user_id="summary-user"):
+    return FraudPreventionCreate(
+        transaction_id=f"summary-tx-{user_id}-{i}", user_ip="10.0.0.1", user_id=user_id
+    )
+
+
+def _summaries_by_user(db_session):
+    rows = db_session.execute(select(*UserRiskSummary.__table__.columns)).all()
+    return {row.user_id: row for row in rows}
+
+
+def _row(bucket, count, previous):
+    values = {"attempt_count": 0}
+    for name in WINDOWS:
+        values.update(
+            {f"bucket_{name}": bucket, f"count_{name}": count, f"previous_{name}": previous}
+        )
+    return SimpleNamespace(**values)
+
+
+def test_window_counts_weight_the_previous_bucket():
+    """Test a window counts all of the current bucket and the share of the
+    previous bucket it still overlaps."""
+    # 15s into minute 100: three quarters of minute 99 is still inside the window
+    now = 100 * 60 + 15
+    assert window_counts(_row(100, 2, 4), now)["1m"] == 5
+    # Nothing yet in minute 100, so minute 99 is the previous bucket
+    assert window_counts(_row(99, 4, 8), now)["1m"] == 3
+    assert window_counts(_row(98, 4, 8), now)["1m"] == 0
+    assert window_counts(None, now) == {"total": 0, "1m": 0, "1h": 0, "24h": 0}
+
+
+def test_records_are_counted_in_their_own_bucket():
+    records = [
+        ("user", datetime(2026, 1, 1, 0, 0, 10), RiskLevel.LOW),
+        ("user", datetime(2026, 1, 1, 0, 1, 5), RiskLevel.MEDIUM),
+        ("user", datetime(2026, 1, 1, 0, 0, 50), RiskLevel.LOW),
+    ]
+    (summary,) = _summaries(records, blocked=False)
+    assert summary["attempt_count"] == 3
+    assert summary["last_seen"] == datetime(2026, 1, 1, 0, 1, 5)
+    assert summary["risk_level"] == RiskLevel.MEDIUM
+    assert (summary["count_1m"], summary["previous_1m"]) == (1, 2)
+    assert (summary["count_1h"], summary["previous_1h"]) == (3, 0)
+
+
+@pytest.mark.parametrize("portable", [False, True])
+def test_writes_keep_summaries_equal_to_a_rebuild(db_session, monkeypatch, portable):
+    """Test creates, batches, blocks and updates leave the same summaries a
+    rebuild computes from the records, with ON CONFLICT and with the portable
+    UPDATE-then-INSERT used on other databases."""
+    if portable:
+        monkeypatch.setattr(risk_summary, "_dialect", lambda db: "other")
+    service = FraudPreventionService(db_session)
+    first = service.create(_fraud_data(0))
+    for i in range(1, 4):
+        service.create(_fraud_data(i))
+    service.create_batch([_fraud_data(i, user_id="batch-user") for i in range(6)])
+    service.block_transaction(first.id, "Fraud")
+    service.block_transaction(first.id, "Fraud again")
+    service.block_many("Chargebacks", user_id="batch-user")
+    latest = service.create(_fraud_data(4))
+    service.update(latest.id, FraudPreventionUpdate(risk_level=RiskLevel.LOW))
+
+    incremental = _summaries_by_user(db_session)
+    assert incremental["summary-user"].attempt_count == 5
+    assert incremental["summary-user"].blocked_count == 1
+    assert incremental["summary-user"].risk_level == RiskLevel.LOW
+    assert incremental["batch-user"].blocked_count == 6
+    assert incremental["batch-user"].risk_level == RiskLevel.CRITICAL
+
+    assert rebuild_summaries(db_session) == 2
+    rebuilt = _summaries_by_user(db_session)
+    now = time.time()
+    for user_id, summary in rebuilt.items():
+        expected = incremental[user_id]
+        assert summary.attempt_count == expected.attempt_count
+        assert summary.blocked_count == expected.blocked_count
+        assert summary.last_seen == expected.last_seen
+        assert summary.risk_level == expected.risk_level
+        assert window_counts(summary, now) == window_counts(expected, now)
+
+
+def test_mysql_upsert_reads_columns_before_assigning_them():
+    """Test MySQL, which applies ON DUPLICATE KEY UPDATE assignments in order,
+    reads each bucket and last_seen before they are overwritten."""
+    statements = []
+    db = SimpleNamespace(execute=lambda stmt, rows=None: statements.append(stmt))
+    with patch.object(risk_summary, "_dialect", return_value="mysql"):
+        risk_summary.summarize_attempts(
+            db,
+            [{"user_id": "user", "created_at": datetime(2026, 1, 1), "risk_level": RiskLevel.LOW}],
+        )
+    (stmt,) = statements
+    sql = str(stmt.compile(dialect=mysql.dialect()))
+    update_clause = sql.split("ON DUPLICATE KEY UPDATE")[1]
+    assignments = [assignment.split(" = ")[0] for assignment in update_clause.split(", ")]
+    position = {column.strip(): i for i, column in enumerate(assignments)}
+    assert position["risk_level"] < position["last_seen"]
+    for name in WINDOWS:
+        assert position[f"previous_{name}"] < position[f"bucket_{name}"]
+        assert position[f"count_{name}"] < position[f"bucket_{name}"]
+
+
+def test_assessment_counts_attempts_from_other_instances(db_session):
+    """Test a process scores users by attempts another process created."""
+    other_instance = FraudPreventionService(db_session, velocity=InMemoryVelocityStore())
+    store = InMemoryVelocityStore()
+    store.warm(db_session)
+    service = FraudPreventionService(db_session, velocity=store)
+
+    for i in range(5):
+        other_instance.create(_fraud_data(i, user_id="shared-user"))
+
+    assert service._assess_risk(_fraud_data(5, user_id="shared-user")) == RiskLevel.HIGH
+    # This process's own counters never saw them
+    assert store.get("user_id", "shared-user") is None
+
+
+def test_migration_fills_summaries_from_existing_records(tmp_path):
+    """Test the migration adding user_risk_summary summarizes the records
+    already stored, as a rebuild would."""
+    url = f"sqlite:///{tmp_path / 'summaries.db'}"
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "0005")
+    engine = create_engine(url)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(FraudPrevention),
+            [
+                {
+                    "id": f"migrated-{i}", "transaction_id": f"migrated-tx-{i}",
+                    "user_ip": "10.0.0.1", "user_id": f"migrated-user-{i % 2}",
+                    "risk_level": RiskLevel.MEDIUM if i == 3 else RiskLevel.LOW,
+                    "is_blocked": i == 0, "attempt_count": 0,
+                    "created_at": now - timedelta(minutes=10 * (4 - i)),
+                    "updated_at": now,
+                }
+                for i in range(5)
+            ],
+        )
+
+    command.upgrade(config, "head")
+    with Session(engine) as db:
+        migrated = _summaries_by_user(db)
+        assert migrated["migrated-user-0"].attempt_count == 3
+        assert migrated["migrated-user-0"].blocked_count == 1
+        assert migrated["migrated-user-1"].risk_level == RiskLevel.MEDIUM
+        rebuild_summaries(db)
+        rebuilt = _summaries_by_user(db)
+    engine.dispose()
+    now = time.time()
+    assert set(migrated) == set(rebuilt)
+    for user_id, summary in rebuilt.items():
+        assert summary.attempt_count == migrated[user_id].attempt_count
+        assert summary.last_seen == migrated[user_id].last_seen
+        assert window_counts(summary, now) == window_counts(migrated[user_id], now)
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from src.models.fraud_prevention import RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.rules import DEFAULT_RULES, RuleEngine, get_rule_engine
+from src.services.velocity import InMemoryVelocityStore
+
+
+def _fraud_data(user_id="rules-user", user_ip="10.0.0.1", device_id=None, **data):
+    return FraudPreventionCreate(
+        transaction_id=f"rules-tx-{user_id}",
+        user_ip=user_ip,
+        device_id=device_id,
+        user_id=user_id,
+        additional_data=data or None,
+    )
+
+
+def _counts(total, **windows):
+    return {"total": total, "1m": 0, "1h": 0, "24h": 0, **windows}
+
+
+@pytest.mark.parametrize(
+    "attempts,level",
+    [
+        (0, RiskLevel.LOW),
+        (2, RiskLevel.LOW),
+        (3, RiskLevel.MEDIUM),
+        (4, RiskLevel.MEDIUM),
+        (5, RiskLevel.HIGH),
+        (9, RiskLevel.HIGH),
+        (10, RiskLevel.CRITICAL),
+        (50, RiskLevel.CRITICAL),
+    ],
+)
+def test_default_rules_match_attempt_thresholds(attempts, level):
+    """Test the default rule set keeps the 3/5/10 previous-attempt thresholds."""
+    engine = RuleEngine(DEFAULT_RULES)
+    assessment = engine.evaluate(_fraud_data(), lambda dimension, key: _counts(attempts))
+    assert assessment.level == level
+
+
+def test_plan_short_circuits_and_shares_lookups():
+    """Test evaluation stops at the first match and fetches each dimension once."""
+    engine = RuleEngine(
+        [
+            {"type": "velocity", "dimension": "user_ip", "window": "1h",
+             "threshold": 20, "level": "high"},
+            {"type": "velocity", "dimension": "user_ip", "threshold": 100,
+             "level": "critical"},
+            {"type": "blocklist", "dimension": "device_id", "values": ["bad-device"],
+             "level": "critical", "name": "bad-devices"},
+            {"type": "amount", "threshold": 5000, "level": "medium"},
+        ]
+    )
+    assert [rule.level for rule in engine.plan] == [
+        RiskLevel.CRITICAL, RiskLevel.CRITICAL, RiskLevel.HIGH, RiskLevel.MEDIUM,
+    ]
+    # The cheap blocklist check runs before the velocity lookup at the same level
+    assert engine.plan[0].name == "bad-devices"
+
+    lookups = []
+
+    def velocity(dimension, key):
+        lookups.append((dimension, key))
+        return _counts(30, **{"1h": 25})
+
+    assessment = engine.evaluate(_fraud_data(device_id="bad-device"), velocity)
+    assert assessment.level == RiskLevel.CRITICAL
+    assert list(assessment.timings) == ["bad-devices"]
+    assert lookups == []
+
+    assessment = engine.evaluate(_fraud_data(amount=9000), velocity)
+    assert (assessment.level, assessment.rule) == (RiskLevel.HIGH, "velocity:user_ip:1h>=20")
+    assert lookups == [("user_ip", "10.0.0.1")]
+    assert len(assessment.timings) == 3
+
+    assessment = engine.evaluate(_fraud_data(amount=9000), lambda *_: _counts(0))
+    assert (assessment.level, assessment.rule) == (RiskLevel.MEDIUM, "amount:amount>=5000")
+
+
+def test_invalid_rules_are_rejected():
+    """Test configuration errors surface when the rules are compiled."""
+    for spec in (
+        {"type": "unknown", "level": "high"},
+        {"type": "velocity", "dimension": "email", "threshold": 1, "level": "high"},
+        {"type": "velocity", "dimension": "user_id", "window": "5m", "threshold": 1,
+         "level": "high"},
+        {"type": "amount", "threshold": 1, "level": "severe"},
+    ):
+        with pytest.raises(ValueError):
+            RuleEngine([spec])
+
+
+def test_rules_loaded_from_file(tmp_path, monkeypatch):
+    """Test RISK_RULES_FILE replaces the default rule set."""
+    path = tmp_path / "rules.json"
+    path.write_text(
+        json.dumps(
+            [{"type": "blocklist", "dimension": "user_ip", "values": ["6.6.6.6"],
+              "level": "critical"}]
+        )
+    )
+    monkeypatch.setenv("RISK_RULES_FILE", str(path))
+    engine = get_rule_engine()
+    assert engine.dimensions == []
+    assert engine.evaluate(_fraud_data(user_ip="6.6.6.6"), None).level == RiskLevel.CRITICAL
+
+
+def test_batch_scoring_uses_configured_rules(db_session):
+    """Test batch creates score later items against IP velocity from earlier ones."""
+    engine = RuleEngine(
+        [{"type": "velocity", "dimension": "user_ip", "threshold": 2, "level": "high"}]
+    )
+    service = FraudPreventionService(
+        db_session, velocity=InMemoryVelocityStore(), rules=engine
+    )
+    service.create(_fraud_data(user_id="ip-user-0", user_ip="10.9.9.9"))
+    frauds = service.create_batch(
+        [_fraud_data(user_id=f"ip-user-{i}", user_ip="10.9.9.9") for i in range(1, 4)]
+    )
+    assert [fraud.risk_level for fraud in frauds] == [
+        RiskLevel.LOW, RiskLevel.HIGH, RiskLevel.HIGH,
+    ]
+    assert service._assess_risk(_fraud_data(user_ip="10.9.9.9")) == RiskLevel.HIGH
@@ -1,13 +1,20 @@
+from datetime import datetime, timedelta
+
 import pytest
+from sqlalchemy import update
 
-from src.models.fraud_prevention import RiskLevel
-from src.schemas.fraud_prevention import FraudPreventionCreate
-from src.services.fraud_prevention import FraudPreventionService
+from src.models.fraud_prevention import FraudPrevention, RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate, FraudPreventionUpdate
+from src.services.cache import NullCache, RecentKeys
+from src.services.fraud_prevention import (
+    DuplicateTransactionError,
+    FraudPreventionService,
+    WARMUP_KEY,
+)
 
 
-def test_create_fraud_prevention(db_session):
+def test_create_fraud_prevention(service):
     """Test creating a fraud prevention record through the service."""
-    service = FraudPreventionService(db_session)
 
     # Create test data
     fraud_data = FraudPreventionCreate(
@@ -28,9 +35,8 @@ def test_create_fraud_prevention(db_session):
     assert not result.is_blocked
 
 
-def test_get_by_transaction_id(db_session):
+def test_get_by_transaction_id(service):
     """Test retrieving a fraud prevention record by transaction ID."""
-    service = FraudPreventionService(db_session)
 
     # Create test data
     fraud_data = FraudPreventionCreate(
@@ -49,9 +55,8 @@ def test_get_by_transaction_id(db_session):
     assert result.transaction_id == fraud_data.transaction_id
 
 
-def test_block_transaction(db_session):
+def test_block_transaction(service):
     """Test blocking a transaction through the service."""
-    service = FraudPreventionService(db_session)
 
     # Create test data
     fraud_data = FraudPreventionCreate(
@@ -68,9 +73,28 @@ def test_block_transaction(db_session):
     assert blocked.risk_level == RiskLevel.CRITICAL
 
 
-def test_risk_assessment(db_session):
+def test_block_by_user_is_limited(service):
+    """Test blocking by user takes the oldest open records up to the limit."""
+    created = [
+        service.create(
+            FraudPreventionCreate(
+                transaction_id=f"limit-tx-{i}",
+                user_ip="192.168.1.1",
+                user_id="limit-user",
+            )
+        )
+        for i in range(3)
+    ]
+
+    first = service.block_many("Chargebacks", user_id="limit-user", limit=2)
+    assert {fraud.id for fraud in first} == {fraud.id for fraud in created[:2]}
+    rest = service.block_many("Chargebacks", user_id="limit-user", limit=2)
+    assert [fraud.id for fraud in rest] == [created[2].id]
+    assert service.block_many("Chargebacks", user_id="limit-user", limit=2) == []
+
+
+def test_risk_assessment(service):
     """Test risk level assessment logic."""
-    service = FraudPreventionService(db_session)
 
     # Create multiple transactions for the same user
     user_id = "risk-assessment-user"
@@ -91,3 +115,131 @@ def test_risk_assessment(db_session):
 
     # After 6 transactions, risk should be HIGH
     assert result.risk_level == RiskLevel.HIGH
+
+
+def test_create_batch_matches_sequential_risk(service):
+    """Test batch scoring continues from existing history in one pass."""
+    user_id = "batch-service-user"
+
+    for i in range(2):
+        service.create(
+            FraudPreventionCreate(
+                transaction_id=f"batch-seq-{i}", user_ip="192.168.1.1", user_id=user_id
+            )
+        )
+
+    results = service.create_batch(
+        [
+            FraudPreventionCreate(
+                transaction_id=f"batch-bulk-{i}", user_ip="192.168.1.1", user_id=user_id
+            )
+            for i in range(4)
+        ]
+    )
+
+    assert [result.risk_level for result in results] == [
+        RiskLevel.LOW,
+        RiskLevel.MEDIUM,
+        RiskLevel.MEDIUM,
+        RiskLevel.HIGH,
+    ]
+    assert len(service.get_by_user_id(user_id)) == 6
+
+
+def test_user_history_window(service):
+    """History and summary are limited to records created in [since, until)."""
+    start = datetime(2024, 1, 1)
+    for day in range(4):
+        fraud = service.create(
+            FraudPreventionCreate(
+                transaction_id=f"window-tx-{day}", user_ip="192.168.1.1", user_id="window-user"
+            )
+        )
+        service.db.execute(
+            update(FraudPrevention)
+            .where(FraudPrevention.id == fraud.id)
+            .values(created_at=start + timedelta(days=day))
+        )
+
+    window = {"since": start + timedelta(days=1), "until": start + timedelta(days=3)}
+    frauds, has_more = service.get_user_page("window-user", **window)
+    assert [fraud.transaction_id for fraud in frauds] == ["window-tx-2", "window-tx-1"]
+    assert not has_more
+
+    summary = service.get_user_summary("window-user", **window)
+    assert summary["total"] == 2
+    assert summary["first_seen"] == start + timedelta(days=1)
+    assert summary["last_seen"] == start + timedelta(days=2)
+
+
+def test_repeated_create_is_idempotent_in_the_database(db_session):
+    """A repeated transaction id returns the stored record without a new attempt."""
+    service = FraudPreventionService(db_session, recent_keys=RecentKeys(NullCache()))
+    fraud_data = FraudPreventionCreate(
+        transaction_id="idempotent-tx", user_ip="192.168.1.1", user_id="idempotent-user"
+    )
+
+    first, created = service.create_or_get(fraud_data)
+    assert created
+    again, created = service.create_or_get(fraud_data)
+    assert not created
+    assert again.id == first.id
+    assert len(service.get_by_user_id("idempotent-user")) == 1
+    assert service.get_velocity("user_id", "idempotent-user")["total"] == 1
+
+    with pytest.raises(DuplicateTransactionError):
+        service.create(fraud_data.model_copy(update={"device_id": "other-device"}))
+
+
+def _verbs(statements):
+    return [statement.split()[0] for statement in statements]
+
+
+def test_writes_are_one_round_trip(db_session, statements):
+    """Create, update and block each write the record in one statement, then the
+    user's risk summary, and read nothing back."""
+    service = FraudPreventionService(db_session)
+    fraud_data = FraudPreventionCreate(
+        transaction_id="round-trip-tx", user_ip="192.168.1.1", user_id="round-trip-user"
+    )
+
+    created = service.create(fraud_data)
+    # The user's counts by primary key, the record (checking the archive in
+    # the same statement), then the user's summary
+    assert _verbs(statements) == ["SELECT", "INSERT", "INSERT"]
+    # Reading every field after commit must not reload the record
+    created.created_at, created.updated_at, created.block_reason
+    assert _verbs(statements) == ["SELECT", "INSERT", "INSERT"]
+
+    statements.clear()
+    updated = service.update(
+        created.id, FraudPreventionUpdate(risk_level=RiskLevel.HIGH)
+    )
+    assert _verbs(statements) == ["UPDATE", "INSERT"]
+    assert updated.risk_level == RiskLevel.HIGH
+
+    statements.clear()
+    blocked = service.block_transaction(created.id, "Fraud")
+    blocked.attempt_count, blocked.updated_at
+    assert _verbs(statements) == ["UPDATE", "INSERT"]
+    assert blocked.is_blocked
+    assert blocked.attempt_count == 1
+    assert blocked.risk_level == RiskLevel.CRITICAL
+
+    statements.clear()
+    again = service.block_transaction(created.id, "Fraud again")
+    assert _verbs(statements) == ["UPDATE", "INSERT"]
+    assert again.attempt_count == 2
+    assert (again.block_reason, again.updated_at) == ("Fraud", blocked.updated_at)
+
+    statements.clear()
+    assert service.block_transaction("missing-id", "Fraud") is None
+    assert _verbs(statements) == ["UPDATE"]
+
+
+def test_warm_up_only_reads(db_session, statements):
+    """Warmup runs the hot queries without writing or caching anything."""
+    service = FraudPreventionService(db_session)
+    service.warm_up()
+    assert statements and set(_verbs(statements)) == {"SELECT"}
+    assert service.cache.get_by_id(WARMUP_KEY, lambda: None) is None
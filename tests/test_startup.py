@@ -0,0 +1,65 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+STARTUP = """
+import json, os, sys
+import src.main
+report = {
+    "db_created_on_import": os.path.exists(os.environ["DB_PATH"]),
+    "otel_sdk_imported": "opentelemetry.sdk.metrics" in sys.modules,
+    "async_routes_imported": "src.routes.fraud_prevention_async" in sys.modules,
+}
+from fastapi.testclient import TestClient
+with TestClient(src.main.app, raise_server_exceptions=False) as client:
+    report["status"] = client.get("/api/fraud-preventions?limit=1").status_code
+print(json.dumps(report))
+"""
+
+
+def _start(tmp_path, **env):
+    db_path = tmp_path / "startup.db"
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP],
+        env={
+            **os.environ,
+            "TESTING": "false",
+            "DB_URL": f"sqlite:///{db_path}",
+            "DB_PATH": str(db_path),
+            "ASYNC_MODE": "false",
+            "METRICS_EXPORTER": "none",
+            "CREATE_SCHEMA": "true",
+            **env,
+        },
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    report = json.loads(output.splitlines()[-1])
+    with sqlite3.connect(db_path) as conn:
+        tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        report["tables"] = [name for (name,) in tables]
+    return report
+
+
+def test_import_defers_database_and_metrics_setup(tmp_path):
+    """Test importing the app opens no connection and loads only what it serves."""
+    report = _start(tmp_path)
+    assert report == {
+        "db_created_on_import": False,
+        "otel_sdk_imported": False,
+        "async_routes_imported": False,
+        "status": 200,
+        "tables": [
+            "fraud_prevention", "fraud_prevention_archive", "user_risk_summary"
+        ],
+    }
+
+
+def test_schema_creation_can_be_skipped(tmp_path):
+    """Test CREATE_SCHEMA=false leaves the schema to migrations."""
+    report = _start(tmp_path, CREATE_SCHEMA="false")
+    assert report["tables"] == []
+    assert report["status"] == 500
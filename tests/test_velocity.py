@@ -0,0 +1,129 @@
+import time
+from unittest.mock import patch
+
+from src.models.fraud_prevention import RiskLevel
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.velocity import InMemoryVelocityStore, SlidingWindowCounter
+
+
+def _fraud_data(i, user_id="velocity-user", user_ip="10.0.0.1", device_id=None):
+    return FraudPreventionCreate(
+        transaction_id=f"velocity-tx-{user_id}-{i}",
+        user_ip=user_ip,
+        device_id=device_id,
+        user_id=user_id,
+    )
+
+
+def test_sliding_window_counter_expires_old_buckets():
+    """Events drop out of the window once they are older than its width."""
+    counter = SlidingWindowCounter(60)
+    counter.add(1000.0)
+    counter.add(1030.0)
+    assert counter.count(1030.0) == 2
+    assert counter.count(1065.0) == 1
+    assert counter.count(1100.0) == 0
+
+
+def test_store_tracks_each_dimension(db_session):
+    """Counters are kept separately per user, IP and device."""
+    store = InMemoryVelocityStore(single_writer=True)
+    store.warm(db_session)
+    service = FraudPreventionService(db_session, velocity=store)
+
+    service.create(_fraud_data(0, device_id="device-a"))
+    service.create(_fraud_data(1, device_id="device-b"))
+    service.create(_fraud_data(2, user_id="other-user", device_id="device-a"))
+
+    assert store.get("user_id", "velocity-user")["total"] == 2
+    assert store.get("user_id", "velocity-user")["1m"] == 2
+    assert store.get("user_ip", "10.0.0.1")["total"] == 3
+    assert store.get("device_id", "device-a")["24h"] == 2
+
+
+def test_warmed_store_answers_without_database(db_session, statements):
+    """After warmup, risk assessment only reads the user's risk summary."""
+    seed_service = FraudPreventionService(db_session, velocity=InMemoryVelocityStore())
+    for i in range(5):
+        seed_service.create(_fraud_data(i))
+
+    store = InMemoryVelocityStore()
+    store.warm(db_session)
+    service = FraudPreventionService(db_session, velocity=store)
+
+    statements.clear()
+    assert service._assess_risk(_fraud_data(5)) == RiskLevel.HIGH
+    assert service._assess_risk(_fraud_data(0, user_id="brand-new-user")) == RiskLevel.LOW
+    assert len(statements) == 2
+    assert all("FROM user_risk_summary" in statement for statement in statements)
+
+
+def test_budget_eviction_falls_back_to_database(db_session):
+    """Evicted keys are reloaded from the database instead of reported as zero."""
+    store = InMemoryVelocityStore(max_keys=2, single_writer=True)
+    store.warm(db_session)
+    service = FraudPreventionService(db_session, velocity=store)
+    for i in range(3):
+        service.create(_fraud_data(i, user_id="evicted-user"))
+    service.create(_fraud_data(0, user_id="user-b"))
+    service.create(_fraud_data(0, user_id="user-c"))
+
+    assert store.evictions > 0
+    assert not store.authoritative
+    assert store.get("user_id", "evicted-user") is None
+    assert service.get_velocity("user_id", "evicted-user")["total"] == 3
+    assert store.get("user_id", "evicted-user")["total"] == 3
+
+
+def test_unknown_keys_fall_back_unless_single_writer(db_session):
+    """Test a warmed store shared with other writers loads unknown keys from
+    the database instead of reporting them as zero."""
+    store = InMemoryVelocityStore()
+    store.warm(db_session)
+    other_worker = FraudPreventionService(db_session, velocity=InMemoryVelocityStore())
+    for i in range(3):
+        other_worker.create(_fraud_data(i, user_ip="10.0.0.9"))
+
+    assert not store.authoritative
+    assert store.get("user_ip", "10.0.0.9") is None
+    service = FraudPreventionService(db_session, velocity=store)
+    assert service.get_velocity("user_ip", "10.0.0.9")["total"] == 3
+
+    single_writer = InMemoryVelocityStore(single_writer=True)
+    single_writer.warm(db_session)
+    assert single_writer.authoritative
+    assert single_writer.get("user_ip", "10.0.0.10")["total"] == 0
+
+
+def test_loaded_keys_are_refreshed_unless_single_writer(db_session):
+    """Test two stores sharing one database see each other's records once a
+    loaded key is due for a refresh."""
+    first = FraudPreventionService(db_session, velocity=InMemoryVelocityStore())
+    second_store = InMemoryVelocityStore(refresh_seconds=30)
+    second = FraudPreventionService(db_session, velocity=second_store)
+    first.create(_fraud_data(0, user_ip="10.0.0.7"))
+    assert second.get_velocity("user_ip", "10.0.0.7")["total"] == 1
+
+    for i in range(1, 4):
+        first.create(_fraud_data(i, user_ip="10.0.0.7"))
+    second.create(_fraud_data(0, user_id="second-user", user_ip="10.0.0.7"))
+    # Within the refresh interval only its own record is added
+    assert second.get_velocity("user_ip", "10.0.0.7")["total"] == 2
+    with patch("src.services.velocity.time.time", return_value=time.time() + 30):
+        assert second_store.get("user_ip", "10.0.0.7") is None
+        assert second.get_velocity("user_ip", "10.0.0.7")["total"] == 5
+
+    single_writer = InMemoryVelocityStore(single_writer=True, refresh_seconds=30)
+    single_writer.seed("user_ip", "10.0.0.8", 2)
+    with patch("src.services.velocity.time.time", return_value=time.time() + 30):
+        assert single_writer.get("user_ip", "10.0.0.8")["total"] == 2
+
+
+def test_idle_keys_are_swept():
+    """Keys idle for longer than the TTL are removed on the next sweep."""
+    store = InMemoryVelocityStore(idle_ttl=10)
+    store.seed("user_id", "idle-user", 4)
+    with patch("src.services.velocity.time.time", return_value=10**10):
+        assert store.get("user_id", "idle-user") is None
+    assert store.evictions == 1
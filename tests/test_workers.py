@@ -0,0 +1,70 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.database import database
+from src.database.database import TimedQueuePool, get_pool_settings
+from src.metrics import get_metrics_pipeline, resource_attributes
+from src.serve import available_cpus, resolve_workers
+
+
+def test_forked_worker_gets_its_own_pool_and_metrics(tmp_path):
+    """Test a forked child neither reuses the parent's connections nor its metrics."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fork.db'}", poolclass=TimedQueuePool)
+    with patch.object(database, "engine", engine):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        parent_pool = engine.pool
+        parent_pipeline = get_metrics_pipeline()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                fresh = engine.pool is not parent_pool and engine.pool.checkedin() == 0
+                own_metrics = get_metrics_pipeline() is not parent_pipeline
+                os._exit(0 if fresh and own_metrics else 1)
+            finally:
+                os._exit(2)
+        _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The parent's pooled connection survives the child
+    assert engine.pool is parent_pool
+    assert parent_pool.checkedin() == 1
+    engine.dispose()
+
+
+def test_each_process_has_its_own_instance_id():
+    """Test metric resources are unique per process, not just per revision."""
+    first = resource_attributes()["service.instance.id"]
+    second = resource_attributes()["service.instance.id"]
+    assert first != second
+    assert str(os.getpid()) in first
+
+
+def test_pool_is_split_between_workers(monkeypatch):
+    """Test each worker gets its share of the instance's connections."""
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.setenv("INSTANCE_CONCURRENCY", "16")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert get_pool_settings()["pool_size"] == 4
+    monkeypatch.setenv("WEB_CONCURRENCY", "32")
+    assert get_pool_settings()["pool_size"] == 1
+
+
+def test_resolve_workers():
+    assert resolve_workers("3") == 3
+    assert resolve_workers("auto") == available_cpus()
+    with pytest.raises(ValueError):
+        resolve_workers("0")
+
+
+def test_resolve_workers_without_sched_getaffinity(monkeypatch):
+    """Test "auto" falls back to the CPU count where affinity is unsupported (macOS)."""
+    monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 6)
+    assert resolve_workers("auto") == 6
+    monkeypatch.setattr(os, "cpu_count", lambda: None)
+    assert resolve_workers("auto") == 1
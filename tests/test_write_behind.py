@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+
+from src.database.database import Base
+from src.models.fraud_prevention import FraudPrevention, RiskLevel, UserRiskSummary
+from src.schemas.fraud_prevention import FraudPreventionCreate
+from src.services.cache import InMemoryCache, RecentKeys
+from src.services.fraud_prevention import FraudPreventionService
+from src.services.velocity import InMemoryVelocityStore
+from src.services.write_behind import (
+    WriteBehindFullError,
+    WriteBehindWriter,
+    get_write_behind,
+)
+
+
+@pytest.fixture
+def writer_engine(tmp_path):
+    """A file-backed database shared by the service and the writer thread."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'write_behind.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def dead_letter(tmp_path):
+    return tmp_path / "dead-letter.ndjson"
+
+
+def _fraud_data(i, user_id="wb-user"):
+    return FraudPreventionCreate(
+        transaction_id=f"wb-tx-{i}", user_ip="10.0.0.1", user_id=user_id
+    )
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(FraudPrevention))
+
+
+def test_creates_are_written_in_batches(db_session, writer_engine, dead_letter):
+    """Creates return scored records at once and are persisted on shutdown."""
+    writer = WriteBehindWriter(
+        writer_engine, str(dead_letter), batch_size=3, flush_interval=60
+    )
+    service = FraudPreventionService(db_session, writer=writer)
+    frauds = [service.create(_fraud_data(i)) for i in range(7)]
+
+    # Scored in memory, including the attempts not yet persisted
+    assert [fraud.risk_level.value for fraud in frauds][-1] == "high"
+    writer.shutdown()
+    assert _count(writer_engine) == 7
+    assert (writer.written, writer.duplicates, writer.failed) == (7, 0, 0)
+
+
+def test_duplicates_are_dropped_by_the_writer(writer_engine, dead_letter):
+    """Rows whose transaction id already exists are skipped, not failed."""
+    writer = WriteBehindWriter(writer_engine, str(dead_letter), flush_interval=0.01)
+    row = {
+        "id": "wb-dup-1", "transaction_id": "wb-dup", "user_ip": "10.0.0.1",
+        "device_id": None, "user_id": "wb-user", "risk_level": RiskLevel.LOW,
+        "additional_data": None, "attempt_count": 0, "is_blocked": False,
+        "block_reason": None,
+    }
+    writer.enqueue(row)
+    writer.enqueue({**row, "id": "wb-dup-2"})
+    writer.shutdown()
+    assert _count(writer_engine) == 1
+    assert (writer.written, writer.duplicates) == (1, 1)
+    with writer_engine.connect() as conn:
+        # Only the inserted row is counted in the user's summary
+        assert conn.scalar(select(UserRiskSummary.attempt_count)) == 1
+
+
+def test_full_queue_pushes_back(db_session, writer_engine, dead_letter):
+    """Creates fail fast with WriteBehindFullError while the queue is full."""
+    writer = WriteBehindWriter(
+        writer_engine, str(dead_letter), batch_size=1, max_queue=1, enqueue_timeout=0.01
+    )
+    release = threading.Event()
+    write = writer._write
+    writer._write = lambda rows: release.wait() and write(rows)
+    service = FraudPreventionService(db_session, writer=writer)
+
+    service.create(_fraud_data(0))
+    # The worker holds the first row; the second fills the queue
+    while writer.depth():
+        time.sleep(0.001)
+    service.create(_fraud_data(1))
+    with pytest.raises(WriteBehindFullError):
+        service.create(_fraud_data(2))
+    release.set()
+    writer.shutdown()
+    assert _count(writer_engine) == 2
+
+
+def test_failing_rows_go_to_the_dead_letter_file(writer_engine, dead_letter):
+    """Test a bad row fails alone: the rest of its batch is written and the
+    bad row is kept in the dead-letter file."""
+    writer = WriteBehindWriter(
+        writer_engine, str(dead_letter), batch_size=10, flush_interval=60
+    )
+    row = {
+        "user_ip": "10.0.0.1", "device_id": None, "user_id": "wb-user",
+        "risk_level": RiskLevel.LOW, "additional_data": None, "attempt_count": 0,
+        "is_blocked": False, "block_reason": None,
+    }
+    for i in range(3):
+        writer.enqueue({**row, "id": f"wb-ok-{i}", "transaction_id": f"wb-ok-{i}"})
+    # NULL user_ip violates NOT NULL
+    writer.enqueue({**row, "id": "wb-bad", "transaction_id": "wb-bad", "user_ip": None})
+    writer.shutdown()
+
+    assert _count(writer_engine) == 3
+    assert (writer.written, writer.duplicates, writer.failed) == (3, 0, 1)
+    (line,) = dead_letter.read_text().splitlines()
+    assert json.loads(line)["transaction_id"] == "wb-bad"
+
+
+def _outage(writer, failures):
+    """Make the writer's next ``failures`` writes fail as if the database were down."""
+    write = writer._write
+    remaining = [failures]
+
+    def flaky(rows):
+        if remaining[0]:
+            remaining[0] -= 1
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        return write(rows)
+
+    writer._write = flaky
+
+
+def test_batches_are_retried_through_a_short_outage(db_session, writer_engine, dead_letter):
+    """Test a batch is retried with backoff while the database is briefly down."""
+    writer = WriteBehindWriter(
+        writer_engine, str(dead_letter), flush_interval=60, retry_seconds=5
+    )
+    _outage(writer, 3)
+    service = FraudPreventionService(db_session, writer=writer)
+    for i in range(3):
+        service.create(_fraud_data(i))
+    writer.shutdown()
+    assert _count(writer_engine) == 3
+    assert (writer.written, writer.failed, writer.requeued) == (3, 0, 0)
+    assert not dead_letter.exists()
+
+
+def test_batches_are_requeued_through_a_long_outage(writer_engine, dead_letter):
+    """Test a batch still failing after the retry period goes back in the queue,
+    and only reaches the dead-letter file when it cannot be requeued."""
+    writer = WriteBehindWriter(
+        writer_engine, str(dead_letter), max_queue=3, retry_seconds=0
+    )
+    rows = [
+        {
+            "id": f"wb-outage-{i}", "transaction_id": f"wb-outage-{i}",
+            "user_ip": "10.0.0.1", "device_id": None, "user_id": "wb-user",
+            "risk_level": RiskLevel.LOW, "additional_data": None, "attempt_count": 0,
+            "is_blocked": False, "block_reason": None,
+        }
+        for i in range(3)
+    ]
+    _outage(writer, 1)
+    writer._flush(rows[:2])
+    assert (writer.written, writer.requeued, writer.depth()) == (0, 2, 2)
+    writer._flush(writer._take(timeout=0))
+    assert (writer.written, writer.failed) == (2, 0)
+
+    writer._queue.put(rows[2])
+    writer._queue.put(rows[2])
+    _outage(writer, 1)
+    # The queue has room for one more row, not two
+    writer._flush(rows[:2])
+    assert (writer.written, writer.failed) == (2, 2)
+    assert len(dead_letter.read_text().splitlines()) == 2
+    writer.shutdown()
+
+
+def test_write_behind_requires_a_dead_letter_path(monkeypatch):
+    monkeypatch.setenv("WRITE_BEHIND", "true")
+    monkeypatch.delenv("WRITE_BEHIND_DEAD_LETTER_PATH", raising=False)
+    with pytest.raises(ValueError):
+        get_write_behind()
+
+
+def test_stored_transaction_is_returned_instead_of_queued(
+    db_session, writer_engine, dead_letter
+):
+    """Test a create for a stored transaction id returns the stored record."""
+    stored = FraudPreventionService(db_session).create(_fraud_data(0))
+    writer = WriteBehindWriter(writer_engine, str(dead_letter), flush_interval=60)
+    # A process that has not seen the first create
+    service = FraudPreventionService(
+        db_session, writer=writer, recent_keys=RecentKeys(InMemoryCache("test"))
+    )
+
+    fraud, created = service.create_or_get(_fraud_data(0))
+    assert (fraud.id, created) == (stored.id, False)
+    assert writer.depth() == 0
+
+
+def test_new_transaction_is_checked_in_one_round_trip(
+    db_session, statements, writer_engine, dead_letter
+):
+    """Test queueing a new transaction checks stored and archived records with a
+    single query."""
+    velocity = InMemoryVelocityStore(single_writer=True)
+    velocity.warm(db_session)
+    writer = WriteBehindWriter(writer_engine, str(dead_letter), flush_interval=60)
+    service = FraudPreventionService(db_session, velocity=velocity, writer=writer)
+    statements.clear()
+    service.create(_fraud_data(0))
+    (statement,) = statements
+    assert "fraud_prevention_archive" in statement
+    assert writer.depth() == 1
+    writer.shutdown()